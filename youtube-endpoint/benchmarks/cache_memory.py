@@ -0,0 +1,137 @@
+"""
+Memory benchmark for the video info cache.
+
+Builds synthetic `extract_info` results shaped like yt-dlp's (formats with
+fragments, http_headers and URLs) and reports the bytes retained per cached
+video for three representations:
+
+- raw:     the `extract_info` dict itself
+- parsed:  the plain `get_video_info` dict with one dict per format
+- compact: the `VideoInfoRecord` stored in the info cache
+
+Run from the project directory:
+    python -m benchmarks.cache_memory [count]
+"""
+import sys
+import random
+import string
+import tracemalloc
+
+from services.youtube import YouTubeService
+from services.records import VideoInfoRecord
+
+HEIGHTS = [144, 240, 360, 480, 720, 1080, 1440, 2160]
+VCODECS = ['avc1.4d401e', 'vp9', 'av01.0.05M.08']
+ACODECS = ['mp4a.40.2', 'opus']
+
+def _random_text(length: int) -> str:
+    words = [''.join(random.choices(string.ascii_lowercase, k=random.randint(2, 9))) for _ in range(200)]
+    text = []
+    while sum(len(word) + 1 for word in text) < length:
+        text.append(random.choice(words))
+    return ' '.join(text)
+
+def make_raw_info(index: int) -> dict:
+    """
+    Build a synthetic extract_info result with a realistic number of formats
+    """
+    video_id = f"{index:011d}"[-11:]
+    formats = []
+    for n, height in enumerate(HEIGHTS):
+        for vcodec in VCODECS:
+            formats.append({
+                'format_id': str(100 + n * 10 + VCODECS.index(vcodec)),
+                'ext': 'mp4' if vcodec.startswith('avc') else 'webm',
+                'url': f"https://rr{n}.googlevideo.com/videoplayback?id={video_id}&itag={n}&" + 'x' * 600,
+                'width': height * 16 // 9,
+                'height': height,
+                'resolution': f"{height * 16 // 9}x{height}",
+                'fps': 30,
+                'vcodec': vcodec,
+                'acodec': 'none',
+                'tbr': random.uniform(100, 9000),
+                'filesize': random.randint(10**6, 10**9),
+                'format_note': f"{height}p",
+                'http_headers': {
+                    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36',
+                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                    'Accept-Language': 'en-us,en;q=0.5',
+                    'Sec-Fetch-Mode': 'navigate',
+                },
+                'fragments': [{'url': f"sq/{i}", 'duration': 5.0} for i in range(40)],
+            })
+    for n, acodec in enumerate(ACODECS):
+        formats.append({
+            'format_id': str(139 + n),
+            'ext': 'm4a' if acodec.startswith('mp4a') else 'webm',
+            'url': f"https://rr.googlevideo.com/videoplayback?id={video_id}&audio={n}&" + 'x' * 600,
+            'vcodec': 'none',
+            'acodec': acodec,
+            'tbr': random.uniform(48, 160),
+            'filesize': random.randint(10**5, 10**8),
+        })
+    return {
+        'id': video_id,
+        'title': _random_text(60),
+        'webpage_url': f"https://www.youtube.com/watch?v={video_id}",
+        'description': _random_text(2000),
+        'thumbnail': f"https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg",
+        'duration': random.randint(30, 3600),
+        'view_count': random.randint(0, 10**9),
+        'like_count': random.randint(0, 10**7),
+        'uploader': random.choice(['Channel A', 'Channel B', 'Channel C']),
+        'upload_date': '20240101',
+        'formats': formats,
+    }
+
+def to_video_info(info: dict) -> dict:
+    """
+    Mirror of the dict built by `YouTubeService.get_video_info`
+    """
+    return {
+        'id': info.get('id'),
+        'title': info.get('title', 'Unknown Title'),
+        'url': info.get('webpage_url'),
+        'webpage_url': info.get('webpage_url'),
+        'description': info.get('description', ''),
+        'thumbnail': info.get('thumbnail', ''),
+        'duration': info.get('duration', 0),
+        'view_count': info.get('view_count', 0),
+        'like_count': info.get('like_count', 0),
+        'uploader': info.get('uploader', 'Unknown'),
+        'upload_date': info.get('upload_date', ''),
+        'formats': YouTubeService._parse_formats(info.get('formats', [])),
+    }
+
+def measure(build, count: int) -> float:
+    """
+    Bytes retained per cached value produced by `build`
+    """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    cache = {index: build(index) for index in range(count)}
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del cache
+    return retained / count
+
+def main(count: int = 1000) -> None:
+    # Each value is built from a fresh raw dict that is then dropped, so only
+    # what the cache actually keeps alive is counted
+    results = {}
+    for name, build in (
+        ('raw', make_raw_info),
+        ('parsed', lambda i: to_video_info(make_raw_info(i))),
+        ('compact', lambda i: VideoInfoRecord.from_dict(to_video_info(make_raw_info(i)))),
+    ):
+        random.seed(0)
+        results[name] = measure(build, count)
+
+    print(f"bytes per cached video ({count} videos)")
+    for name, size in results.items():
+        print(f"  {name:<8} {size:>10.0f}")
+    print(f"  compact vs parsed: {results['parsed'] / results['compact']:.1f}x smaller")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
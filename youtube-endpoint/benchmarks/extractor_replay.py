@@ -0,0 +1,125 @@
+"""
+Offline, deterministic benchmark of extraction and download.
+
+First record yt-dlp's HTTP traffic for a few videos (needs network):
+    python -m benchmarks.extractor_replay record dQw4w9WgXcQ https://youtu.be/... [--download]
+
+Then replay it as often as needed, with optional injected latency:
+    python -m benchmarks.extractor_replay run --iterations 20 --latency-ms 50 [--download]
+
+`run` reports per-stage timings for `get_video_info`, `_parse_formats` and
+`download`, and exits non-zero if `--max-info-p50-ms` is exceeded, so it can
+gate performance regressions in CI.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+import yt_dlp
+
+from config import settings
+
+# Set before the service is imported: benchmark downloads are journaled in a
+# throwaway file, so the server never resumes them (nor the benchmark the server's)
+_journal_dir = tempfile.mkdtemp(prefix='extractor-replay-')
+atexit.register(shutil.rmtree, _journal_dir, ignore_errors=True)
+settings.JOURNAL_FILE = os.path.join(_journal_dir, 'journal.json')
+
+from services import replay
+from services.media_id import canonical_video_id
+from services.youtube import YouTubeService
+
+VIDEOS_FILE = 'videos.json'
+
+def _fixtures_path(args) -> str:
+    return args.fixtures or settings.EXTRACTOR_FIXTURES_PATH
+
+async def record(args) -> None:
+    path = _fixtures_path(args)
+    replay.install(replay.TrafficRecorder(path))
+    urls = []
+    for url in args.urls:
+        info = await YouTubeService.get_video_info(url)
+        if args.download:
+            await YouTubeService.download(url)
+        urls.append(info['webpage_url'])
+        print(f"recorded {info['id']}: {info['title']}")
+    with open(os.path.join(path, VIDEOS_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'urls': urls, 'download': args.download}, f, indent=1)
+
+def _summary(name: str, samples) -> float:
+    p50 = statistics.median(samples) * 1000
+    p95 = sorted(samples)[max(0, int(len(samples) * 0.95) - 1)] * 1000
+    print(f"  {name:<14} p50 {p50:8.1f} ms   p95 {p95:8.1f} ms   n={len(samples)}")
+    return p50
+
+async def run(args) -> int:
+    path = _fixtures_path(args)
+    replay.install(replay.TrafficReplayer(path, args.latency_ms, args.jitter_ms))
+    with open(os.path.join(path, VIDEOS_FILE), 'r', encoding='utf-8') as f:
+        recorded = json.load(f)
+
+    info_times, parse_times, download_times = [], [], []
+    for _ in range(args.iterations):
+        for url in recorded['urls']:
+            # Measure extraction, not the cache
+            YouTubeService._info_cache.clear()
+            start = time.perf_counter()
+            await YouTubeService.get_video_info(url)
+            info_times.append(time.perf_counter() - start)
+
+            with yt_dlp.YoutubeDL(YouTubeService._get_yt_dlp_options({'skip_download': True})) as ydl:
+                raw = ydl.extract_info(url, False)
+            start = time.perf_counter()
+            YouTubeService._parse_formats(raw.get('formats', []))
+            parse_times.append(time.perf_counter() - start)
+
+            if args.download and recorded.get('download'):
+                start = time.perf_counter()
+                result = await YouTubeService._download_job(f"bench:{url}", url, canonical_video_id(url), 'best', None, False)
+                download_times.append(time.perf_counter() - start)
+                # Start from an empty directory every iteration
+                shutil.rmtree(os.path.dirname(result['file_path']), ignore_errors=True)
+
+    print(f"replayed {len(recorded['urls'])} video(s) x {args.iterations}, latency {args.latency_ms} ms")
+    info_p50 = _summary('get_video_info', info_times)
+    _summary('_parse_formats', parse_times)
+    if download_times:
+        _summary('download', download_times)
+
+    if args.max_info_p50_ms and info_p50 > args.max_info_p50_ms:
+        print(f"FAIL: get_video_info p50 {info_p50:.1f} ms > {args.max_info_p50_ms} ms")
+        return 1
+    return 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', help='fixture directory (default: settings.EXTRACTOR_FIXTURES_PATH)')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record')
+    record_parser.add_argument('urls', nargs='+')
+    record_parser.add_argument('--download', action='store_true', help='also record a download')
+
+    run_parser = commands.add_parser('run')
+    run_parser.add_argument('--iterations', type=int, default=10)
+    run_parser.add_argument('--latency-ms', type=float, default=settings.REPLAY_LATENCY_MS)
+    run_parser.add_argument('--jitter-ms', type=float, default=settings.REPLAY_LATENCY_JITTER_MS)
+    run_parser.add_argument('--download', action='store_true')
+    run_parser.add_argument('--max-info-p50-ms', type=float)
+
+    args = parser.parse_args()
+    if args.command == 'record':
+        asyncio.run(record(args))
+        return 0
+    return asyncio.run(run(args))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+Key movement check for the cluster hash ring.
+
+Assigns a set of video IDs to N nodes, adds and then removes one node, and
+reports the fraction of keys that changed owner (ideally about 1/(N+1)) and
+how evenly keys are spread.
+
+Run from the project directory:
+    python -m benchmarks.hash_ring [nodes] [keys]
+"""
+import sys
+import random
+import string
+from collections import Counter
+
+from services.cluster import HashRing
+
+ID_ALPHABET = string.ascii_letters + string.digits + '_-'
+
+def main(node_count: int = 4, key_count: int = 100000) -> None:
+    random.seed(0)
+    keys = [''.join(random.choices(ID_ALPHABET, k=11)) for _ in range(key_count)]
+    nodes = [f"http://127.0.0.1:{8000 + n}" for n in range(node_count)]
+
+    ring = HashRing(nodes)
+    before = {key: ring.owner(key) for key in keys}
+    load = Counter(before.values())
+    print(f"{node_count} nodes, {key_count} keys: load min {min(load.values())} / max {max(load.values())} (ideal {key_count // node_count})")
+
+    new_node = f"http://127.0.0.1:{8000 + node_count}"
+    ring.add(new_node)
+    moved = sum(1 for key in keys if ring.owner(key) != before[key])
+    print(f"  add 1 node:    {moved / key_count:.1%} of keys moved (ideal {1 / (node_count + 1):.1%})")
+
+    ring.remove(new_node)
+    restored = sum(1 for key in keys if ring.owner(key) == before[key])
+    print(f"  remove it:     {restored / key_count:.1%} of keys back on their original owner")
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
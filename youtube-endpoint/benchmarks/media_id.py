@@ -0,0 +1,51 @@
+"""
+Micro-benchmark for the canonical media-ID parser against the regex passes
+it replaced, over URLs from the property corpus in tests/test_media_id.py.
+
+The parser replaced the regexes for correctness (strict hosts and IDs,
+timestamps, playlists), not speed: it measures about the same per URL, and
+a little slower on some machines.
+
+Run from the project directory:
+    python -m benchmarks.media_id [iterations]
+"""
+import re
+import sys
+import time
+import random
+
+from services.media_id import parse_media_ref
+from tests.test_media_id import random_url, random_video_id
+
+def legacy_parse(url: str) -> str:
+    """
+    The validation + ID + extraction regex passes used before the canonicalizer
+    """
+    if not re.match(r'(?:https?:\/\/)?(?:www\.)?(?:youtube\.com|youtu\.be)\/(?:watch\?v=)?([^\s&]+)', url):
+        if re.match(r'^[0-9A-Za-z_-]{11}$', url):
+            url = f"https://www.youtube.com/watch?v={url}"
+    if re.match(r'^[0-9A-Za-z_-]{11}$', url):
+        url = f"https://www.youtube.com/watch?v={url}"
+    for pattern in [
+        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
+        r'(?:embed\/|v\/|youtu.be\/)([0-9A-Za-z_-]{11})',
+        r'(?:watch\?v=)([0-9A-Za-z_-]{11})',
+    ]:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    raise ValueError(url)
+
+def bench(iterations: int) -> None:
+    rng = random.Random(1)
+    urls = [random_url(random_video_id(rng), rng) for _ in range(1000)]
+    for name, parse in (('legacy', legacy_parse), ('canonical', parse_media_ref)):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for url in urls:
+                parse(url)
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<10} {elapsed / (iterations * len(urls)) * 1e6:6.2f} us/url")
+
+if __name__ == '__main__':
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
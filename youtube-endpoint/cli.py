@@ -0,0 +1,173 @@
+"""
+Offline bulk processing that drives YouTubeService directly, without HTTP.
+
+    python cli.py info urls.txt --parallel 8 --manifest info.jsonl
+    cat ids.txt | python cli.py download - --parallel 4 --manifest dl.jsonl
+
+Inputs are URLs or video IDs, one per line. Every result is appended to a
+JSONL manifest; items already completed there with the same format options
+are skipped on rerun, so an interrupted backfill resumes where it stopped.
+Unfinished downloads are tracked in CLI_JOURNAL_FILE, apart from the
+server's journal.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from config import settings
+
+# Set before the service is imported: the server must not resume the CLI's
+# unfinished downloads, nor the CLI pick up the server's
+settings.JOURNAL_FILE = settings.CLI_JOURNAL_FILE
+
+from services.youtube import YouTubeService
+from services.media_id import canonical_video_id
+from services.scheduler import fair_scheduler
+
+def read_inputs(source: str) -> List[str]:
+    """
+    Read non-empty, non-comment lines from a file or stdin ("-")
+    """
+    stream = sys.stdin if source == '-' else open(source, 'r', encoding='utf-8')
+    try:
+        return [line.strip() for line in stream if line.strip() and not line.startswith('#')]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def item_key(command: str, video_id: str, format_id: Optional[str], audio_only: bool) -> Tuple:
+    """
+    What makes two manifest entries the same work: info is per video,
+    downloads per video and format options
+    """
+    if command == 'info':
+        return (video_id,)
+    return (video_id, format_id or None, bool(audio_only))
+
+def completed_items(manifest: str, command: str) -> Set[Tuple]:
+    """
+    Item keys already completed for `command` in the manifest
+    """
+    done = set()
+    try:
+        with open(manifest, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Partial last line from an interrupted run
+                    continue
+                if entry.get('command') == command and entry.get('status') == 'ok':
+                    done.add(item_key(command, entry['id'], entry.get('format_id'), entry.get('audio_only', False)))
+    except FileNotFoundError:
+        pass
+    return done
+
+class Progress:
+    """Throughput and ETA reporting on stderr"""
+
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self._last_report = 0.0
+
+    def update(self, ok: bool) -> None:
+        self.done += 1
+        if not ok:
+            self.failed += 1
+        now = time.monotonic()
+        if now - self._last_report >= 1.0 or self.done == self.total:
+            self._last_report = now
+            self.report(now)
+
+    def report(self, now: float) -> None:
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total - self.done) / rate if rate > 0 else float('inf')
+        eta_text = time.strftime('%H:%M:%S', time.gmtime(eta)) if eta != float('inf') else '--:--:--'
+        sys.stderr.write(
+            f"\r{self.done}/{self.total} done, {self.failed} failed, "
+            f"{rate:.2f} items/s, ETA {eta_text}  "
+        )
+        if self.done == self.total:
+            sys.stderr.write('\n')
+        sys.stderr.flush()
+
+async def process(command: str, items: Iterable[str], manifest: str, parallel: int,
+                  format_id: str = None, audio_only: bool = False) -> int:
+    """
+    Run `command` for every item with at most `parallel` in flight, appending
+    each result to the manifest as it completes
+    """
+    done = completed_items(manifest, command)
+    pending: Dict[str, str] = {}
+    invalid = []
+    skipped = 0
+    for item in items:
+        try:
+            video_id = canonical_video_id(item)
+        except ValueError:
+            invalid.append(item)
+            continue
+        if item_key(command, video_id, format_id, audio_only) in done:
+            skipped += 1
+        elif video_id not in pending:
+            pending[video_id] = item
+
+    sys.stderr.write(f"{len(pending)} to process, {skipped} already completed, {len(invalid)} invalid\n")
+    # The CLI is the only client here; let it use all the parallelism it asked for
+    fair_scheduler.slots = max(fair_scheduler.slots, parallel)
+    fair_scheduler.max_per_client = max(fair_scheduler.max_per_client, parallel)
+    progress = Progress(len(pending))
+    semaphore = asyncio.Semaphore(parallel)
+
+    with open(manifest, 'a', encoding='utf-8') as out:
+        def write(entry: Dict) -> None:
+            out.write(json.dumps(entry) + '\n')
+            out.flush()
+
+        for item in invalid:
+            write({'command': command, 'id': None, 'input': item, 'status': 'error', 'error': 'Invalid YouTube URL or ID'})
+
+        async def run_one(video_id: str, item: str) -> None:
+            async with semaphore:
+                start = time.monotonic()
+                entry = {'command': command, 'id': video_id, 'input': item}
+                if command == 'download':
+                    entry.update(format_id=format_id, audio_only=audio_only)
+                try:
+                    if command == 'info':
+                        result = await YouTubeService.get_video_info(video_id)
+                    else:
+                        result = await YouTubeService.download(video_id, format_id=format_id, audio_only=audio_only)
+                    entry.update(status='ok', result=result)
+                except Exception as e:
+                    entry.update(status='error', error=str(e))
+                entry['elapsed'] = round(time.monotonic() - start, 3)
+                write(entry)
+                progress.update(entry['status'] == 'ok')
+
+        await asyncio.gather(*(run_one(video_id, item) for video_id, item in pending.items()))
+
+    return 1 if progress.failed or invalid else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=['info', 'download'])
+    parser.add_argument('source', help='file with one URL or video ID per line, or - for stdin')
+    parser.add_argument('--manifest', required=True, help='append-only JSONL manifest of results')
+    parser.add_argument('--parallel', type=int, default=4, help='items processed concurrently')
+    parser.add_argument('--format-id', help='yt-dlp format for downloads')
+    parser.add_argument('--audio-only', action='store_true', help='download audio as mp3')
+    args = parser.parse_args()
+
+    items = read_inputs(args.source)
+    return asyncio.run(process(args.command, items, args.manifest, args.parallel, args.format_id, args.audio_only))
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import os
+import socket
 from pathlib import Path
 
 class Settings:
@@ -9,13 +10,170 @@ class Settings:
     DOWNLOAD_PATH = os.path.join(BASE_DIR, "downloads")
     os.makedirs(DOWNLOAD_PATH, exist_ok=True)
 
+    # Journal of in-flight downloads, used to resume after a restart
+    JOURNAL_FILE = os.path.join(DOWNLOAD_PATH, "journal.json")
+    # The offline CLI's own journal, so it and the server never resume each other's jobs
+    CLI_JOURNAL_FILE = os.path.join(DOWNLOAD_PATH, "cli-journal.json")
+
+    # Storage tiers: DOWNLOAD_PATH is the hot tier; the cold tier is None,
+    # "local" (a slower mount at COLD_STORAGE_PATH) or "s3" (needs boto3)
+    COLD_STORAGE = None
+    COLD_STORAGE_PATH = os.path.join(BASE_DIR, "cold")
+    COLD_S3_BUCKET = "youtube-endpoint"
+    COLD_S3_PREFIX = "artifacts"
+    COLD_S3_ENDPOINT_URL = None  # e.g. a MinIO URL; None uses AWS
+    HOT_TIER_MAX_BYTES = 50 * 1024 ** 3  # Demote LRU files above this
+    HOT_TIER_IDLE_SECONDS = 24 * 3600  # Demote files not read for this long
+    STORAGE_REBALANCE_SECONDS = 300  # How often to check the hot tier
+
     # Cookie settings
     COOKIE_FILE = os.path.join(BASE_DIR, "cookies.txt")
+    COOKIE_CHECK_SECONDS = 30  # How often to notice the cookie file being added or removed
 
     # File settings
     FILE_EXPIRY_SECONDS = 3600  # 1 hour
     MAX_RESOLUTION = "1080p"  # Maximum video resolution to allow
 
+    # Playback packaging of downloaded videos: None keeps yt-dlp's output,
+    # "faststart" (metadata first) or "fragmented" (fragmented MP4) remuxes it
+    PLAYBACK_LAYOUT = None
+    HLS_PACKAGING = False  # Also cut videos into HLS segments plus a playlist
+    HLS_SEGMENT_SECONDS = 4
+
+    # Server-side transcoding into fixed H.264/AAC renditions (needs ffmpeg);
+    # bitrates are in kbit/s with a "k" suffix
+    RENDITION_PRESETS = {
+        "360p": {"height": 360, "video_bitrate": "800k", "audio_bitrate": "96k"},
+        "480p": {"height": 480, "video_bitrate": "1400k", "audio_bitrate": "128k"},
+        "720p": {"height": 720, "video_bitrate": "2800k", "audio_bitrate": "128k"},
+        "1080p": {"height": 1080, "video_bitrate": "5000k", "audio_bitrate": "192k", "profile": "high"},
+    }
+    TRANSCODE_WORKERS = max(1, (os.cpu_count() or 2) // 2)  # ffmpeg processes running at once
+    TRANSCODE_THREADS = 2  # Threads per ffmpeg process
+    TRANSCODE_SPEED = "veryfast"  # x264 preset: speed against compression
+    TRANSCODE_TIMEOUT_SECONDS = 3600  # Longest expected transcode
+
+    # Total download bandwidth in bytes per second, shared by running downloads; None for no limit
+    DOWNLOAD_BANDWIDTH_LIMIT = None
+
+    # Worker threads for blocking work (extraction, downloads, file I/O); None uses asyncio's default count
+    EXECUTOR_WORKERS = None
+
+    # File serving offload: None serves bytes in-process, "x-accel-redirect"
+    # (nginx) or "x-sendfile" (Apache/lighttpd) hands them to the front server
+    FILE_OFFLOAD = None
+    FILE_OFFLOAD_PREFIX = "/protected-downloads/"  # nginx internal location mapped to DOWNLOAD_PATH
+
+    # Info cache settings
+    INFO_CACHE_SIZE = 10000  # Maximum number of videos kept in the info cache
+    INFO_CACHE_TTL_SECONDS = 600  # 10 minutes
+    INFO_HTTP_MAX_AGE_SECONDS = 300  # Cache-Control max-age of GET /info/{video_id}
+    INFO_HTTP_STALE_SECONDS = 3600  # ...and how long edges may serve it stale while revalidating
+
+    # Thumbnail cache: originals and resized variants, keyed by video ID
+    THUMBNAIL_PATH = os.path.join(BASE_DIR, "thumbnails")
+    THUMBNAIL_CACHE_MAX_BYTES = 1024 ** 3  # Evict least recently used videos above this
+    THUMBNAIL_WIDTHS = (120, 320, 480, 640, 1280)  # Requested widths snap up to one of these
+    THUMBNAIL_REFRESH_SECONDS = 7 * 24 * 3600  # Refetch cached thumbnails after this long
+    THUMBNAIL_MAX_AGE_SECONDS = 7 * 24 * 3600  # Cache-Control max-age for browsers and CDNs
+
+    # Subtitle settings
+    SUBTITLE_CACHE_SIZE = 5000  # Maximum number of tracks kept in the subtitle cache
+    SUBTITLE_CACHE_TTL_SECONDS = 6 * 3600
+    SUBTITLE_BATCH_MAX_ITEMS = 500  # Maximum number of videos in one batch request
+    SUBTITLE_BATCH_CONCURRENCY = 8  # Tracks fetched in parallel for one batch
+
+    # Search settings
+    SEARCH_PAGE_SIZE = 20  # Results per page
+    SEARCH_MAX_PAGES = 25  # Deepest page a cursor may reach
+    SEARCH_CACHE_SIZE = 1000  # Maximum number of queries kept in the search cache
+    SEARCH_CACHE_TTL_SECONDS = 300  # 5 minutes
+
+    # Shared state backend: "memory" (one process), "sqlite" (all workers on
+    # one node) or "redis" (all nodes; needs the redis package)
+    STATE_BACKEND = "memory"
+    STATE_SQLITE_PATH = os.path.join(BASE_DIR, "state.db")
+    STATE_REDIS_URL = "redis://localhost:6379/0"
+    NODE_ID = socket.gethostname()
+    INFO_LOCK_TTL_SECONDS = 120  # Longest expected info extraction
+    DOWNLOAD_LOCK_TTL_SECONDS = 3600  # Longest expected download
+
+    # Cluster mode: each video ID is owned by one node of a consistent-hash
+    # ring over CLUSTER_PEERS; other nodes "proxy" or "redirect" to it.
+    # Read from the environment so several local processes can differ.
+    CLUSTER_SELF = os.environ.get("CLUSTER_SELF")  # This node's base URL, e.g. http://10.0.0.1:8000
+    CLUSTER_PEERS = [peer for peer in os.environ.get("CLUSTER_PEERS", "").split(",") if peer]
+    CLUSTER_MODE = os.environ.get("CLUSTER_MODE", "proxy")
+    CLUSTER_VNODES = 128  # Virtual nodes per peer on the hash ring
+    # Shared by all nodes; proves a request was forwarded by a peer. Without
+    # it, forwarded requests are routed like any other.
+    CLUSTER_SECRET = os.environ.get("CLUSTER_SECRET")
+    CLUSTER_CONNECT_TIMEOUT_SECONDS = 5
+    CLUSTER_READ_TIMEOUT_SECONDS = 3600  # Longest wait for the owner's next bytes (a whole download)
+
+    # Prefetch: during off-peak windows (local "HH:MM-HH:MM", may wrap past
+    # midnight) warm the info cache and download the default format of the
+    # most requested videos. No windows disables it.
+    PREFETCH_WINDOWS = []  # e.g. ["02:00-06:00"]
+    PREFETCH_TOP_N = 200  # Videos warmed per window
+    PREFETCH_DOWNLOAD = True  # Also download the default format, not just the info
+    PREFETCH_HALF_LIFE_SECONDS = 24 * 3600  # Popularity counters halve this often
+    PREFETCH_MAX_TRACKED = 50000  # Videos tracked by the popularity counters
+    PREFETCH_IDLE_SECONDS = 5  # Quiet time after live traffic before prefetch resumes
+    PREFETCH_MAX_PAUSE_SECONDS = 300  # A prefetch download paused longer gives up its slot (resumes later from its .part files)
+    PREFETCH_CHECK_SECONDS = 60  # How often the scheduler checks its windows
+    PREFETCH_INFO_TTL_SECONDS = 6 * 3600  # Cache lifetime of prefetched info
+    PREFETCH_FILE_EXPIRY_SECONDS = 12 * 3600  # Lifetime of prefetched downloads
+
+    # Fair scheduling of info extraction and downloads: SCHEDULER_SLOTS are
+    # shared by weighted fair queueing across priority classes and clients
+    # (the X-API-Key header, or the client address without one)
+    SCHEDULER_SLOTS = 8  # Concurrent executor-bound jobs
+    PRIORITY_WEIGHTS = {"info": 8, "download": 4, "bulk": 1}
+    CLIENT_WEIGHTS = {}  # API key -> weight, default 1
+    CLIENT_MAX_CONCURRENCY = 4  # Slots one client may hold at once
+    CLIENT_MAX_QUEUED = 200  # Queued requests per client before 429
+    CLIENT_BYTES_PER_HOUR = None  # Downloaded bytes per client per hour, None for no limit
+
+    # Batch download settings
+    BATCH_MAX_ITEMS = 50  # Maximum number of videos in one batch request
+    BATCH_CONCURRENCY = 4  # Downloads run in parallel for one batch
+
+    # Shutdown settings
+    SHUTDOWN_GRACE_SECONDS = 30  # Time given to active downloads to finish on SIGTERM
+
+    # Readiness (GET /ready): the node reports 503 when any check fails
+    READY_MAX_EXECUTOR_BACKLOG = 32  # Blocking calls waiting for a worker thread
+    READY_MAX_QUEUED = 100  # Requests waiting for a scheduler slot
+    READY_MIN_FREE_BYTES = 2 * 1024 ** 3  # Free space under DOWNLOAD_PATH
+    READY_REQUIRE_FFMPEG = True  # Merging, thumbnails and packaging need ffmpeg on PATH
+    READY_MIN_CACHED_INFO = 0  # Cached video infos before the node counts as warm
+    READY_ERROR_WINDOW_SECONDS = 60  # Window for the upstream error rate
+    READY_MIN_UPSTREAM_CALLS = 10  # Calls in the window before the error rate counts
+    READY_MAX_UPSTREAM_ERROR_RATE = 0.5  # Failed extractions and downloads per call
+    READY_CACHE_SECONDS = 1.0  # Reuse a report for this long between polls
+
+    # Extractor traffic record/replay for offline benchmarks: None, "record"
+    # (capture yt-dlp's HTTP exchanges) or "replay" (serve them back)
+    EXTRACTOR_TRAFFIC_MODE = None
+    EXTRACTOR_FIXTURES_PATH = os.path.join(BASE_DIR, "fixtures", "extractor")
+    REPLAY_LATENCY_MS = 0  # Latency injected into every replayed response
+    REPLAY_LATENCY_JITTER_MS = 0
+
+    # Instrumentation
+    SERVER_TIMING = True  # Add Server-Timing headers and per-request timing log lines
+    LOOP_MONITOR = True  # Sample event-loop lag and log the stacks of blocking callbacks
+    LOOP_LAG_INTERVAL_SECONDS = 0.1  # How often lag is sampled
+    LOOP_BLOCK_THRESHOLD_SECONDS = 0.25  # Log the loop thread's stack when it is blocked this long
+    LOOP_LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+    FLIGHT_RECORDER_SIZE = 1000  # Recent info/download jobs kept for GET /admin/flight-recorder
+
+    # Admin API for runtime tuning; disabled unless a token is set
+    ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+    ADMIN_HISTORY_SIZE = 200  # Settings changes kept in the history
+    ADMIN_SYNC_SECONDS = 5  # How often workers pick up settings changed through another worker (shared state backends)
+    PROFILE_MAX_SECONDS = 60  # Longest sampling profile the admin API will run
+
     # API settings
     API_V1_STR = "/api/v1"
 
@@ -1,13 +1,64 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+import asyncio
 import datetime
+import signal
 
 from routers.youtube import router as youtube_router
+from routers.admin import router as admin_router
+from services.youtube import YouTubeService
+from services.cluster import cluster
+from services.prefetch import run_prefetch_scheduler
+from services.executor import install_executor
+from services.readiness import readiness
+from services.loop_monitor import loop_monitor
+from services.admin import runtime_config
+from services.timing import ServerTimingMiddleware
+from config import settings
+
+def _install_sigterm_handler():
+    """
+    Stop accepting downloads as soon as SIGTERM arrives, then hand the
+    signal on to the server's own handler
+    """
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def _handle_sigterm(signum, frame):
+        YouTubeService.stop_accepting()
+        if callable(previous):
+            previous(signum, frame)
+
+    try:
+        signal.signal(signal.SIGTERM, _handle_sigterm)
+    except ValueError:
+        # Not running in the main thread (e.g. under a test client)
+        pass
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    _install_sigterm_handler()
+    install_executor(settings.EXECUTOR_WORKERS)
+    YouTubeService.resume_pending()
+    rebalancer = asyncio.create_task(YouTubeService.run_storage_rebalancer())
+    prefetcher = asyncio.create_task(run_prefetch_scheduler())
+    monitor = asyncio.create_task(loop_monitor.run()) if settings.LOOP_MONITOR else None
+    settings_sync = asyncio.create_task(runtime_config.run_sync())
+    yield
+    rebalancer.cancel()
+    prefetcher.cancel()
+    settings_sync.cancel()
+    if monitor is not None:
+        monitor.cancel()
+    await YouTubeService.drain(settings.SHUTDOWN_GRACE_SECONDS)
+    await cluster.close()
 
 app = FastAPI(
     title="YouTube Endpoint",
     description="API for YouTube related operations",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -19,8 +70,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage Server-Timing headers and structured timing logs
+if settings.SERVER_TIMING:
+    app.add_middleware(ServerTimingMiddleware)
+
 # Include routers
 app.include_router(youtube_router)
+app.include_router(admin_router)
 
 @app.get("/")
 async def root():
@@ -30,6 +86,19 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.datetime.now().isoformat()}
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness for load balancers: 503 while saturated, out of disk, missing
+    ffmpeg, draining or seeing mostly upstream errors
+    """
+    report = readiness()
+    return JSONResponse(
+        report,
+        status_code=200 if report['status'] == 'ready' else 503,
+        headers={'Cache-Control': 'no-store'},
+    )
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000, timeout_graceful_shutdown=settings.SHUTDOWN_GRACE_SECONDS) 
\ No newline at end of file
@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from typing import Any, Dict, Optional
+import secrets
+
+from services.admin import runtime_config
+from services.profiler import profiler, ProfilerBusyError
+from services.flight_recorder import flight_recorder
+from config import settings
+
+async def require_admin(req: Request) -> None:
+    """
+    Allow only callers presenting ADMIN_TOKEN, as a bearer token or in X-Admin-Token
+    """
+    if not settings.ADMIN_TOKEN:
+        # The admin API does not exist unless a token is configured
+        raise HTTPException(status_code=404, detail="Not Found")
+    authorization = req.headers.get('authorization', '')
+    token = authorization[7:] if authorization.lower().startswith('bearer ') else req.headers.get('x-admin-token', '')
+    if not secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+router = APIRouter(
+    prefix=settings.API_V1_STR + "/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)],
+)
+
+@router.get("/settings")
+async def get_settings():
+    """
+    Current values of the settings that can be changed at runtime
+    """
+    return runtime_config.values()
+
+@router.patch("/settings")
+async def update_settings(req: Request, changes: Dict[str, Any] = Body(...)):
+    """
+    Change settings at runtime; all changes apply together or not at all.
+
+    The change applies at once in the worker serving the request. Other
+    workers (and nodes) pick it up within ADMIN_SYNC_SECONDS only with a
+    shared STATE_BACKEND; with the in-memory backend and several workers,
+    each worker keeps its own settings.
+    """
+    actor = req.headers.get('x-admin-actor') or (req.client.host if req.client else 'unknown')
+    try:
+        entry = runtime_config.update(changes, actor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await runtime_config.publish(entry)
+    return {'change': entry, 'settings': runtime_config.values()}
+
+@router.get("/history")
+async def get_history():
+    """
+    Recent runtime settings changes, newest first
+    """
+    return runtime_config.history()
+
+@router.get("/flight-recorder")
+async def get_flight_recorder(
+    kind: Optional[str] = Query(None, pattern="^(info|download|transcode)$"),
+    video_id: Optional[str] = None,
+    errors: bool = False,
+    order: str = Query("recent", pattern="^(recent|slowest)$"),
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """
+    Recent info extractions, downloads and transcodes with stage timings, source,
+    retries, client, bytes and errors; newest or slowest first
+    """
+    return flight_recorder.query(kind=kind, video_id=video_id, errors_only=errors, order=order, limit=limit)
+
+@router.get("/profile", response_class=PlainTextResponse)
+async def profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(10, ge=1, le=1000),
+    idle: bool = False,
+):
+    """
+    Sample the event-loop and executor threads for `seconds` and return
+    collapsed stacks for a flamegraph; waiting threads are left out unless
+    `idle` is set
+    """
+    if seconds > settings.PROFILE_MAX_SECONDS:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {settings.PROFILE_MAX_SECONDS}")
+    try:
+        stacks = await profiler.profile(seconds, interval_ms / 1000, include_idle=idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(stacks)
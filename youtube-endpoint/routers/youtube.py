@@ -1,31 +1,202 @@
-from fastapi import APIRouter, HTTPException, Request, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from typing import List, Optional
+import asyncio
+import json
 import os
 
-from schemas import VideoInfo, VideoRequest, DownloadRequest, DownloadResult
-from services.youtube import YouTubeService
+from schemas import VideoInfo, SearchPage, VideoRequest, DownloadRequest, BatchDownloadRequest, SubtitleBatchRequest, TranscodeRequest, DownloadResult, TranscodeResult, JobRecord
+from services.youtube import YouTubeService, ServiceUnavailableError
+from services.archive import stream_zip
+from services.artifacts import artifact_index
+from services.file_responses import artifact_response, small_file_response, etag_matches
+from services.cluster import cluster
+from services.media_id import canonical_video_id
+from services.subtitles import to_vtt, to_text
+from services.scheduler import fair_scheduler, current_client, QuotaExceededError
+from services.timing import TimedRoute
+from services import aiofs
+from services.loop_monitor import loop_monitor
 from config import settings
 
-router = APIRouter(prefix=settings.API_V1_STR, tags=["youtube"])
+async def identify_client(req: Request) -> None:
+    """
+    Attribute the request to a client for fair scheduling and quotas: its
+    API key, or its address when it has none; for requests proxied by a
+    peer, the client the peer named
+    """
+    api_key = req.headers.get('x-api-key')
+    current_client.set(cluster.forwarded_client(req) or api_key or f"addr:{req.client.host if req.client else 'unknown'}")
+
+router = APIRouter(
+    prefix=settings.API_V1_STR,
+    tags=["youtube"],
+    route_class=TimedRoute,
+    dependencies=[Depends(identify_client)],
+)
 
 @router.post("/info", response_model=VideoInfo)
-async def get_video_info(request: VideoRequest):
+async def get_video_info(request: VideoRequest, req: Request):
     """
     Get information about a YouTube video
     """
+    # In cluster mode the node owning the video answers
+    owner = cluster.remote_owner(canonical_video_id(request.url), req)
+    if owner:
+        return await cluster.forward(req, owner)
+    
     try:
         video_info = await YouTubeService.get_video_info(request.url)
         return video_info
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get video info: {str(e)}")
+
+@router.get("/info/{video_id}", response_model=VideoInfo)
+async def get_video_info_by_id(video_id: str, req: Request):
+    """
+    Get information about a YouTube video by ID, cacheable by browsers and
+    CDNs and revalidated with If-None-Match
+    """
+    try:
+        video_id = canonical_video_id(video_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # In cluster mode the node owning the video answers
+    owner = cluster.remote_owner(video_id, req)
+    if owner:
+        return await cluster.forward(req, owner)
+    
+    try:
+        record = await YouTubeService.get_info_record(video_id)
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get video info: {str(e)}")
+    
+    headers = {
+        'ETag': record.etag,
+        'Cache-Control': f"public, max-age={settings.INFO_HTTP_MAX_AGE_SECONDS}, stale-while-revalidate={settings.INFO_HTTP_STALE_SECONDS}",
+    }
+    # Revalidation is answered from the cached record without serializing it
+    if_none_match = req.headers.get('if-none-match')
+    if if_none_match and etag_matches(if_none_match, record.etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(record.to_dict(), headers=headers)
+
+@router.get("/search", response_model=SearchPage)
+async def search(q: Optional[str] = Query(None, max_length=200), cursor: Optional[str] = None):
+    """
+    Search YouTube videos; follow `next_cursor` for more results
+    """
+    try:
+        return await YouTubeService.search(query=q, cursor=cursor)
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to search: {str(e)}")
+
+@router.api_route("/thumbnail/{video_id}", methods=["GET", "HEAD"])
+async def get_thumbnail(video_id: str, req: Request, w: Optional[int] = Query(None, ge=1, le=4096)):
+    """
+    Serve a video's thumbnail from the local cache, optionally resized to width `w`
+    """
+    try:
+        video_id = canonical_video_id(video_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # In cluster mode the node owning the video keeps its thumbnails
+    owner = cluster.remote_owner(video_id, req)
+    if owner:
+        return await cluster.forward(req, owner)
+    
+    try:
+        artifact = await YouTubeService.get_thumbnail(video_id, w)
+        cache_control = f"public, max-age={settings.THUMBNAIL_MAX_AGE_SECONDS}, stale-while-revalidate={settings.THUMBNAIL_MAX_AGE_SECONDS}"
+        return await small_file_response(req, artifact, cache_control)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get thumbnail: {str(e)}")
+
+def _render_subtitles(subtitles: dict, format: str) -> str:
+    return to_vtt(subtitles['cues']) if format == 'vtt' else to_text(subtitles['cues'])
+
+@router.get("/subtitles/{video_id}")
+async def get_subtitles(video_id: str, req: Request, lang: str = 'en',
+                        format: str = Query('vtt', pattern='^(vtt|text)$'), auto: bool = True):
+    """
+    Get a video's subtitles in a language as compact WebVTT or plain text
+    """
+    try:
+        video_id = canonical_video_id(video_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # In cluster mode the node owning the video has its info cached
+    owner = cluster.remote_owner(video_id, req)
+    if owner:
+        return await cluster.forward(req, owner)
+    
+    try:
+        subtitles = await YouTubeService.get_subtitles(video_id, lang=lang, auto=auto)
+        return Response(
+            content=_render_subtitles(subtitles, format),
+            media_type='text/vtt' if format == 'vtt' else 'text/plain',
+            headers={'Content-Language': subtitles['language'], 'X-Subtitle-Kind': subtitles['kind']},
+        )
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get subtitles: {str(e)}")
+
+@router.post("/subtitles/batch")
+async def get_subtitles_batch(request: SubtitleBatchRequest):
+    """
+    Get subtitles of several videos, streamed back as one JSON line per
+    video in completion order
+    """
+    async def lines():
+        async for url, subtitles, error in YouTubeService.subtitles_batch(
+            urls=request.urls,
+            lang=request.lang,
+            auto=request.auto
+        ):
+            if error:
+                entry = {'url': url, 'error': error}
+            else:
+                entry = {
+                    'url': url,
+                    'id': subtitles['id'],
+                    'language': subtitles['language'],
+                    'kind': subtitles['kind'],
+                    'content': _render_subtitles(subtitles, request.format),
+                }
+            yield json.dumps(entry) + '\n'
+    
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
 
 @router.post("/download", response_model=DownloadResult)
 async def download_video(request: DownloadRequest, background_tasks: BackgroundTasks, req: Request):
     """
     Download a YouTube video with the specified format
     """
+    # In cluster mode the node owning the video downloads and stores it
+    owner = cluster.remote_owner(canonical_video_id(request.url), req)
+    if owner:
+        return await cluster.forward(req, owner)
+    
     try:
         # Download the video
         download_result = await YouTubeService.download(
@@ -38,45 +209,154 @@ async def download_video(request: DownloadRequest, background_tasks: BackgroundT
         base_url = str(req.base_url).rstrip('/')
         download_url = f"{base_url}{settings.API_V1_STR}/file/{download_result['relative_path']}"
         download_result['download_url'] = download_url
+        if download_result.get('hls_relative_path'):
+            download_result['hls_url'] = f"{base_url}{settings.API_V1_STR}/file/{download_result['hls_relative_path']}"
         
         return download_result
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to download video: {str(e)}")
 
-@router.get("/file/{file_path:path}")
+@router.post("/transcode", response_model=TranscodeResult)
+async def transcode_video(request: TranscodeRequest, req: Request):
+    """
+    Produce preset renditions of a video (downloading it first if needed);
+    renditions that already exist are reused
+    """
+    # In cluster mode the node owning the video keeps its downloads and renditions
+    owner = cluster.remote_owner(canonical_video_id(request.url), req)
+    if owner:
+        return await cluster.forward(req, owner)
+    
+    try:
+        result = await YouTubeService.transcode(request.url, request.renditions, format_id=request.format_id)
+        base_url = str(req.base_url).rstrip('/')
+        for rendition in result['renditions']:
+            if rendition['relative_path']:
+                rendition['url'] = f"{base_url}{settings.API_V1_STR}/file/{rendition['relative_path']}"
+        return result
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to transcode video: {str(e)}")
+
+@router.post("/download/batch")
+async def download_batch(request: BatchDownloadRequest):
+    """
+    Download several YouTube videos and stream them back as one ZIP archive
+    """
+    if not YouTubeService.is_accepting():
+        raise HTTPException(status_code=503, detail="Service is shutting down and not accepting new downloads")
+    
+    async def members():
+        errors = []
+        names = set()
+        async for url, result, error in YouTubeService.download_batch(
+            urls=request.urls,
+            format_id=request.format_id,
+            audio_only=request.audio_only
+        ):
+            if error:
+                errors.append(f"{url}: {error}")
+                continue
+            
+            # Avoid duplicate member names when titles collide
+            arcname = os.path.basename(result['file_path'])
+            if arcname in names:
+                arcname = f"{result['id']}_{arcname}"
+            names.add(arcname)
+            # Read through the storage tiers: a reused download may have been demoted
+            yield arcname, result['relative_path']
+        
+        if errors:
+            yield 'errors.txt', ('\n'.join(errors) + '\n').encode('utf-8')
+    
+    return StreamingResponse(
+        stream_zip(YouTubeService.storage, members()),
+        media_type='application/zip',
+        headers={"Content-Disposition": "attachment; filename=\"videos.zip\""}
+    )
+
+@router.get("/queue")
+async def queue_status():
+    """
+    Scheduler slots, and per-client running work, queue depth, wait times and
+    bytes downloaded; plus the transcode pool
+    """
+    return dict(fair_scheduler.snapshot(), transcode=YouTubeService._transcoder.snapshot())
+
+@router.get("/loop")
+async def loop_lag():
+    """
+    Event-loop lag histograms since start and over the last minute
+    """
+    return loop_monitor.snapshot()
+
+@router.get("/jobs", response_model=List[JobRecord])
+async def list_jobs():
+    """
+    List in-flight download jobs across all workers sharing the state backend
+    """
+    return await YouTubeService.list_jobs()
+
+def _normalize_file_path(file_path: str) -> Optional[str]:
+    """
+    Normalize a requested path to a relative path inside DOWNLOAD_PATH, or
+    None if it escapes it. Artifacts always live in a per-download
+    directory, so files at the top level (such as the download journal) are
+    never served.
+    """
+    root = os.path.realpath(settings.DOWNLOAD_PATH)
+    full_path = os.path.realpath(os.path.join(root, file_path))
+    if os.path.commonpath([root, full_path]) != root or full_path == root or os.path.dirname(full_path) == root:
+        return None
+    return os.path.relpath(full_path, root).replace(os.sep, '/')
+
+@router.api_route("/file/{file_path:path}", methods=["GET", "HEAD"])
 async def serve_file(file_path: str, req: Request):
     """
     Serve a downloaded file
     """
+    # Artifacts live in "<video id>_<timestamp>/" directories on the owning node
+    owner = cluster.remote_owner(file_path[:11], req)
+    if owner:
+        return await cluster.forward(req, owner)
+    
     try:
-        # Construct absolute path from relative path
-        full_path = os.path.join(settings.DOWNLOAD_PATH, file_path)
+        storage = YouTubeService.storage
         
-        # Check if file exists
-        if not os.path.exists(full_path):
-            raise HTTPException(status_code=404, detail="File not found or expired")
+        # Published artifacts are answered from the index without touching the filesystem
+        artifact = artifact_index.get(file_path)
+        if artifact is None:
+            # Resolving symlinks stats every path component, so it runs off the loop too
+            relative_path = await aiofs.run(_normalize_file_path, file_path)
+            if relative_path is None:
+                raise HTTPException(status_code=404, detail="File not found or expired")
+            
+            # Published before a restart, possibly demoted since
+            artifact = await aiofs.run(YouTubeService.load_artifact, relative_path)
+            if artifact is None:
+                raise HTTPException(status_code=404, detail="File not found or expired")
+            if artifact.expired:
+                artifact_index.remove(artifact.relative_path)
+                raise HTTPException(status_code=404, detail="File not found or expired")
         
-        # Get file information
-        file_info = {
-            'name': os.path.basename(full_path),
-            'content_type': 'video/mp4' if full_path.endswith('.mp4') else 'audio/mpeg' if full_path.endswith('.mp3') else 'application/octet-stream'
-        }
+        # Serve cold files from the cold tier now and promote them for next time
+        storage.touch(artifact.relative_path)
+        if storage.is_cold(artifact.relative_path):
+            asyncio.get_event_loop().run_in_executor(None, storage.promote, artifact.relative_path)
         
-        # Set headers for download
-        headers = {
-            "Content-Disposition": f"attachment; filename=\"{file_info['name']}\"",
-        }
-        
-        # Return file response
-        return FileResponse(
-            path=full_path,
-            media_type=file_info['content_type'],
-            headers=headers,
-            filename=file_info['name']
-        )
+        return artifact_response(req, artifact, storage)
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error serving file: {str(e)}") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error serving file: {str(e)}")
\ No newline at end of file
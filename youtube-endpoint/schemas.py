@@ -1,6 +1,15 @@
 from typing import List, Dict, Optional
 from pydantic import BaseModel, validator
-import re
+
+from config import settings
+from services.media_id import parse_media_ref
+
+def normalize_youtube_url(v: str) -> str:
+    """Validate a YouTube URL or ID, converting it to the canonical watch URL"""
+    try:
+        return parse_media_ref(v).url
+    except ValueError:
+        raise ValueError('Invalid YouTube URL or ID')
 
 class VideoFormat(BaseModel):
     """Format of a YouTube video"""
@@ -32,24 +41,85 @@ class VideoInfo(BaseModel):
     upload_date: Optional[str] = None
     formats: List[VideoFormat] = []
 
+class SearchResult(BaseModel):
+    """Lightweight search result; use /info for the full details"""
+    id: str
+    title: str
+    url: str
+    duration: Optional[int] = None
+    channel: Optional[str] = None
+    view_count: Optional[int] = None
+    thumbnail: Optional[str] = None
+
+class SearchPage(BaseModel):
+    """One page of search results"""
+    query: str
+    page: int
+    results: List[SearchResult] = []
+    next_cursor: Optional[str] = None
+
 class VideoRequest(BaseModel):
     """Request to fetch video information or download"""
     url: str
     
     @validator('url')
     def validate_youtube_url(cls, v):
-        if not re.match(r'(?:https?:\/\/)?(?:www\.)?(?:youtube\.com|youtu\.be)\/(?:watch\?v=)?([^\s&]+)', v):
-            if re.match(r'^[0-9A-Za-z_-]{11}$', v):
-                # Valid YouTube ID, convert to URL
-                return f"https://www.youtube.com/watch?v={v}"
-            raise ValueError('Invalid YouTube URL or ID')
-        return v
+        return normalize_youtube_url(v)
 
 class DownloadRequest(VideoRequest):
     """Request to download a video"""
     format_id: Optional[str] = None
     audio_only: bool = False
 
+class BatchDownloadRequest(BaseModel):
+    """Request to download several videos as one ZIP archive"""
+    urls: List[str]
+    format_id: Optional[str] = None
+    audio_only: bool = False
+    
+    @validator('urls')
+    def validate_youtube_urls(cls, v):
+        if not v:
+            raise ValueError('At least one URL is required')
+        if len(v) > settings.BATCH_MAX_ITEMS:
+            raise ValueError(f'At most {settings.BATCH_MAX_ITEMS} URLs are allowed per batch')
+        return [normalize_youtube_url(url) for url in v]
+
+class SubtitleBatchRequest(BaseModel):
+    """Request for the subtitles of several videos"""
+    urls: List[str]
+    lang: str = 'en'
+    format: str = 'vtt'
+    auto: bool = True
+    
+    @validator('urls')
+    def validate_youtube_urls(cls, v):
+        if not v:
+            raise ValueError('At least one URL is required')
+        if len(v) > settings.SUBTITLE_BATCH_MAX_ITEMS:
+            raise ValueError(f'At most {settings.SUBTITLE_BATCH_MAX_ITEMS} URLs are allowed per batch')
+        return [normalize_youtube_url(url) for url in v]
+    
+    @validator('format')
+    def validate_format(cls, v):
+        if v not in ('vtt', 'text'):
+            raise ValueError('Format must be "vtt" or "text"')
+        return v
+
+class TranscodeRequest(VideoRequest):
+    """Request for preset renditions of a video"""
+    renditions: List[str]
+    format_id: Optional[str] = None
+    
+    @validator('renditions')
+    def validate_renditions(cls, v):
+        if not v:
+            raise ValueError('At least one rendition is required')
+        unknown = [name for name in v if name not in settings.RENDITION_PRESETS]
+        if unknown:
+            raise ValueError(f'Unknown rendition(s): {", ".join(unknown)}')
+        return v
+
 class DownloadResult(BaseModel):
     """Result of a download operation"""
     id: str
@@ -61,4 +131,30 @@ class DownloadResult(BaseModel):
     format: str
     expiry_time: int
     audio_only: bool
-    download_url: Optional[str] = None 
\ No newline at end of file
+    download_url: Optional[str] = None
+    hls_relative_path: Optional[str] = None
+    hls_url: Optional[str] = None
+
+class Rendition(BaseModel):
+    """One rendition of a transcode, or the error that prevented it"""
+    name: str
+    relative_path: Optional[str] = None
+    file_size: Optional[int] = None
+    url: Optional[str] = None
+    error: Optional[str] = None
+
+class TranscodeResult(BaseModel):
+    """Renditions produced (or reused) for a downloaded video"""
+    id: str
+    title: str
+    source_relative_path: str
+    expiry_time: int
+    renditions: List[Rendition]
+
+class JobRecord(BaseModel):
+    """An in-flight download job, possibly on another worker or node"""
+    key: str
+    id: str
+    format: str
+    node: str
+    started_at: float
\ No newline at end of file
@@ -0,0 +1,208 @@
+import json
+import time
+import uuid
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence
+
+from config import settings
+from services.youtube import YouTubeService
+from services.scheduler import fair_scheduler
+from services.executor import install_executor
+from services.state import state_backend
+
+logger = logging.getLogger(__name__)
+
+# Latest settings in a shared state backend, and how long they are kept there
+_SHARED_KEY = 'admin:settings'
+_SHARED_TTL_SECONDS = 365 * 24 * 3600
+
+class Tunable:
+    """
+    A setting that can be changed at runtime: how to validate a new value
+    and how to push it into the running components that copied it
+    """
+    __slots__ = ('kind', 'minimum', 'maximum', 'choices', 'nullable', 'apply')
+
+    def __init__(self, kind: type, minimum: Optional[float] = None, maximum: Optional[float] = None,
+                 choices: Optional[Sequence] = None, nullable: bool = False,
+                 apply: Optional[Callable[[Any], None]] = None):
+        self.kind = kind
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+        self.nullable = nullable
+        self.apply = apply
+
+    def validate(self, name: str, value: Any) -> Any:
+        if value is None:
+            if self.nullable:
+                return None
+            raise ValueError(f"{name} cannot be null")
+        if self.kind is dict:
+            if not isinstance(value, dict) or not all(isinstance(v, (int, float)) and v > 0 for v in value.values()):
+                raise ValueError(f"{name} must map names to positive numbers")
+            return {str(k): float(v) for k, v in value.items()}
+        if self.kind in (int, float):
+            # bool is an int subclass, but never a meaningful limit
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or (self.kind is int and value != int(value)):
+                raise ValueError(f"{name} must be {'an integer' if self.kind is int else 'a number'}")
+            value = self.kind(value)
+            if self.minimum is not None and value < self.minimum:
+                raise ValueError(f"{name} must be at least {self.minimum}")
+            if self.maximum is not None and value > self.maximum:
+                raise ValueError(f"{name} must be at most {self.maximum}")
+            return value
+        if not isinstance(value, self.kind):
+            raise ValueError(f"{name} must be a {self.kind.__name__}")
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f"{name} must be one of {', '.join(map(str, self.choices))}")
+        return value
+
+def _tunables() -> Dict[str, Tunable]:
+    pager = YouTubeService._search_pager
+    return {
+        # Pool sizes
+        'EXECUTOR_WORKERS': Tunable(int, 1, 512, nullable=True, apply=install_executor),
+        'SCHEDULER_SLOTS': Tunable(int, 1, 512, apply=lambda v: fair_scheduler.configure(slots=v)),
+        'BATCH_CONCURRENCY': Tunable(int, 1, 64),
+        'SUBTITLE_BATCH_CONCURRENCY': Tunable(int, 1, 64),
+        # Queue caps and quotas
+        'PRIORITY_WEIGHTS': Tunable(dict, apply=lambda v: fair_scheduler.configure(priority_weights=v)),
+        'CLIENT_WEIGHTS': Tunable(dict, apply=lambda v: fair_scheduler.configure(client_weights=v)),
+        'CLIENT_MAX_CONCURRENCY': Tunable(int, 1, 512, apply=lambda v: fair_scheduler.configure(max_per_client=v)),
+        'CLIENT_MAX_QUEUED': Tunable(int, 0, 100000, apply=lambda v: fair_scheduler.configure(max_queued_per_client=v)),
+        'CLIENT_BYTES_PER_HOUR': Tunable(int, 1, nullable=True, apply=lambda v: fair_scheduler.configure(bytes_per_hour=v)),
+        'BATCH_MAX_ITEMS': Tunable(int, 1, 10000),
+        'SUBTITLE_BATCH_MAX_ITEMS': Tunable(int, 1, 100000),
+        # Bandwidth budget
+        'DOWNLOAD_BANDWIDTH_LIMIT': Tunable(int, 1024, nullable=True),
+        # Cache sizes and TTLs
+        'INFO_CACHE_SIZE': Tunable(int, 0, 10000000, apply=lambda v: YouTubeService._info_cache.configure(max_size=v)),
+        'INFO_CACHE_TTL_SECONDS': Tunable(int, 1, 7 * 24 * 3600, apply=lambda v: YouTubeService._info_cache.configure(ttl_seconds=v)),
+        'INFO_HTTP_MAX_AGE_SECONDS': Tunable(int, 0, 7 * 24 * 3600),
+        'INFO_HTTP_STALE_SECONDS': Tunable(int, 0, 7 * 24 * 3600),
+        'SUBTITLE_CACHE_SIZE': Tunable(int, 0, 10000000, apply=lambda v: YouTubeService._subtitle_cache.configure(max_size=v)),
+        'SUBTITLE_CACHE_TTL_SECONDS': Tunable(int, 1, 7 * 24 * 3600, apply=lambda v: YouTubeService._subtitle_cache.configure(ttl_seconds=v)),
+        'SEARCH_CACHE_SIZE': Tunable(int, 1, 1000000, apply=lambda v: pager.configure(max_queries=v)),
+        'SEARCH_CACHE_TTL_SECONDS': Tunable(int, 1, 24 * 3600, apply=lambda v: pager.configure(ttl_seconds=v)),
+        'THUMBNAIL_CACHE_MAX_BYTES': Tunable(int, 0, apply=lambda v: setattr(YouTubeService._thumbnails, 'max_bytes', v)),
+        # Expiry and output
+        'FILE_EXPIRY_SECONDS': Tunable(int, 60, 30 * 24 * 3600),
+        'PREFETCH_FILE_EXPIRY_SECONDS': Tunable(int, 60, 30 * 24 * 3600),
+        'MAX_RESOLUTION': Tunable(str, choices=('144p', '240p', '360p', '480p', '720p', '1080p', '1440p', '2160p', '4320p')),
+        # Readiness thresholds
+        'READY_MAX_EXECUTOR_BACKLOG': Tunable(int, 0),
+        'READY_MAX_QUEUED': Tunable(int, 0),
+        'READY_MIN_FREE_BYTES': Tunable(int, 0),
+        'READY_REQUIRE_FFMPEG': Tunable(bool),
+        'READY_MIN_CACHED_INFO': Tunable(int, 0),
+        'READY_MIN_UPSTREAM_CALLS': Tunable(int, 1),
+        'READY_MAX_UPSTREAM_ERROR_RATE': Tunable(float, 0, 1),
+    }
+
+class RuntimeConfig:
+    """
+    Operational settings that can be changed while the service runs.
+
+    An update is validated as a whole, then applied on the event loop with
+    no await in between, so concurrent requests see either all of the old
+    values or all of the new ones; if a component rejects a value, the
+    values already applied are rolled back.
+
+    Each worker process holds its own settings. With a shared state backend,
+    `publish` stores the full set after a change and `run_sync` applies the
+    latest stored set in every other worker (or node) within
+    ADMIN_SYNC_SECONDS, including workers started later. With the in-memory
+    backend a change reaches only the worker that served it, and a restart
+    goes back to config.py.
+    """
+
+    def __init__(self, tunables: Dict[str, Tunable], history_size: int):
+        self.tunables = tunables
+        self._history: Deque[Dict] = deque(maxlen=history_size)
+        self._version = 0
+        # Revision of the shared settings this worker last stored or applied
+        self._revision: Optional[str] = None
+
+    def values(self) -> Dict[str, Any]:
+        return {name: getattr(settings, name) for name in self.tunables}
+
+    def update(self, changes: Dict[str, Any], actor: str) -> Dict:
+        """
+        Validate and apply a set of changes atomically, returning the history entry
+        """
+        unknown = sorted(set(changes) - set(self.tunables))
+        if unknown:
+            raise ValueError(f"Not tunable at runtime: {', '.join(unknown)}")
+        validated = {name: self.tunables[name].validate(name, value) for name, value in changes.items()}
+        validated = {name: value for name, value in validated.items() if value != getattr(settings, name)}
+
+        previous = {name: getattr(settings, name) for name in validated}
+        applied = []
+        try:
+            for name, value in validated.items():
+                setattr(settings, name, value)
+                applied.append(name)
+                if self.tunables[name].apply:
+                    self.tunables[name].apply(value)
+        except Exception as e:
+            for name in reversed(applied):
+                setattr(settings, name, previous[name])
+                if self.tunables[name].apply:
+                    self.tunables[name].apply(previous[name])
+            raise ValueError(f"Could not apply settings: {str(e)}")
+
+        self._version += 1
+        entry = {
+            'version': self._version,
+            'time': time.time(),
+            'actor': actor,
+            'changes': {name: {'old': previous[name], 'new': value} for name, value in validated.items()},
+        }
+        self._history.append(entry)
+        logger.info(f"Settings changed by {actor}: {entry['changes']}")
+        return entry
+
+    def history(self) -> List[Dict]:
+        """
+        Applied changes, newest first
+        """
+        return list(reversed(self._history))
+
+    async def publish(self, entry: Dict) -> None:
+        """
+        Store the current settings for the other workers, after a change
+        """
+        if not state_backend.shared:
+            return
+        # Taken before the write, so a sync already in flight does not undo the change
+        self._revision = uuid.uuid4().hex
+        data = json.dumps({'revision': self._revision, 'actor': entry['actor'], 'values': self.values()}).encode('utf-8')
+        await asyncio.get_event_loop().run_in_executor(None, state_backend.set_cache, _SHARED_KEY, data, _SHARED_TTL_SECONDS)
+
+    async def run_sync(self) -> None:
+        """
+        Periodically apply settings changed through another worker
+        """
+        if not state_backend.shared:
+            return
+        loop = asyncio.get_event_loop()
+        while True:
+            seen = self._revision
+            try:
+                data = await loop.run_in_executor(None, state_backend.get_cache, _SHARED_KEY)
+                shared = json.loads(data) if data is not None else None
+                # Skip if nothing is stored, nothing is new, or this worker changed something meanwhile
+                if shared is not None and shared['revision'] != seen and self._revision == seen:
+                    self._revision = shared['revision']
+                    changes = {name: value for name, value in shared['values'].items()
+                               if name in self.tunables and value != getattr(settings, name)}
+                    if changes:
+                        self.update(changes, f"{shared['actor']} (shared)")
+            except Exception as e:
+                logger.error(f"Could not apply shared settings: {str(e)}")
+            await asyncio.sleep(settings.ADMIN_SYNC_SECONDS)
+
+runtime_config = RuntimeConfig(_tunables(), settings.ADMIN_HISTORY_SIZE)
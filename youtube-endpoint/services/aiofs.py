@@ -0,0 +1,61 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from services import timing
+
+logger = logging.getLogger(__name__)
+
+def run(fn: Callable, *args) -> asyncio.Future:
+    """
+    Run a blocking filesystem call in the default executor; on a loaded or
+    network filesystem even a stat can take long enough to stall the loop
+    """
+    return timing.run_in_executor(fn, *args, stage_name='fs')
+
+def _non_empty(path: str) -> bool:
+    try:
+        return os.path.getsize(path) > 0
+    except OSError:
+        return False
+
+class FileProbe:
+    """
+    Whether an optional, non-empty file (such as a cookie file) is present,
+    re-checked at most every `interval` seconds. From the event loop the
+    re-check runs in the background and callers get the last known answer,
+    so reading it never touches the filesystem.
+    """
+
+    def __init__(self, path: str, interval: float):
+        self.path = path
+        self.interval = interval
+        self._present = _non_empty(path)
+        self._checked = time.monotonic()
+        self._checking = False
+
+    def _refresh(self) -> None:
+        present = _non_empty(self.path)
+        if present != self._present:
+            logger.info(f"{self.path} is now {'present' if present else 'missing or empty'}")
+        self._present = present
+        self._checking = False
+
+    def get(self) -> Optional[str]:
+        """
+        The path if the file was present at the last check, else None
+        """
+        now = time.monotonic()
+        if now - self._checked >= self.interval and not self._checking:
+            self._checked = now
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # Worker thread or CLI: checking inline is fine
+                self._refresh()
+            else:
+                self._checking = True
+                loop.run_in_executor(None, self._refresh)
+        return self.path if self._present else None
@@ -0,0 +1,159 @@
+import os
+import time
+import tempfile
+import threading
+import mimetypes
+from typing import Dict, Optional
+
+from config import settings
+
+# Types mimetypes does not know everywhere
+_CONTENT_TYPES = {
+    '.mp4': 'video/mp4',
+    '.m4a': 'audio/mp4',
+    '.mp3': 'audio/mpeg',
+    '.webm': 'video/webm',
+    '.mkv': 'video/x-matroska',
+    '.webp': 'image/webp',
+    '.m3u8': 'application/vnd.apple.mpegurl',
+    '.m4s': 'video/iso.segment',
+}
+
+# Expiry of everything in a download directory, kept next to the files so it
+# survives restarts (dot-prefixed, so it is never served or demoted)
+_EXPIRY_FILE = '.expiry'
+
+def _expiry_path(relative_path: str) -> str:
+    return os.path.join(settings.DOWNLOAD_PATH, relative_path.split('/', 1)[0], _EXPIRY_FILE)
+
+def write_expiry(relative_path: str, expiry_time: int) -> None:
+    """
+    Record when the download directory holding a file expires
+    """
+    path = _expiry_path(relative_path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f"{_EXPIRY_FILE}.")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(int(expiry_time)))
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def read_expiry(relative_path: str) -> Optional[int]:
+    """
+    Recorded expiry of the download directory holding a file, if any
+    """
+    try:
+        with open(_expiry_path(relative_path)) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def guess_content_type(path: str) -> str:
+    """
+    Content type of an artifact from its extension
+    """
+    ext = os.path.splitext(path)[1].lower()
+    return _CONTENT_TYPES.get(ext) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+class Artifact:
+    """Metadata of a published file, enough to answer HTTP requests for it"""
+    __slots__ = ('relative_path', 'path', 'size', 'mtime', 'etag', 'content_type', 'expiry_time')
+
+    def __init__(self, relative_path: str, path: str, size: int, mtime: float,
+                 etag: str, content_type: str, expiry_time: int):
+        self.relative_path = relative_path
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self.content_type = content_type
+        self.expiry_time = expiry_time
+
+    @property
+    def expired(self) -> bool:
+        return self.expiry_time < time.time()
+
+    @classmethod
+    def from_stat(cls, relative_path: str, path: str, size: int, mtime: float,
+                  expiry_time: Optional[int] = None) -> 'Artifact':
+        """
+        Build metadata from a file's size and mtime; without an expiry, the
+        file is taken to expire FILE_EXPIRY_SECONDS after it was written
+        """
+        if expiry_time is None:
+            expiry_time = int(mtime) + settings.FILE_EXPIRY_SECONDS
+        return cls(
+            relative_path=relative_path,
+            path=path,
+            size=size,
+            mtime=mtime,
+            # Artifacts are never rewritten in place and keep their mtime when
+            # moved between storage tiers, so size + mtime is a strong validator
+            etag=f'"{size:x}-{int(mtime * 1000000):x}"',
+            content_type=guess_content_type(path),
+            expiry_time=expiry_time,
+        )
+
+    @classmethod
+    def from_path(cls, path: str, expiry_time: Optional[int] = None) -> 'Artifact':
+        """
+        Stat a file under DOWNLOAD_PATH and build its metadata, with its
+        recorded expiry unless one is given
+        """
+        st = os.stat(path)
+        relative_path = os.path.relpath(os.path.realpath(path), os.path.realpath(settings.DOWNLOAD_PATH)).replace(os.sep, '/')
+        if expiry_time is None:
+            expiry_time = read_expiry(relative_path)
+        return cls.from_stat(relative_path, path, st.st_size, st.st_mtime, expiry_time)
+
+class ArtifactIndex:
+    """
+    In-memory index of published artifacts keyed by relative path.
+
+    `download` publishes into it from worker threads and `serve_file` reads
+    it on the event loop, so a lock guards the dict.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._artifacts: Dict[str, Artifact] = {}
+
+    def __len__(self) -> int:
+        return len(self._artifacts)
+
+    def publish(self, path: str, expiry_time: Optional[int] = None) -> Artifact:
+        """
+        Index a finished file and record its expiry (does filesystem I/O;
+        call off the event loop)
+        """
+        artifact = Artifact.from_path(path, expiry_time)
+        if expiry_time is not None:
+            write_expiry(artifact.relative_path, expiry_time)
+        return self.add(artifact)
+
+    def add(self, artifact: Artifact) -> Artifact:
+        with self._lock:
+            self._artifacts[artifact.relative_path] = artifact
+        return artifact
+
+    def get(self, relative_path: str) -> Optional[Artifact]:
+        """
+        Get a live artifact, dropping it if it has expired
+        """
+        with self._lock:
+            artifact = self._artifacts.get(relative_path)
+            if artifact is not None and artifact.expired:
+                del self._artifacts[relative_path]
+                return None
+            return artifact
+
+    def remove(self, relative_path: str) -> None:
+        with self._lock:
+            self._artifacts.pop(relative_path, None)
+
+artifact_index = ArtifactIndex()
@@ -0,0 +1,77 @@
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a fixed time-to-live.
+
+    Used from the event loop only, so no locking is needed. `on_evict`, if
+    given, is called with every value the cache drops on its own (expired,
+    evicted, replaced or cleared), but not with values taken out by `pop`.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, on_evict: Optional[Callable[[Any], None]] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.on_evict = on_evict
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def _evicted(self, value: Any) -> None:
+        if self.on_evict is not None:
+            self.on_evict(value)
+
+    def _trim(self) -> None:
+        while len(self._entries) > self.max_size:
+            self._evicted(self._entries.popitem(last=False)[1][1])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Get a live entry, refreshing its LRU position
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self._evicted(value)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Store an entry, evicting the least recently used ones if full
+        """
+        previous = self._entries.get(key)
+        self._entries[key] = (time.monotonic() + (ttl_seconds or self.ttl_seconds), value)
+        self._entries.move_to_end(key)
+        if previous is not None and previous[1] is not value:
+            self._evicted(previous[1])
+        self._trim()
+
+    def configure(self, max_size: Optional[int] = None, ttl_seconds: Optional[float] = None) -> None:
+        """
+        Change the size bound (evicting at once) or the TTL of new entries
+        """
+        if ttl_seconds is not None:
+            self.ttl_seconds = ttl_seconds
+        if max_size is not None:
+            self.max_size = max_size
+            self._trim()
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.pop(key, None)
+        return entry[1] if entry else None
+
+    def clear(self) -> None:
+        entries, self._entries = self._entries, OrderedDict()
+        for _, value in entries.values():
+            self._evicted(value)
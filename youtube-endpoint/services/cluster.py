@@ -0,0 +1,178 @@
+import bisect
+import hashlib
+import logging
+import secrets
+from typing import Iterable, List, Optional
+
+from fastapi import Request
+from fastapi.responses import Response, RedirectResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+from config import settings
+from services.scheduler import current_client
+
+logger = logging.getLogger(__name__)
+
+# Marks requests already routed by a peer, so they are always served locally
+FORWARDED_HEADER = 'x-cluster-forwarded'
+
+# CLUSTER_SECRET, proving the forwarded marks above and below come from a peer
+SECRET_HEADER = 'x-cluster-secret'
+
+# The client a forwarded request is served for, for fair scheduling and quotas
+CLIENT_HEADER = 'x-cluster-client'
+
+# Headers that describe one connection and must not be copied through a proxy
+_HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade',
+}
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+class HashRing:
+    """
+    Consistent-hash ring with virtual nodes. Adding or removing one of N
+    nodes moves only about 1/N of the keys.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 128):
+        self.vnodes = vnodes
+        self._hashes: List[int] = []
+        self._owners: List[str] = []
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for replica in range(self.vnodes):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._hashes, point)
+            self._hashes.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str) -> None:
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        points = [(point, owner) for point, owner in zip(self._hashes, self._owners) if owner != node]
+        self._hashes = [point for point, _ in points]
+        self._owners = [owner for _, owner in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        """
+        Node owning a key: the first virtual node clockwise from its hash
+        """
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        return self._owners[index]
+
+class Cluster:
+    """
+    Optional cluster mode: each canonical video ID is owned by one node of
+    the static peer list, and other nodes proxy or redirect to it.
+
+    Proxied requests carry the shared secret, and only requests with it are
+    trusted as forwarded: served locally, for the client they name.
+    """
+
+    def __init__(self, self_url: Optional[str], peers: Iterable[str], mode: str = 'proxy', vnodes: int = 128,
+                 secret: Optional[str] = None):
+        self.self_url = self_url.rstrip('/') if self_url else None
+        self.mode = mode
+        self.secret = secret
+        peers = [peer.rstrip('/') for peer in peers]
+        if self.self_url and self.self_url not in peers:
+            peers.append(self.self_url)
+        self.ring = HashRing(peers, vnodes)
+        self._client = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.self_url) and len(self.ring.nodes) > 1
+
+    def forwarded(self, request: Request) -> bool:
+        """
+        Whether a request was forwarded by a peer that knows the secret
+        """
+        if not self.secret or not request.headers.get(FORWARDED_HEADER):
+            return False
+        return secrets.compare_digest(request.headers.get(SECRET_HEADER, '').encode(), self.secret.encode())
+
+    def forwarded_client(self, request: Request) -> Optional[str]:
+        """
+        The client a peer forwarded the request for, if it is trusted
+        """
+        return request.headers.get(CLIENT_HEADER) if self.forwarded(request) else None
+
+    def remote_owner(self, video_id: str, request: Request) -> Optional[str]:
+        """
+        Base URL of the node owning `video_id`, or None if this node should
+        serve the request itself
+        """
+        if not self.enabled or self.forwarded(request):
+            return None
+        owner = self.ring.owner(video_id)
+        return owner if owner != self.self_url else None
+
+    async def forward(self, request: Request, owner: str) -> Response:
+        """
+        Send a request on to the owning node, by proxy or by redirect
+        """
+        target = owner + request.url.path
+        if request.url.query:
+            target += '?' + request.url.query
+
+        if self.mode == 'redirect':
+            # 307 keeps the method and body of POST requests
+            return RedirectResponse(target, status_code=307)
+
+        import httpx
+        if self._client is None:
+            # The read timeout bounds each wait for bytes, so slow downloads
+            # and long streams are fine but a hung owner is not
+            self._client = httpx.AsyncClient(timeout=httpx.Timeout(
+                settings.CLUSTER_READ_TIMEOUT_SECONDS, connect=settings.CLUSTER_CONNECT_TIMEOUT_SECONDS,
+            ))
+
+        # The original Host is kept so URLs built by the owner point back at the entry point
+        own_headers = {FORWARDED_HEADER, SECRET_HEADER, CLIENT_HEADER}
+        headers = [(name, value) for name, value in request.headers.items()
+                   if name not in _HOP_BY_HOP_HEADERS and name not in own_headers]
+        headers.append((FORWARDED_HEADER, self.self_url))
+        if self.secret:
+            headers.append((SECRET_HEADER, self.secret))
+            headers.append((CLIENT_HEADER, current_client.get()))
+        upstream_request = self._client.build_request(
+            request.method, target, headers=headers, content=await request.body()
+        )
+        try:
+            upstream = await self._client.send(upstream_request, stream=True)
+        except httpx.TimeoutException:
+            logger.error(f"Timed out proxying {request.method} {request.url.path} to {owner}")
+            return Response(content=f"Timed out waiting for {owner}", status_code=504, media_type='text/plain')
+        except httpx.TransportError as e:
+            logger.error(f"Failed to proxy {request.method} {request.url.path} to {owner}: {str(e)}")
+            return Response(content=f"Could not reach {owner}", status_code=502, media_type='text/plain')
+        logger.info(f"Proxied {request.method} {request.url.path} to {owner} ({upstream.status_code})")
+
+        response_headers = {name: value for name, value in upstream.headers.items() if name not in _HOP_BY_HOP_HEADERS}
+        return StreamingResponse(
+            upstream.aiter_raw(),
+            status_code=upstream.status_code,
+            headers=response_headers,
+            background=BackgroundTask(upstream.aclose),
+        )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+cluster = Cluster(settings.CLUSTER_SELF, settings.CLUSTER_PEERS, settings.CLUSTER_MODE, settings.CLUSTER_VNODES,
+                  settings.CLUSTER_SECRET)
@@ -0,0 +1,36 @@
+import time
+from collections import deque
+from typing import Deque, List, Tuple
+
+class ErrorRate:
+    """
+    Outcomes of upstream calls over a sliding window, counted in one-second
+    buckets so recording and reading stay O(window) regardless of traffic.
+    Used from the event loop only.
+    """
+
+    def __init__(self, window_seconds: float):
+        self.window_seconds = window_seconds
+        # [second, calls, errors], oldest first
+        self._buckets: Deque[List[int]] = deque()
+
+    def _trim(self, now: int) -> None:
+        while self._buckets and self._buckets[0][0] <= now - self.window_seconds:
+            self._buckets.popleft()
+
+    def record(self, ok: bool) -> None:
+        now = int(time.time())
+        if not self._buckets or self._buckets[-1][0] != now:
+            self._trim(now)
+            self._buckets.append([now, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        if not ok:
+            bucket[2] += 1
+
+    def counts(self) -> Tuple[int, int]:
+        """
+        (calls, errors) within the window
+        """
+        self._trim(int(time.time()))
+        return sum(bucket[1] for bucket in self._buckets), sum(bucket[2] for bucket in self._buckets)
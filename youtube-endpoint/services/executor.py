@@ -0,0 +1,71 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """
+    ThreadPoolExecutor that counts submitted and running work, so saturation
+    can be read without touching the pool's internals
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, **kwargs):
+        if max_workers is None:
+            # asyncio's default size
+            max_workers = min(32, (os.cpu_count() or 1) + 4)
+        super().__init__(max_workers=max_workers, **kwargs)
+        self.workers = max_workers
+        self._pending = 0
+        self._running = 0
+        self._counter_lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        def _call():
+            with self._counter_lock:
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._counter_lock:
+                    self._running -= 1
+
+        with self._counter_lock:
+            self._pending += 1
+        future = super().submit(_call)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future: Future) -> None:
+        with self._counter_lock:
+            self._pending -= 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Worker count, busy workers and work waiting for a worker
+        """
+        with self._counter_lock:
+            pending, running = self._pending, self._running
+        return {'workers': self.workers, 'busy': running, 'backlog': max(0, pending - running)}
+
+# The event loop's default executor, once installed
+_executor: Optional[InstrumentedExecutor] = None
+
+def install_executor(workers: Optional[int]) -> InstrumentedExecutor:
+    """
+    Make a new instrumented executor the event loop's default; work already
+    submitted finishes on the previous one
+    """
+    global _executor
+    previous = _executor
+    _executor = InstrumentedExecutor(workers, thread_name_prefix='worker')
+    asyncio.get_event_loop().set_default_executor(_executor)
+    if previous is not None:
+        previous.shutdown(wait=False)
+    return _executor
+
+def executor_stats() -> Optional[Dict[str, int]]:
+    """
+    Saturation of the default executor, or None before it is installed
+    """
+    return _executor.stats() if _executor is not None else None
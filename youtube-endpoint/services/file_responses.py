@@ -0,0 +1,195 @@
+import os
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+
+from config import settings
+from services.artifacts import Artifact
+from services.storage import TieredStorage
+from services import aiofs
+
+# Size of the chunks read from disk per executor call
+CHUNK_SIZE = 256 * 1024
+
+# Requests asking for more ranges than this get the whole file
+MAX_RANGES = 16
+
+def etag_matches(header: str, etag: str) -> bool:
+    """
+    If-None-Match comparison (weak, as RFC 9110 requires for it)
+    """
+    if header.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in header.split(',')]
+    return any(tag.removeprefix('W/') == etag for tag in candidates)
+
+def _not_modified(request: Request, artifact: Artifact) -> bool:
+    """
+    Whether the request's validators match the artifact
+    """
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, artifact.etag)
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(artifact.mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def parse_ranges(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a `bytes=` Range header into inclusive (start, end) pairs.
+
+    Returns None when the header should be ignored (malformed or too many
+    ranges) and an empty list when no range is satisfiable.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec:
+        return None
+    parts = spec.split(',')
+    if len(parts) > MAX_RANGES:
+        return None
+
+    ranges = []
+    for part in parts:
+        first, sep, last = part.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and start > end:
+                    return None
+            else:
+                suffix = int(last)
+                if suffix == 0:
+                    continue
+                start, end = max(0, size - suffix), size - 1
+        except ValueError:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    return ranges
+
+async def _read_range(storage: TieredStorage, relative_path: str, start: int, end: int) -> AsyncIterator[bytes]:
+    """
+    Read an inclusive byte range from the tier holding the file, off the event loop
+    """
+    f = await aiofs.run(storage.open, relative_path)
+    try:
+        await aiofs.run(f.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await aiofs.run(f.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await aiofs.run(f.close)
+
+async def _read_multipart(storage: TieredStorage, artifact: Artifact, ranges: List[Tuple[int, int]], parts: List[bytes], closing: bytes) -> AsyncIterator[bytes]:
+    for (start, end), part_header in zip(ranges, parts):
+        yield part_header
+        async for chunk in _read_range(storage, artifact.relative_path, start, end):
+            yield chunk
+    yield closing
+
+def offload_response(artifact: Artifact, hot_path: str, headers: dict) -> Response:
+    """
+    Authorize the file and let the fronting web server send the bytes
+    """
+    if settings.FILE_OFFLOAD == 'x-accel-redirect':
+        headers['X-Accel-Redirect'] = settings.FILE_OFFLOAD_PREFIX.rstrip('/') + '/' + quote(artifact.relative_path)
+    else:
+        headers['X-Sendfile'] = hot_path
+    return Response(content=b'', media_type=artifact.content_type, headers=headers)
+
+def artifact_response(request: Request, artifact: Artifact, storage: TieredStorage) -> Response:
+    """
+    Answer GET/HEAD for an artifact from its indexed metadata: validators,
+    304s, single and multi-range requests, or a full-body stream from
+    whichever storage tier holds it
+    """
+    name = os.path.basename(artifact.path)
+    headers = {
+        'Content-Disposition': f"attachment; filename=\"{name}\"",
+        'ETag': artifact.etag,
+        'Last-Modified': formatdate(artifact.mtime, usegmt=True),
+        'Accept-Ranges': 'bytes',
+    }
+
+    if _not_modified(request, artifact):
+        return Response(status_code=304, headers=headers)
+
+    # The front server can only reach files in the hot tier
+    hot_path = storage.hot_path(artifact.relative_path)
+    if settings.FILE_OFFLOAD and hot_path:
+        return offload_response(artifact, hot_path, headers)
+
+    is_head = request.method == 'HEAD'
+    ranges = None
+    range_header = request.headers.get('range')
+    if range_header and request.headers.get('if-range', artifact.etag) == artifact.etag:
+        ranges = parse_ranges(range_header, artifact.size)
+        if ranges == []:
+            headers['Content-Range'] = f"bytes */{artifact.size}"
+            return Response(status_code=416, headers=headers)
+
+    if not ranges:
+        headers['Content-Length'] = str(artifact.size)
+        if is_head:
+            return Response(media_type=artifact.content_type, headers=headers)
+        return StreamingResponse(_read_range(storage, artifact.relative_path, 0, artifact.size - 1), media_type=artifact.content_type, headers=headers)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers['Content-Range'] = f"bytes {start}-{end}/{artifact.size}"
+        headers['Content-Length'] = str(end - start + 1)
+        if is_head:
+            return Response(status_code=206, media_type=artifact.content_type, headers=headers)
+        return StreamingResponse(_read_range(storage, artifact.relative_path, start, end), status_code=206, media_type=artifact.content_type, headers=headers)
+
+    # multipart/byteranges, with the length computed up front
+    boundary = secrets.token_hex(12)
+    parts = [
+        (f"\r\n--{boundary}\r\nContent-Type: {artifact.content_type}\r\n"
+         f"Content-Range: bytes {start}-{end}/{artifact.size}\r\n\r\n").encode('ascii')
+        for start, end in ranges
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode('ascii')
+    length = sum(len(part) for part in parts) + sum(end - start + 1 for start, end in ranges) + len(closing)
+    headers['Content-Length'] = str(length)
+    media_type = f"multipart/byteranges; boundary={boundary}"
+    if is_head:
+        return Response(status_code=206, media_type=media_type, headers=headers)
+    return StreamingResponse(_read_multipart(storage, artifact, ranges, parts, closing), status_code=206, media_type=media_type, headers=headers)
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as f:
+        return f.read()
+
+async def small_file_response(request: Request, artifact: Artifact, cache_control: str) -> Response:
+    """
+    Answer GET/HEAD for a small local file (e.g. a thumbnail) in one read,
+    with validators and the given Cache-Control
+    """
+    headers = {
+        'ETag': artifact.etag,
+        'Last-Modified': formatdate(artifact.mtime, usegmt=True),
+        'Cache-Control': cache_control,
+    }
+    if _not_modified(request, artifact):
+        return Response(status_code=304, headers=headers)
+    if request.method == 'HEAD':
+        headers['Content-Length'] = str(artifact.size)
+        return Response(media_type=artifact.content_type, headers=headers)
+    body = await aiofs.run(_read_file, artifact.path)
+    return Response(content=body, media_type=artifact.content_type, headers=headers)
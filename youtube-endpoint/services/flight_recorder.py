@@ -0,0 +1,123 @@
+import time
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Optional
+
+from config import settings
+from services import timing
+from services.scheduler import current_client, mask_client
+
+# Longest error message kept per entry
+_MAX_ERROR_LENGTH = 500
+
+class FlightRecord:
+    """One info extraction, download or transcode, as it happened"""
+    __slots__ = ('kind', 'video_id', 'format', 'client', 'cookies', 'started', 'duration',
+                 'stages', 'source', 'retries', 'bytes', 'status', 'error')
+
+    def __init__(self, kind: str, video_id: str, format: Optional[str], client: str, cookies: bool):
+        self.kind = kind
+        self.video_id = video_id
+        self.format = format
+        self.client = client
+        self.cookies = cookies
+        self.started = time.time()
+        self.duration = 0.0
+        self.stages: Dict[str, float] = {}
+        self.source: Optional[str] = None
+        self.retries = 0
+        self.bytes: Optional[int] = None
+        self.status = 'running'
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'kind': self.kind,
+            'video_id': self.video_id,
+            'format': self.format,
+            'client': self.client,
+            'cookies': self.cookies,
+            'started': self.started,
+            'duration_ms': round((time.time() - self.started if self.status == 'running' else self.duration) * 1000, 1),
+            'stages_ms': {name: round(seconds * 1000, 1) for name, seconds in list(self.stages.items())},
+            'source': self.source,
+            'retries': self.retries,
+            'bytes': self.bytes,
+            'status': self.status,
+            'error': self.error,
+        }
+
+_current: contextvars.ContextVar[Optional[FlightRecord]] = contextvars.ContextVar('flight_record', default=None)
+
+class FlightRecorder:
+    """
+    The last `size` info extractions, downloads and transcodes with their
+    stage timings, source, retries, client, bytes and final error, for
+    reconstructing slow or failed jobs after the fact.
+
+    Entries go into a bounded deque when a job starts and are filled in as
+    it runs. Deque appends are atomic, so recording takes no lock; the
+    record being built is reachable through a context variable, so the
+    service (and its worker threads) can annotate it.
+    """
+
+    def __init__(self, size: int):
+        self._records: Deque[FlightRecord] = deque(maxlen=size)
+
+    @contextmanager
+    def record(self, kind: str, video_id: str, format: Optional[str] = None, cookies: bool = False):
+        flight = FlightRecord(kind, video_id, format, mask_client(current_client.get()), cookies)
+        token = _current.set(flight)
+        started = time.perf_counter()
+        # Recorded up front so jobs that are still running (or stuck) show up too
+        self._records.append(flight)
+        with timing.job_timer() as timer:
+            # Live view of the stages while the job runs
+            flight.stages = timer.stages
+            try:
+                yield flight
+                flight.status = 'ok'
+            except asyncio.CancelledError:
+                flight.status = 'cancelled'
+                raise
+            except Exception as e:
+                flight.status = 'error'
+                flight.error = f"{type(e).__name__}: {str(e)}"[:_MAX_ERROR_LENGTH]
+                raise
+            finally:
+                flight.duration = time.perf_counter() - started
+                # Worker threads may still add to the timer
+                flight.stages = timer.snapshot()
+                _current.reset(token)
+
+    def note(self, **fields) -> None:
+        """
+        Set fields on the record being built, if any
+        """
+        flight = _current.get()
+        if flight is not None:
+            for name, value in fields.items():
+                setattr(flight, name, value)
+
+    def note_retry(self) -> None:
+        flight = _current.get()
+        if flight is not None:
+            flight.retries += 1
+
+    def query(self, kind: Optional[str] = None, video_id: Optional[str] = None, errors_only: bool = False,
+              order: str = 'recent', limit: int = 50) -> List[Dict]:
+        """
+        Recorded jobs, newest first or slowest first, optionally filtered
+        """
+        records = [flight for flight in list(self._records)
+                   if (kind is None or flight.kind == kind)
+                   and (video_id is None or flight.video_id == video_id)
+                   and (not errors_only or flight.status == 'error')]
+        entries = [flight.to_dict() for flight in reversed(records)]
+        if order == 'slowest':
+            entries.sort(key=lambda entry: entry['duration_ms'], reverse=True)
+        return entries[:limit]
+
+flight_recorder = FlightRecorder(settings.FLIGHT_RECORDER_SIZE)
@@ -0,0 +1,110 @@
+import os
+import json
+import fcntl
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class DownloadJournal:
+    """
+    Small on-disk journal of in-flight download jobs, shared by every
+    worker process on the node.
+
+    A job is recorded before yt-dlp starts writing and removed once it
+    finishes, so anything left in the journal after a restart is an
+    unfinished download whose `.part` files can be continued. Changes are
+    made under an exclusive lock on `<path>.lock`: the writer re-reads the
+    file and applies only its own change, so no worker's entries are lost,
+    and writes it through a unique temp file. Reads need no lock, as the
+    file is always replaced whole. Does file I/O; call off the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        """
+        Load journal entries from disk, ignoring a missing or corrupt file
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                jobs = json.load(f)
+            return jobs if isinstance(jobs, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable download journal {self.path}: {str(e)}")
+            return {}
+
+    @contextmanager
+    def _locked(self):
+        """
+        Hold the journal against other threads and other processes
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(f"{self.path}.lock", 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _update(self, change: Callable[[Dict[str, Dict]], bool]) -> None:
+        """
+        Apply `change` to the entries on disk and write them back if it
+        reports a change
+        """
+        with self._locked():
+            jobs = self._load()
+            if not change(jobs):
+                return
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', prefix=f".{os.path.basename(self.path)}.")
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(jobs, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                raise
+
+    def add(self, job: Dict) -> None:
+        """
+        Record a job as in-flight
+        """
+        def _add(jobs: Dict[str, Dict]) -> bool:
+            jobs[job['key']] = job
+            return True
+        self._update(_add)
+
+    def remove(self, key: str) -> None:
+        """
+        Forget a job once it has finished
+        """
+        self._update(lambda jobs: jobs.pop(key, None) is not None)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Get an in-flight job by key
+        """
+        return self._load().get(key)
+
+    def pending(self) -> List[Dict]:
+        """
+        List all jobs that have not finished, in every worker
+        """
+        return list(self._load().values())
+
+download_journal = DownloadJournal(settings.JOURNAL_FILE)
@@ -0,0 +1,130 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from bisect import bisect_left
+from collections import deque
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class LagHistogram:
+    """Lag samples counted per upper bound in milliseconds"""
+    __slots__ = ('bounds', 'counts', 'total', 'sum_ms', 'max_ms')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, lag_ms: float) -> None:
+        self.counts[bisect_left(self.bounds, lag_ms)] += 1
+        self.total += 1
+        self.sum_ms += lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    def to_dict(self) -> Dict:
+        # Cumulative, like Prometheus buckets: samples at or below each bound
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            buckets[f"le_{bound:g}ms"] = cumulative
+        buckets['inf'] = self.total
+        return {
+            'samples': self.total,
+            'avg_ms': round(self.sum_ms / self.total, 2) if self.total else 0.0,
+            'max_ms': round(self.max_ms, 2),
+            'buckets': buckets,
+        }
+
+class LoopLagMonitor:
+    """
+    Measures event-loop lag: a task sleeps `interval` seconds at a time and
+    records how late it wakes up, into a histogram since start and one over
+    the last minute.
+
+    A watchdog thread notices when the loop has not come back for
+    `block_threshold` seconds and logs the loop thread's current stack,
+    which points at the callback that is blocking it. Each stall is logged
+    once.
+    """
+
+    def __init__(self, interval: float, block_threshold: float, bounds_ms: Sequence[float]):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.bounds_ms = bounds_ms
+        self.histogram = LagHistogram(bounds_ms)
+        # (time, lag in ms) of the last minute
+        self._recent: Deque[Tuple[float, float]] = deque()
+        self.blocked_count = 0
+        self._heartbeat = time.monotonic()
+        self._reported: Optional[float] = None
+        self._loop_thread: Optional[int] = None
+        self._stopped = threading.Event()
+
+    async def run(self) -> None:
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                expected = time.monotonic() + self.interval
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                self._heartbeat = now
+                lag_ms = max(0.0, now - expected) * 1000
+                self.histogram.add(lag_ms)
+                self._recent.append((now, lag_ms))
+                while self._recent[0][0] < now - 60:
+                    self._recent.popleft()
+                if lag_ms >= self.block_threshold * 1000:
+                    self.blocked_count += 1
+                    logger.warning(f"Event loop was blocked for {lag_ms:.0f}ms")
+        finally:
+            self._stopped.set()
+
+    def _watch(self) -> None:
+        """
+        Log the loop thread's stack once per stall (runs in its own thread)
+        """
+        while not self._stopped.wait(self.block_threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.block_threshold or self._reported == heartbeat:
+                continue
+            self._reported = heartbeat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = ''.join(traceback.format_stack(frame))
+            logger.warning(f"Event loop blocked for over {stalled * 1000:.0f}ms, loop thread is at:\n{stack}")
+
+    def snapshot(self) -> Dict:
+        """
+        Lag histograms since start and over the last minute
+        """
+        recent = LagHistogram(self.bounds_ms)
+        for _, lag_ms in self._recent:
+            recent.add(lag_ms)
+        return {
+            'interval_ms': self.interval * 1000,
+            'block_threshold_ms': self.block_threshold * 1000,
+            'blocked': self.blocked_count,
+            'last_minute': recent.to_dict(),
+            'total': self.histogram.to_dict(),
+        }
+
+loop_monitor = LoopLagMonitor(
+    settings.LOOP_LAG_INTERVAL_SECONDS,
+    settings.LOOP_BLOCK_THRESHOLD_SECONDS,
+    settings.LOOP_LAG_BUCKETS_MS,
+)
@@ -0,0 +1,82 @@
+import re
+from typing import NamedTuple, Optional
+
+# Bare 11-character video ID
+_VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+
+# Every supported URL shape in one pass: watch (any host variant, v= anywhere
+# in the query), youtu.be, shorts, embed, v, e and live paths
+_MEDIA_URL_RE = re.compile(r'''
+    ^(?:(?i:https?)://)?
+    (?:
+        (?i:(?:www\.)?youtu\.be)/(?P<short>[0-9A-Za-z_-]{11})(?=[?&#/]|$)
+      | (?i:(?:(?:www|m|music)\.)?youtube(?:-nocookie)?\.com)/
+        (?:
+            (?:watch/?)?\?(?:[^#]*?&)?v=(?P<watch>[0-9A-Za-z_-]{11})(?=[&#]|$)
+          | (?:shorts|embed|v|e|live)/(?P<path>[0-9A-Za-z_-]{11})(?=[?&#/]|$)
+        )
+    )
+''', re.VERBOSE)
+
+# Query/fragment parameters carried over from the original URL
+_PARAM_RE = re.compile(r'[?&#](t|start|list)=([^&#]*)')
+
+# Timestamps: "90", "90s", "1m30s", "1h2m3s"
+_TIMESTAMP_RE = re.compile(r'^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?$')
+
+# Playlist IDs
+_PLAYLIST_ID_RE = re.compile(r'^[0-9A-Za-z_-]+$')
+
+class MediaRef(NamedTuple):
+    """Canonical reference to a single YouTube video"""
+    video_id: str
+    start: Optional[int] = None
+    playlist_id: Optional[str] = None
+
+    @property
+    def url(self) -> str:
+        """
+        Canonical watch URL for the video alone; timestamps and playlists are
+        kept on the ref but not passed on, so yt-dlp never expands a playlist
+        """
+        return f"https://www.youtube.com/watch?v={self.video_id}"
+
+def _parse_timestamp(value: str) -> Optional[int]:
+    match = _TIMESTAMP_RE.match(value)
+    if not match or not value:
+        return None
+    hours, minutes, seconds = (int(part) if part else 0 for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
+
+def parse_media_ref(value: str) -> MediaRef:
+    """
+    Parse a YouTube URL or bare video ID into its canonical reference.
+
+    Raises ValueError for anything that is not a single-video reference.
+    """
+    value = value.strip() if isinstance(value, str) else ''
+    if len(value) == 11 and _VIDEO_ID_RE.match(value):
+        return MediaRef(value)
+
+    match = _MEDIA_URL_RE.match(value)
+    if not match:
+        raise ValueError(f"Invalid YouTube URL or ID: {value}")
+
+    video_id = match.group('short') or match.group('watch') or match.group('path')
+    start = None
+    playlist_id = None
+    if '=' not in value[match.end():] and not match.group('watch'):
+        return MediaRef(video_id)
+    for name, param in _PARAM_RE.findall(value):
+        if name == 'list':
+            if _PLAYLIST_ID_RE.match(param):
+                playlist_id = param
+        elif start is None:
+            start = _parse_timestamp(param)
+    return MediaRef(video_id, start, playlist_id)
+
+def canonical_video_id(value: str) -> str:
+    """
+    Canonical video ID for a YouTube URL or ID
+    """
+    return parse_media_ref(value).video_id
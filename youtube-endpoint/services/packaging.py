@@ -0,0 +1,95 @@
+import os
+import struct
+import logging
+import subprocess
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg -movflags for each playback layout
+_LAYOUT_MOVFLAGS = {
+    # moov before mdat: playback starts once the header has arrived
+    'faststart': '+faststart',
+    # moov up front and the media in self-contained fragments
+    'fragmented': '+frag_keyframe+empty_moov+default_base_moof',
+}
+
+def _run_ffmpeg(args: List[str], timeout: float = 600) -> None:
+    try:
+        subprocess.run(['ffmpeg', '-v', 'error', '-y'] + args, check=True, capture_output=True, timeout=timeout)
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffmpeg failed: {e.stderr.decode('utf-8', 'replace').strip()}")
+
+def top_level_boxes(path: str, limit: int = 32) -> List[str]:
+    """
+    Types of the top-level ISO BMFF boxes of a file, in order, up to the
+    first media box; reads only the box headers
+    """
+    boxes = []
+    size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        offset = 0
+        while offset + 8 <= size and len(boxes) < limit:
+            f.seek(offset)
+            box_size, box_type = struct.unpack('>I4s', f.read(8))
+            if box_size == 1:
+                box_size = struct.unpack('>Q', f.read(8))[0]
+            elif box_size == 0:
+                box_size = size - offset
+            boxes.append(box_type.decode('latin-1'))
+            if box_type in (b'mdat', b'moof') or box_size < 8:
+                break
+            offset += box_size
+    return boxes
+
+def needs_relayout(path: str, layout: str) -> bool:
+    """
+    Whether a file has to be rewritten to match a playback layout
+    """
+    if not path.endswith('.mp4'):
+        return True
+    boxes = top_level_boxes(path)
+    if 'moov' not in boxes:
+        return True
+    if layout == 'fragmented':
+        return 'moof' not in boxes
+    return False
+
+def relayout(path: str, layout: str) -> str:
+    """
+    Remux a file (stream copy) into an MP4 with the given layout, replacing
+    it; returns the path of the result
+    """
+    if not needs_relayout(path, layout):
+        return path
+
+    output = os.path.splitext(path)[0] + '.mp4'
+    tmp_path = os.path.join(os.path.dirname(path), '.relayout.mp4')
+    _run_ffmpeg(['-i', path, '-map', '0', '-c', 'copy', '-movflags', _LAYOUT_MOVFLAGS[layout], tmp_path])
+    os.replace(tmp_path, output)
+    if output != path:
+        os.remove(path)
+    logger.info(f"Rewrote {os.path.basename(output)} with {layout} layout")
+    return output
+
+def package_hls(path: str, segment_seconds: int) -> str:
+    """
+    Cut a file into fMP4 HLS segments plus a VOD playlist in an "hls"
+    directory next to it (stream copy, so segments start on keyframes);
+    returns the playlist path
+    """
+    hls_dir = os.path.join(os.path.dirname(path), 'hls')
+    os.makedirs(hls_dir, exist_ok=True)
+    playlist = os.path.join(hls_dir, 'index.m3u8')
+    _run_ffmpeg([
+        '-i', path, '-map', '0', '-c', 'copy',
+        '-f', 'hls',
+        '-hls_time', str(segment_seconds),
+        '-hls_playlist_type', 'vod',
+        '-hls_segment_type', 'fmp4',
+        '-hls_fmp4_init_filename', 'init.mp4',
+        '-hls_segment_filename', os.path.join(hls_dir, 'segment_%05d.m4s'),
+        playlist,
+    ])
+    logger.info(f"Packaged {os.path.basename(path)} as HLS ({len(os.listdir(hls_dir)) - 1} files)")
+    return playlist
@@ -0,0 +1,54 @@
+import math
+import time
+import heapq
+import contextvars
+from typing import Dict, List, Tuple
+
+# Set in the prefetch scheduler's task, so its own requests are not counted as live traffic
+prefetching: contextvars.ContextVar[bool] = contextvars.ContextVar('prefetching', default=False)
+
+class PopularityTracker:
+    """
+    Request frequency per canonical video ID as exponentially decaying
+    counters: each request adds 1 and scores halve every `half_life_seconds`.
+
+    Scores are stored relative to a fixed epoch (log-scaled forward in
+    time), so a hit is O(1) and never touches other entries. Used from the
+    event loop only.
+    """
+
+    def __init__(self, half_life_seconds: float, max_tracked: int):
+        self.max_tracked = max_tracked
+        self._rate = math.log(2) / half_life_seconds
+        self._epoch = time.time()
+        self._scores: Dict[str, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def hit(self, video_id: str) -> None:
+        # Adding e^(rate * t) at time t equals adding 1 now and decaying everything else
+        offset = self._rate * (time.time() - self._epoch)
+        if offset > 300:
+            self._rebase()
+            offset = self._rate * (time.time() - self._epoch)
+        self._scores[video_id] = self._scores.get(video_id, 0.0) + math.exp(offset)
+        if len(self._scores) > self.max_tracked:
+            # Forget the least popular half rather than trimming on every hit
+            keep = heapq.nlargest(self.max_tracked // 2, self._scores.items(), key=lambda item: item[1])
+            self._scores = dict(keep)
+
+    def _rebase(self) -> None:
+        """
+        Move the epoch to now before the stored values overflow
+        """
+        scale = math.exp(-self._rate * (time.time() - self._epoch))
+        self._epoch = time.time()
+        self._scores = {video_id: score * scale for video_id, score in self._scores.items() if score * scale > 1e-6}
+
+    def top(self, n: int) -> List[Tuple[str, float]]:
+        """
+        The `n` most popular video IDs with their current decayed scores
+        """
+        scale = math.exp(-self._rate * (time.time() - self._epoch))
+        return [(video_id, score * scale) for video_id, score in heapq.nlargest(n, self._scores.items(), key=lambda item: item[1])]
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from config import settings
+from services.youtube import YouTubeService
+from services.popularity import prefetching
+from services.cluster import cluster
+
+logger = logging.getLogger(__name__)
+
+def parse_windows(windows: Iterable[str]) -> List[Tuple[int, int]]:
+    """
+    Parse "HH:MM-HH:MM" windows into (start, end) minutes of the day
+    """
+    parsed = []
+    for window in windows:
+        try:
+            bounds = []
+            for part in window.split('-'):
+                hours, minutes = part.strip().split(':')
+                bounds.append(int(hours) * 60 + int(minutes))
+            start, end = bounds
+        except ValueError:
+            raise ValueError(f"Invalid prefetch window: {window!r} (expected HH:MM-HH:MM)")
+        parsed.append((start, end))
+    return parsed
+
+def in_window(windows: List[Tuple[int, int]], now: Optional[datetime] = None) -> bool:
+    """
+    Whether local time falls inside any window; windows may wrap past midnight
+    """
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    for start, end in windows:
+        if start <= end and start <= minute < end:
+            return True
+        if start > end and (minute >= start or minute < end):
+            return True
+    return False
+
+async def _wait_for_idle(windows: List[Tuple[int, int]]) -> bool:
+    """
+    Wait until live traffic has been quiet for PREFETCH_IDLE_SECONDS;
+    False once the window closes or the service shuts down
+    """
+    while not YouTubeService.is_idle(settings.PREFETCH_IDLE_SECONDS):
+        if not in_window(windows) or not YouTubeService.is_accepting():
+            return False
+        await asyncio.sleep(1)
+    return in_window(windows) and YouTubeService.is_accepting()
+
+async def prefetch_popular(windows: List[Tuple[int, int]]) -> int:
+    """
+    Warm the most popular videos one at a time through the normal pipeline,
+    stepping aside whenever live traffic arrives; returns the number warmed
+    """
+    warmed = 0
+    for video_id, score in YouTubeService.popularity.top(settings.PREFETCH_TOP_N):
+        # In cluster mode each node warms only the videos it owns
+        if cluster.enabled and cluster.ring.owner(video_id) != cluster.self_url:
+            continue
+        if not await _wait_for_idle(windows):
+            break
+        try:
+            await YouTubeService.get_video_info(video_id)
+            if settings.PREFETCH_DOWNLOAD:
+                await YouTubeService.download(video_id)
+            warmed += 1
+        except Exception as e:
+            logger.warning(f"Prefetch of video {video_id} (score {score:.1f}) failed: {str(e)}")
+    return warmed
+
+async def run_prefetch_scheduler() -> None:
+    """
+    Prefetch popular videos once per off-peak window
+    """
+    windows = parse_windows(settings.PREFETCH_WINDOWS)
+    if not windows:
+        return
+
+    # Everything awaited from this task is prefetch work, not live traffic
+    prefetching.set(True)
+    done_this_window = False
+    while True:
+        await asyncio.sleep(settings.PREFETCH_CHECK_SECONDS)
+        if not in_window(windows):
+            done_this_window = False
+            continue
+        if done_this_window or not YouTubeService.is_accepting():
+            continue
+
+        logger.info(f"Prefetching up to {settings.PREFETCH_TOP_N} of {len(YouTubeService.popularity)} tracked videos")
+        try:
+            warmed = await prefetch_popular(windows)
+            logger.info(f"Prefetched {warmed} video(s)")
+        except Exception as e:
+            logger.error(f"Prefetch failed: {str(e)}")
+        done_this_window = True
@@ -0,0 +1,114 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+from collections import Counter
+from typing import Dict
+
+# Leaf frames of threads that are waiting rather than working: lock and
+# queue waits, the loop's select, and an executor worker waiting for work
+_IDLE_FILES = ('threading.py', 'queue.py', 'selectors.py')
+_IDLE_FUNCTIONS = (('thread.py', '_worker'),)
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+def _idle(frame) -> bool:
+    filename = os.path.basename(frame.f_code.co_filename)
+    return filename in _IDLE_FILES or (filename, frame.f_code.co_name) in _IDLE_FUNCTIONS
+
+def _label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def _stack(frame) -> list:
+    """
+    Frame labels from the outermost call to the innermost
+    """
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+class SamplingProfiler:
+    """
+    Statistical profiler for the live process: a thread of its own wakes up
+    every `interval` seconds and records the stack of the event-loop thread
+    and of the executor's worker threads. Nothing is instrumented, so the
+    cost is one stack walk per thread per sample, and only while a profile
+    runs; one profile runs at a time.
+
+    Output is in collapsed-stack format ("thread;outer;...;inner count" per
+    line), which flamegraph.pl, speedscope and inferno read directly.
+    """
+
+    def __init__(self):
+        self._running = False
+
+    def _sample(self, loop_thread: int, seconds: float, interval: float, include_idle: bool) -> Dict[str, int]:
+        """
+        Collect samples for `seconds` (runs in the profiler thread)
+        """
+        me = threading.get_ident()
+        counts: Counter = Counter()
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident == loop_thread:
+                    name = 'event-loop'
+                elif names.get(ident, '').startswith('worker'):
+                    name = 'executor'
+                else:
+                    continue
+                if not include_idle and _idle(frame):
+                    continue
+                counts[';'.join([name] + _stack(frame))] += 1
+            time.sleep(interval)
+        return counts
+
+    async def profile(self, seconds: float, interval: float, include_idle: bool = False) -> str:
+        """
+        Sample for `seconds` and return collapsed stacks, heaviest first
+        """
+        if self._running:
+            raise ProfilerBusyError("A profile is already running")
+        self._running = True
+        loop = asyncio.get_event_loop()
+        done: asyncio.Future = loop.create_future()
+        loop_thread = threading.get_ident()
+
+        def _deliver(result, error) -> None:
+            # The request may have gone away meanwhile
+            if not done.done():
+                if error is not None:
+                    done.set_exception(error)
+                else:
+                    done.set_result(result)
+
+        def _run():
+            result, error = None, None
+            try:
+                result = self._sample(loop_thread, seconds, interval, include_idle)
+            except Exception as e:
+                error = e
+            finally:
+                # Cleared only when sampling stops, even if the request was cancelled
+                self._running = False
+            try:
+                loop.call_soon_threadsafe(_deliver, result, error)
+            except RuntimeError:
+                # The loop closed while sampling (shutdown)
+                pass
+
+        # Not the executor: the profiler must not take a worker it is measuring
+        threading.Thread(target=_run, name='profiler', daemon=True).start()
+        counts = await done
+        return ''.join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+profiler = SamplingProfiler()
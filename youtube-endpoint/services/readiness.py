@@ -0,0 +1,130 @@
+import time
+import shutil
+import asyncio
+from typing import Any, Dict, Optional
+
+from config import settings
+from services.youtube import YouTubeService
+from services.scheduler import fair_scheduler
+from services.executor import executor_stats
+
+# ffmpeg does not come and go often; look it up on PATH at most this often
+_FFMPEG_CHECK_SECONDS = 60
+
+_ffmpeg_path: Optional[str] = None
+_ffmpeg_checked: Optional[float] = None
+
+# Free bytes under DOWNLOAD_PATH, or the error measuring it
+_disk: Dict[str, Any] = {}
+_host_checked = 0.0
+_host_checking = False
+
+_report: Optional[Dict[str, Any]] = None
+_report_time = 0.0
+
+def _check(ok: bool, **details) -> Dict[str, Any]:
+    return dict(details, ok=ok)
+
+def _measure_host() -> None:
+    """
+    Measure free disk space, and look up ffmpeg when due; a statvfs on a
+    network filesystem can stall, so this runs in a worker thread
+    """
+    global _disk, _ffmpeg_path, _ffmpeg_checked, _host_checking
+    try:
+        try:
+            _disk = {'free_bytes': shutil.disk_usage(settings.DOWNLOAD_PATH).free}
+        except OSError as e:
+            _disk = {'error': str(e)}
+        now = time.monotonic()
+        if _ffmpeg_checked is None or now - _ffmpeg_checked >= _FFMPEG_CHECK_SECONDS:
+            _ffmpeg_path = shutil.which('ffmpeg')
+            _ffmpeg_checked = now
+    finally:
+        _host_checking = False
+
+def _refresh_host() -> None:
+    """
+    Re-measure the host at most every READY_CACHE_SECONDS; from the event
+    loop in the background, so the report uses the last measurement
+    """
+    global _host_checked, _host_checking
+    now = time.monotonic()
+    if _host_checking or now - _host_checked < settings.READY_CACHE_SECONDS:
+        return
+    _host_checked = now
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Worker thread or tests: measuring inline is fine
+        _measure_host()
+        return
+    _host_checking = True
+    loop.run_in_executor(None, _measure_host)
+
+# Measured once at import (startup), so the first report has values
+_measure_host()
+_host_checked = time.monotonic()
+
+def _build_report() -> Dict[str, Any]:
+    checks = {}
+
+    checks['accepting'] = _check(YouTubeService.is_accepting())
+
+    executor = executor_stats()
+    if executor is None:
+        checks['executor'] = _check(True, installed=False)
+    else:
+        checks['executor'] = _check(executor['backlog'] <= settings.READY_MAX_EXECUTOR_BACKLOG,
+                                    max_backlog=settings.READY_MAX_EXECUTOR_BACKLOG, **executor)
+
+    running, queued = fair_scheduler.load()
+    checks['queue'] = _check(queued <= settings.READY_MAX_QUEUED,
+                             running=running, slots=fair_scheduler.slots, queued=queued,
+                             max_queued=settings.READY_MAX_QUEUED)
+
+    _refresh_host()
+    disk = _disk
+    if 'error' in disk:
+        checks['disk'] = _check(False, error=disk['error'])
+    else:
+        checks['disk'] = _check(disk['free_bytes'] >= settings.READY_MIN_FREE_BYTES,
+                                free_bytes=disk['free_bytes'], min_free_bytes=settings.READY_MIN_FREE_BYTES)
+
+    ffmpeg = _ffmpeg_path
+    checks['ffmpeg'] = _check(ffmpeg is not None or not settings.READY_REQUIRE_FFMPEG,
+                              path=ffmpeg, required=settings.READY_REQUIRE_FFMPEG)
+
+    cached = len(YouTubeService._info_cache)
+    checks['cache'] = _check(cached >= settings.READY_MIN_CACHED_INFO,
+                             info_entries=cached, min_info_entries=settings.READY_MIN_CACHED_INFO,
+                             subtitle_entries=len(YouTubeService._subtitle_cache))
+
+    calls, errors = YouTubeService.upstream_errors.counts()
+    rate = errors / calls if calls else 0.0
+    checks['upstream'] = _check(calls < settings.READY_MIN_UPSTREAM_CALLS or rate <= settings.READY_MAX_UPSTREAM_ERROR_RATE,
+                                calls=calls, errors=errors, error_rate=round(rate, 3),
+                                max_error_rate=settings.READY_MAX_UPSTREAM_ERROR_RATE,
+                                window_seconds=settings.READY_ERROR_WINDOW_SECONDS)
+
+    failing = [name for name, check in checks.items() if not check['ok']]
+    return {
+        'status': 'ready' if not failing else 'unavailable',
+        'failing': failing,
+        'checks': checks,
+    }
+
+def readiness() -> Dict[str, Any]:
+    """
+    Whether this node should receive traffic, with the measurements behind
+    each check. Everything read here is in memory: disk space and the
+    ffmpeg path are measured in a worker thread in the background, and the
+    report is reused for READY_CACHE_SECONDS, so load balancers can poll it
+    every second without the event loop touching the filesystem.
+    """
+    global _report, _report_time
+    now = time.monotonic()
+    if _report is None or now - _report_time >= settings.READY_CACHE_SECONDS:
+        _report = _build_report()
+        _report_time = now
+    return _report
@@ -0,0 +1,196 @@
+import sys
+import json
+import zlib
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+# Descriptions shorter than this are kept as plain strings
+DESCRIPTION_COMPRESS_THRESHOLD = 256
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Intern short, highly repetitive strings (codecs, extensions, notes)"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+class FormatRecord:
+    """
+    Compact, slotted form of a parsed video format.
+
+    One of these replaces the per-format dict built by `_parse_formats`
+    while a video sits in the info cache.
+    """
+    __slots__ = (
+        'format_id', 'ext', 'resolution', 'width', 'height', 'fps',
+        'filesize', 'tbr', 'vcodec', 'acodec', 'format_note', 'audio_only',
+    )
+
+    def __init__(self, format_id: str, ext: str, resolution: Optional[str] = None,
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 fps: Optional[int] = None, filesize: Optional[int] = None,
+                 tbr: Optional[float] = None, vcodec: Optional[str] = None,
+                 acodec: Optional[str] = None, format_note: Optional[str] = None,
+                 audio_only: bool = False):
+        self.format_id = _intern(format_id)
+        self.ext = _intern(ext)
+        self.resolution = _intern(resolution)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.filesize = filesize
+        self.tbr = tbr
+        self.vcodec = _intern(vcodec)
+        self.acodec = _intern(acodec)
+        self.format_note = _intern(format_note)
+        self.audio_only = audio_only
+
+    @classmethod
+    def from_dict(cls, fmt: Dict) -> 'FormatRecord':
+        """
+        Build a record from a `_parse_formats` dict
+        """
+        return cls(**{key: fmt.get(key) for key in cls.__slots__ if key in fmt})
+
+    def to_dict(self) -> Dict:
+        """
+        Rebuild the `_parse_formats` dict for serialization
+        """
+        if self.audio_only:
+            return {
+                'format_id': self.format_id,
+                'ext': self.ext,
+                'format_note': self.format_note,
+                'filesize': self.filesize,
+                'tbr': self.tbr,
+                'acodec': self.acodec,
+                'audio_only': True,
+            }
+        return {key: getattr(self, key) for key in self.__slots__}
+
+class VideoInfoRecord:
+    """
+    Compact, slotted form of `get_video_info`'s result for the info cache.
+
+    Formats are kept as a tuple of `FormatRecord`, repetitive strings are
+    interned and long descriptions are zlib-compressed, as are the subtitle
+    track URLs, which are internal and not part of `to_dict`.
+    """
+    __slots__ = (
+        'id', 'title', 'webpage_url', '_description', 'thumbnail', 'duration',
+        'view_count', 'like_count', 'uploader', 'upload_date', 'formats',
+        '_subtitles', '_etag',
+    )
+
+    def __init__(self, id: str, title: str, webpage_url: str, description: Optional[str] = None,
+                 thumbnail: Optional[str] = None, duration: Optional[int] = None,
+                 view_count: Optional[int] = None, like_count: Optional[int] = None,
+                 uploader: Optional[str] = None, upload_date: Optional[str] = None,
+                 formats: Tuple[FormatRecord, ...] = (),
+                 subtitles: Optional[Dict[str, Dict[str, str]]] = None):
+        self._etag = None
+        self.id = id
+        self.title = title
+        self.webpage_url = webpage_url
+        self.description = description
+        self.thumbnail = thumbnail
+        self.duration = duration
+        self.view_count = view_count
+        self.like_count = like_count
+        self.uploader = _intern(uploader)
+        self.upload_date = _intern(upload_date)
+        self.formats = tuple(formats)
+        self.subtitles = subtitles
+
+    @property
+    def description(self) -> Optional[str]:
+        if isinstance(self._description, bytes):
+            return zlib.decompress(self._description).decode('utf-8')
+        return self._description
+
+    @description.setter
+    def description(self, value: Optional[str]) -> None:
+        if value and len(value) >= DESCRIPTION_COMPRESS_THRESHOLD:
+            self._description = zlib.compress(value.encode('utf-8'), 6)
+        else:
+            self._description = value
+
+    @property
+    def subtitles(self) -> Dict[str, Dict[str, str]]:
+        """
+        VTT URL per language, under "manual" and "auto" (automatic captions)
+        """
+        if self._subtitles is None:
+            return {'manual': {}, 'auto': {}}
+        return json.loads(zlib.decompress(self._subtitles))
+
+    @subtitles.setter
+    def subtitles(self, value: Optional[Dict[str, Dict[str, str]]]) -> None:
+        # Translated caption URLs differ only in a parameter, so they compress very well
+        if value and any(value.values()):
+            self._subtitles = zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'), 6)
+        else:
+            self._subtitles = None
+
+    @property
+    def etag(self) -> str:
+        """
+        Strong validator of the public info, computed once per record
+        """
+        if self._etag is None:
+            body = json.dumps(self.to_dict(), sort_keys=True, separators=(',', ':')).encode('utf-8')
+            self._etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        return self._etag
+
+    @classmethod
+    def from_dict(cls, video_info: Dict) -> 'VideoInfoRecord':
+        """
+        Build a record from a `get_video_info` dict, plus the optional
+        "subtitles" tracks
+        """
+        return cls(
+            id=video_info['id'],
+            title=video_info['title'],
+            webpage_url=video_info['webpage_url'],
+            description=video_info.get('description'),
+            thumbnail=video_info.get('thumbnail'),
+            duration=video_info.get('duration'),
+            view_count=video_info.get('view_count'),
+            like_count=video_info.get('like_count'),
+            uploader=video_info.get('uploader'),
+            upload_date=video_info.get('upload_date'),
+            formats=tuple(FormatRecord.from_dict(fmt) for fmt in video_info.get('formats', [])),
+            subtitles=video_info.get('subtitles'),
+        )
+
+    def to_dict(self, url: Optional[str] = None) -> Dict:
+        """
+        Rebuild the `get_video_info` dict, using `url` as the requested URL
+        """
+        return {
+            'id': self.id,
+            'title': self.title,
+            'url': url or self.webpage_url,
+            'webpage_url': self.webpage_url,
+            'description': self.description,
+            'thumbnail': self.thumbnail,
+            'duration': self.duration,
+            'view_count': self.view_count,
+            'like_count': self.like_count,
+            'uploader': self.uploader,
+            'upload_date': self.upload_date,
+            'formats': self.format_dicts(),
+        }
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize for a shared cache
+        """
+        video_info = self.to_dict()
+        del video_info['url']
+        video_info['subtitles'] = self.subtitles
+        return zlib.compress(json.dumps(video_info, separators=(',', ':')).encode('utf-8'))
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'VideoInfoRecord':
+        return cls.from_dict(json.loads(zlib.decompress(data)))
+
+    def format_dicts(self) -> List[Dict]:
+        return [fmt.to_dict() for fmt in self.formats]
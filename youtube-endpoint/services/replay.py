@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from io import BytesIO
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import yt_dlp
+from yt_dlp.networking import Response
+from yt_dlp.networking.exceptions import HTTPError
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Headers that no longer describe a body that has been read and decoded
+_STRIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+
+def _describe(req) -> Tuple[str, str, bytes]:
+    """
+    Method, URL and body of anything `YoutubeDL.urlopen` accepts
+    """
+    if isinstance(req, str):
+        return 'GET', req, b''
+    url = getattr(req, 'url', None) or req.get_full_url()
+    method = getattr(req, 'method', None) or req.get_method()
+    data = getattr(req, 'data', None)
+    return method.upper(), url, data if isinstance(data, bytes) else b''
+
+def _fixture_key(method: str, url: str, data: bytes) -> str:
+    return hashlib.sha1(b'\0'.join([method.encode(), url.encode(), data])).hexdigest()
+
+def _route(method: str, url: str) -> str:
+    """
+    Looser match used when the exact request was not recorded: volatile
+    query parameters differ between runs, the host and path do not
+    """
+    parts = urlsplit(url)
+    return f"{method} {parts.netloc}{parts.path}"
+
+class TrafficRecorder:
+    """
+    Captures every HTTP exchange yt-dlp makes into a fixture directory:
+    an index.json plus one body file per response.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(path, 'bodies'), exist_ok=True)
+        self._index: List[Dict] = self._load_index()
+
+    def _load_index(self) -> List[Dict]:
+        try:
+            with open(os.path.join(self.path, 'index.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+
+    def _save(self, method: str, url: str, data: bytes, response: Response, body: bytes) -> None:
+        key = _fixture_key(method, url, data)
+        body_file = hashlib.sha1(body).hexdigest()
+        with open(os.path.join(self.path, 'bodies', body_file), 'wb') as f:
+            f.write(body)
+        entry = {
+            'key': key,
+            'route': _route(method, url),
+            'method': method,
+            'url': url,
+            'status': response.status,
+            'reason': response.reason,
+            'headers': {name: value for name, value in response.headers.items() if name.lower() not in _STRIPPED_HEADERS},
+            'final_url': response.url,
+            'body': body_file,
+        }
+        with self._lock:
+            self._index.append(entry)
+            tmp_path = os.path.join(self.path, 'index.json.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._index, f, indent=1)
+            os.replace(tmp_path, os.path.join(self.path, 'index.json'))
+
+    def urlopen(self, original, ydl, req) -> Response:
+        method, url, data = _describe(req)
+        try:
+            response = original(ydl, req)
+        except HTTPError as e:
+            body = e.response.read()
+            self._save(method, url, data, e.response, body)
+            e.response.fp = BytesIO(body)
+            raise
+        body = response.read()
+        self._save(method, url, data, response, body)
+        logger.info(f"Recorded {method} {url[:120]} ({len(body)} bytes)")
+        return Response(BytesIO(body), response.url, dict(response.headers), status=response.status, reason=response.reason)
+
+class TrafficReplayer:
+    """
+    Serves recorded exchanges back to yt-dlp instead of the network, with
+    configurable injected latency, so extraction and download run offline
+    and identically on every run.
+    """
+
+    def __init__(self, path: str, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.path = path
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        with open(os.path.join(path, 'index.json'), 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        self._by_key = {entry['key']: entry for entry in entries}
+        self._by_route: Dict[str, List[Dict]] = {}
+        for entry in entries:
+            self._by_route.setdefault(entry['route'], []).append(entry)
+        self._route_cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _find(self, method: str, url: str, data: bytes) -> Optional[Dict]:
+        entry = self._by_key.get(_fixture_key(method, url, data))
+        if entry is not None:
+            return entry
+        # Same endpoint, different volatile parameters: replay in recorded order
+        candidates = self._by_route.get(_route(method, url))
+        if not candidates:
+            return None
+        with self._lock:
+            cursor = self._route_cursor.get(_route(method, url), 0)
+            self._route_cursor[_route(method, url)] = cursor + 1
+        return candidates[cursor % len(candidates)]
+
+    def urlopen(self, original, ydl, req) -> Response:
+        method, url, data = _describe(req)
+        entry = self._find(method, url, data)
+        if entry is None:
+            raise yt_dlp.utils.DownloadError(f"No recorded response for {method} {url}")
+
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+        with open(os.path.join(self.path, 'bodies', entry['body']), 'rb') as f:
+            body = f.read()
+        headers = dict(entry['headers'], **{'Content-Length': str(len(body))})
+        response = Response(BytesIO(body), entry['final_url'], headers, status=entry['status'], reason=entry['reason'])
+        if entry['status'] >= 400:
+            raise HTTPError(response)
+        return response
+
+def install(handler) -> None:
+    """
+    Route every `YoutubeDL.urlopen` call through a recorder or replayer
+    """
+    original = getattr(yt_dlp.YoutubeDL.urlopen, '__replay_original__', yt_dlp.YoutubeDL.urlopen)
+
+    def urlopen(ydl, req):
+        return handler.urlopen(original, ydl, req)
+
+    urlopen.__replay_original__ = original
+    yt_dlp.YoutubeDL.urlopen = urlopen
+    logger.info(f"Extractor traffic {type(handler).__name__} installed for {handler.path}")
+
+def install_from_settings() -> None:
+    """
+    Enable recording or replay when configured
+    """
+    if settings.EXTRACTOR_TRAFFIC_MODE == 'record':
+        install(TrafficRecorder(settings.EXTRACTOR_FIXTURES_PATH))
+    elif settings.EXTRACTOR_TRAFFIC_MODE == 'replay':
+        install(TrafficReplayer(
+            settings.EXTRACTOR_FIXTURES_PATH,
+            settings.REPLAY_LATENCY_MS,
+            settings.REPLAY_LATENCY_JITTER_MS,
+        ))
@@ -0,0 +1,252 @@
+import time
+import asyncio
+import hashlib
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, List, Optional, Tuple
+
+from config import settings
+from services import timing
+
+# Client the current request is served for (API key or address), set per request by the router
+current_client: contextvars.ContextVar[str] = contextvars.ContextVar('current_client', default='local')
+
+# Set for bulk work (batches), which is served in the bulk priority class
+bulk_work: contextvars.ContextVar[bool] = contextvars.ContextVar('bulk_work', default=False)
+
+# Priority classes, most interactive first
+PRIORITY_INFO = 'info'
+PRIORITY_DOWNLOAD = 'download'
+PRIORITY_BULK = 'bulk'
+
+# How often idle flows and clients are forgotten
+_EVICT_INTERVAL_SECONDS = 60
+
+def mask_client(client: str) -> str:
+    """
+    Clients are API keys or addresses; show keys only by their first
+    characters and a short digest, enough to tell keys apart
+    """
+    if client.startswith('addr:') or client == 'local':
+        return client
+    return f"{client[:4]}...{hashlib.sha256(client.encode('utf-8')).hexdigest()[:8]}"
+
+class QuotaExceededError(Exception):
+    """Raised when a client is over its queue or byte quota"""
+
+class _Waiter:
+    __slots__ = ('client', 'priority', 'tag', 'future', 'enqueued')
+
+    def __init__(self, client: str, priority: str, tag: float):
+        self.client = client
+        self.priority = priority
+        self.tag = tag
+        self.future = asyncio.get_event_loop().create_future()
+        self.enqueued = time.monotonic()
+
+class _ClientStats:
+    """Counters behind the per-client queue view"""
+    __slots__ = ('running', 'queued', 'served', 'wait_ewma', 'wait_max', 'transfers')
+
+    def __init__(self):
+        self.running = 0
+        self.queued: Dict[str, int] = {}
+        self.served = 0
+        self.wait_ewma = 0.0
+        self.wait_max = 0.0
+        # (time, bytes) of downloads charged in the last hour
+        self.transfers: Deque[Tuple[float, int]] = deque()
+
+    def bytes_last_hour(self) -> int:
+        cutoff = time.time() - 3600
+        while self.transfers and self.transfers[0][0] < cutoff:
+            self.transfers.popleft()
+        return sum(size for _, size in self.transfers)
+
+class FairScheduler:
+    """
+    Admission control for executor-bound work (info extraction, downloads).
+
+    A fixed number of slots is shared by weighted fair queueing: every
+    waiter gets a virtual finish tag of max(now, its flow's last tag) +
+    1 / (class weight * client weight), where a flow is one client in one
+    priority class, and free slots go to the smallest tag. Interactive
+    classes get a larger share but bulk work always progresses, and a client
+    queueing hundreds of jobs only delays its own flow. Per-client
+    concurrency, queue length and bytes per hour are capped. Flows whose
+    last tag has fallen behind the virtual time, and clients with no work
+    and no bytes in the quota window, are forgotten.
+
+    Used from the event loop only.
+    """
+
+    def __init__(self, slots: int, priority_weights: Dict[str, float], client_weights: Dict[str, float],
+                 max_per_client: int, max_queued_per_client: int, bytes_per_hour: Optional[int]):
+        self.slots = slots
+        self.priority_weights = priority_weights
+        self.client_weights = client_weights
+        self.max_per_client = max_per_client
+        self.max_queued_per_client = max_queued_per_client
+        self.bytes_per_hour = bytes_per_hour
+        self._running = 0
+        self._vtime = 0.0
+        self._last_tag: Dict[Tuple[str, str], float] = {}
+        self._queue: List[_Waiter] = []
+        self._clients: Dict[str, _ClientStats] = {}
+        self._next_evict = time.monotonic() + _EVICT_INTERVAL_SECONDS
+
+    def _stats(self, client: str) -> _ClientStats:
+        stats = self._clients.get(client)
+        if stats is None:
+            stats = self._clients[client] = _ClientStats()
+        return stats
+
+    def _can_run(self, client: str) -> bool:
+        return self._running < self.slots and self._stats(client).running < self.max_per_client
+
+    def _grant(self, client: str, waited: float) -> None:
+        stats = self._stats(client)
+        self._running += 1
+        stats.running += 1
+        stats.served += 1
+        stats.wait_ewma = waited if stats.served == 1 else 0.9 * stats.wait_ewma + 0.1 * waited
+        stats.wait_max = max(stats.wait_max, waited)
+
+    def _dispatch(self) -> None:
+        """
+        Hand free slots to the eligible waiters with the smallest tags
+        """
+        while self._queue and self._running < self.slots:
+            eligible = [waiter for waiter in self._queue if self._stats(waiter.client).running < self.max_per_client]
+            if not eligible:
+                return
+            waiter = min(eligible, key=lambda w: w.tag)
+            self._queue.remove(waiter)
+            self._stats(waiter.client).queued[waiter.priority] -= 1
+            self._vtime = max(self._vtime, waiter.tag)
+            self._grant(waiter.client, time.monotonic() - waiter.enqueued)
+            waiter.future.set_result(None)
+
+    def configure(self, **limits) -> None:
+        """
+        Change limits at runtime; raised limits admit waiters at once
+        """
+        for name, value in limits.items():
+            setattr(self, name, value)
+        self._dispatch()
+
+    def check_bytes(self, client: str) -> None:
+        """
+        Refuse new downloads for a client over its hourly byte quota
+        """
+        if self.bytes_per_hour and self._stats(client).bytes_last_hour() >= self.bytes_per_hour:
+            raise QuotaExceededError(f"Download quota of {self.bytes_per_hour} bytes per hour exceeded")
+
+    def charge(self, client: str, size: int) -> None:
+        """
+        Count downloaded bytes against a client's hourly quota
+        """
+        self._stats(client).transfers.append((time.time(), size))
+
+    async def acquire(self, client: str, priority: str) -> None:
+        if not self._queue and self._can_run(client):
+            self._grant(client, 0.0)
+            return
+
+        stats = self._stats(client)
+        if sum(stats.queued.values()) >= self.max_queued_per_client:
+            raise QuotaExceededError(f"Too many queued requests (limit {self.max_queued_per_client})")
+
+        weight = self.priority_weights.get(priority, 1.0) * self.client_weights.get(client, 1.0)
+        flow = (client, priority)
+        tag = max(self._vtime, self._last_tag.get(flow, 0.0)) + 1.0 / weight
+        self._last_tag[flow] = tag
+        waiter = _Waiter(client, priority, tag)
+        self._queue.append(waiter)
+        stats.queued[priority] = stats.queued.get(priority, 0) + 1
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as we were cancelled
+                self.release(client)
+            elif waiter in self._queue:
+                self._queue.remove(waiter)
+                stats.queued[priority] -= 1
+            raise
+
+    def release(self, client: str) -> None:
+        self._running -= 1
+        self._stats(client).running -= 1
+        self._dispatch()
+        self._evict_idle()
+
+    def _evict_idle(self) -> None:
+        """
+        Forget idle flows and clients, at most every _EVICT_INTERVAL_SECONDS
+        """
+        now = time.monotonic()
+        if now < self._next_evict:
+            return
+        self._next_evict = now + _EVICT_INTERVAL_SECONDS
+        # A tag at or behind the virtual time no longer affects new tags
+        for flow in [flow for flow, tag in self._last_tag.items() if tag <= self._vtime]:
+            del self._last_tag[flow]
+        for client in [client for client, stats in self._clients.items()
+                       if not stats.running and not any(stats.queued.values()) and not stats.bytes_last_hour()]:
+            del self._clients[client]
+
+    @asynccontextmanager
+    async def slot(self, priority: str):
+        """
+        Hold a slot for the current client while running executor-bound work
+        """
+        client = current_client.get()
+        with timing.stage('admission'):
+            await self.acquire(client, priority)
+        try:
+            yield
+        finally:
+            self.release(client)
+
+    def load(self) -> Tuple[int, int]:
+        """
+        (running, queued) work, without the per-client breakdown
+        """
+        return self._running, len(self._queue)
+
+    def snapshot(self) -> Dict:
+        """
+        Queue depth, running work, wait times and bytes per client, with
+        API keys masked (the view is public)
+        """
+        now = time.monotonic()
+        clients = {}
+        for client, stats in self._clients.items():
+            waiting = [now - waiter.enqueued for waiter in self._queue if waiter.client == client]
+            clients[mask_client(client)] = {
+                'running': stats.running,
+                'queued': {priority: count for priority, count in stats.queued.items() if count},
+                'served': stats.served,
+                'avg_wait_seconds': round(stats.wait_ewma, 3),
+                'max_wait_seconds': round(stats.wait_max, 3),
+                'oldest_queued_seconds': round(max(waiting), 3) if waiting else 0.0,
+                'bytes_last_hour': stats.bytes_last_hour(),
+            }
+        return {
+            'slots': self.slots,
+            'running': self._running,
+            'queued': len(self._queue),
+            'clients': clients,
+        }
+
+fair_scheduler = FairScheduler(
+    settings.SCHEDULER_SLOTS,
+    settings.PRIORITY_WEIGHTS,
+    settings.CLIENT_WEIGHTS,
+    settings.CLIENT_MAX_CONCURRENCY,
+    settings.CLIENT_MAX_QUEUED,
+    settings.CLIENT_BYTES_PER_HOUR,
+)
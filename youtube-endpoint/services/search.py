@@ -0,0 +1,237 @@
+import json
+import base64
+import asyncio
+import binascii
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import yt_dlp
+from yt_dlp.utils import traverse_obj, variadic
+from yt_dlp.version import __version__ as yt_dlp_version
+
+from services.cache import TTLCache
+from services import timing
+
+logger = logging.getLogger(__name__)
+
+# Where a search response keeps its results, first page or continuation
+_CONTENT_KEYS = (
+    ('contents', 'twoColumnSearchResultsRenderer', 'primaryContents', 'sectionListRenderer', 'contents'),
+    ('onResponseReceivedCommands', 0, 'appendContinuationItemsAction', 'continuationItems'),
+)
+
+class SearchUnsupportedError(Exception):
+    """Raised when the installed yt-dlp's search internals no longer match what SearchPager calls"""
+
+def normalize_query(query: str) -> str:
+    """
+    Collapse whitespace and case so equivalent queries share cache entries
+    """
+    return ' '.join(query.split()).casefold()
+
+def encode_cursor(query: str, page: int, continuation: Optional[str] = None, offset: int = 0) -> str:
+    """
+    Opaque cursor for a page of a normalized query. The page starts
+    `offset` entries into the upstream result page fetched with
+    `continuation` (the first one if None), so any worker can resume the
+    search there without re-reading earlier pages.
+    """
+    data = {'q': query, 'p': page}
+    if continuation:
+        data['c'] = continuation
+    if offset:
+        data['o'] = offset
+    data = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, int, Optional[str], int]:
+    """
+    Inverse of `encode_cursor`; raises ValueError for anything else
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        query, page = data['q'], data['p']
+        continuation, offset = data.get('c'), data.get('o', 0)
+    except (binascii.Error, ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError('Invalid search cursor')
+    if not isinstance(query, str) or not query or not isinstance(page, int) or page < 0:
+        raise ValueError('Invalid search cursor')
+    if continuation is not None and (not isinstance(continuation, str) or not continuation):
+        raise ValueError('Invalid search cursor')
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError('Invalid search cursor')
+    return query, page, continuation, offset
+
+def _lightweight(entry: Dict) -> Dict:
+    """
+    The few fields of a flat search entry worth returning
+    """
+    thumbnails = entry.get('thumbnails') or []
+    video_id = entry.get('id')
+    return {
+        'id': video_id,
+        'title': entry.get('title') or 'Unknown Title',
+        'url': f"https://www.youtube.com/watch?v={video_id}",
+        'duration': entry.get('duration'),
+        'channel': entry.get('channel') or entry.get('uploader'),
+        'view_count': entry.get('view_count'),
+        'thumbnail': thumbnails[-1].get('url') if thumbnails else entry.get('thumbnail'),
+    }
+
+class _SearchSession:
+    """
+    A yt-dlp search client for one query: the YoutubeDL instance, the web
+    client config fetched once for it, and the last upstream result page,
+    which the next page usually starts in. Only used under `lock`; the
+    YoutubeDL instance is closed once the session is evicted and idle.
+    """
+    __slots__ = ('ydl', 'ie', 'ytcfg', 'visitor_data', 'last_page', 'lock', 'retired')
+
+    def __init__(self):
+        self.ydl = None
+        self.ie = None
+        self.ytcfg = None
+        self.visitor_data = None
+        # (continuation, entries, next continuation) of the last upstream page
+        self.last_page: Optional[Tuple[Optional[str], List[Dict], Optional[str]]] = None
+        self.lock = asyncio.Lock()
+        self.retired = False
+
+    def retire(self) -> None:
+        """
+        Close the YoutubeDL instance now, or when the current read is done
+        """
+        self.retired = True
+        if not self.lock.locked():
+            self.close()
+
+    def close(self) -> None:
+        if self.ydl is not None:
+            self.ydl.close()
+            self.ydl = self.ie = None
+
+class SearchPager:
+    """
+    Cursor-paginated search results, cached per normalized query and page.
+
+    A page is read from the upstream position its cursor carries, so deep
+    pages never re-resolve earlier ones, even after the query's session
+    was evicted or on another worker. Concurrent requests for the same
+    query are coalesced on the session lock: the first one resolves the
+    page, the rest find it in the cache.
+    """
+
+    def __init__(self, page_size: int, max_queries: int, ttl_seconds: float):
+        self.page_size = page_size
+        self._pages = TTLCache(max_queries * 4, ttl_seconds)
+        self._sessions = TTLCache(max_queries, ttl_seconds, on_evict=_SearchSession.retire)
+
+    def configure(self, max_queries: Optional[int] = None, ttl_seconds: Optional[float] = None) -> None:
+        self._pages.configure(max_queries * 4 if max_queries else None, ttl_seconds)
+        self._sessions.configure(max_queries, ttl_seconds)
+
+    async def page(self, query: str, page: int, continuation: Optional[str] = None,
+                   offset: int = 0, ydl_options: Optional[Dict] = None) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+        """
+        Results on page `page` of a normalized query, starting at the given
+        upstream position, and the position of the next page (None at the end)
+        """
+        key = (query, page, continuation, offset)
+        cached = self._pages.get(key)
+        if cached is not None:
+            return cached
+
+        session = self._sessions.get(query)
+        if session is None:
+            session = _SearchSession()
+            self._sessions.set(query, session)
+
+        with timing.stage('wait'):
+            await session.lock.acquire()
+        try:
+            cached = self._pages.get(key)
+            if cached is not None:
+                return cached
+            try:
+                entries, next_position = await timing.run_in_executor(
+                    self._read_page, session, query, continuation, offset, ydl_options or {}, stage_name='search')
+            except Exception:
+                # Start the next request with a fresh client
+                if self._sessions.get(query) is session:
+                    self._sessions.pop(query)
+                    session.retired = True
+                raise
+            result = ([_lightweight(entry) for entry in entries], next_position)
+            self._pages.set(key, result)
+            return result
+        finally:
+            session.lock.release()
+            if session.retired:
+                session.close()
+
+    def _read_page(self, session: _SearchSession, query: str, continuation: Optional[str], offset: int,
+                   ydl_options: Dict) -> Tuple[List[Dict], Optional[Tuple[str, int]]]:
+        """
+        Read one page of entries from an upstream position (runs in a worker thread)
+        """
+        entries: List[Dict] = []
+        while True:
+            batch, next_continuation = self._read_upstream(session, query, continuation, ydl_options)
+            batch = batch[offset:]
+            wanted = self.page_size - len(entries)
+            entries.extend(batch[:wanted])
+            if len(batch) > wanted:
+                # The next page starts further into this upstream page
+                return entries, (continuation, offset + wanted)
+            if not next_continuation:
+                return entries, None
+            continuation, offset = next_continuation, 0
+            if len(entries) == self.page_size:
+                return entries, (continuation, 0)
+
+    def _read_upstream(self, session: _SearchSession, query: str, continuation: Optional[str],
+                       ydl_options: Dict) -> Tuple[List[Dict], Optional[str]]:
+        """
+        One upstream result page: its entries and the continuation of the
+        next one. Mirrors YoutubeSearchIE._search_results, which only offers
+        the entries as one generator and never exposes the continuation.
+        """
+        if session.last_page is not None and session.last_page[0] == continuation:
+            return session.last_page[1], session.last_page[2]
+
+        try:
+            return self._read_upstream_page(session, query, continuation, ydl_options)
+        except (AttributeError, TypeError) as e:
+            # A yt-dlp release renamed or reshaped a private helper this relies on
+            logger.error(f"Search internals of yt-dlp {yt_dlp_version} are not supported: {e!r}")
+            raise SearchUnsupportedError(
+                f"Search is unavailable with the installed yt-dlp ({yt_dlp_version}); "
+                "update yt-dlp or this service") from e
+
+    def _read_upstream_page(self, session: _SearchSession, query: str, continuation: Optional[str],
+                            ydl_options: Dict) -> Tuple[List[Dict], Optional[str]]:
+        if session.ydl is None:
+            logger.info(f"Searching for: {query}")
+            session.ydl = yt_dlp.YoutubeDL(ydl_options)
+            session.ie = session.ydl.get_info_extractor('YoutubeSearch')
+        ie = session.ie
+        display_id = f'query "{query}"'
+        if session.ytcfg is None:
+            session.ytcfg = ie._download_ytcfg('web', display_id) if not ie.skip_webpage else {}
+
+        data = {'query': query, 'params': ie._SEARCH_PARAMS}
+        if continuation:
+            data.update(ie._build_api_continuation_query(continuation))
+        headers = ie.generate_api_headers(ytcfg=session.ytcfg, visitor_data=session.visitor_data, default_client='web')
+        response = ie._extract_response(
+            item_id=display_id, ep='search', query=data, default_client='web',
+            check_get_keys=tuple({keys[0] for keys in _CONTENT_KEYS}), ytcfg=session.ytcfg, headers=headers)
+        session.visitor_data = ie._extract_visitor_data(response) or session.visitor_data
+
+        contents = traverse_obj(response, *_CONTENT_KEYS)
+        next_query = [None]
+        entries = [entry for entry in ie._extract_entries({'contents': list(variadic(contents))}, next_query)
+                   if entry and entry.get('id')]
+        next_continuation = (next_query[0] or {}).get('continuation')
+        session.last_page = (continuation, entries, next_continuation)
+        return entries, next_continuation
@@ -0,0 +1,303 @@
+import abc
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+from config import settings
+
+# How often the local backends sweep out expired locks and entries
+_PURGE_INTERVAL_SECONDS = 60
+
+class StateBackend(abc.ABC):
+    """
+    Shared state for job records, in-flight locks, cache entries and
+    artifact locations, so several workers or nodes see one view of the
+    work and each video is extracted and downloaded once.
+
+    Methods are synchronous; `shared` backends do I/O and are called from
+    the executor. Artifact locations carry the `node` that holds the files.
+    """
+    shared = True
+
+    # In-flight locks
+    @abc.abstractmethod
+    def acquire_lock(self, name: str, ttl_seconds: float) -> Optional[str]:
+        """Take a lock, returning its token, or None if another owner holds it"""
+
+    @abc.abstractmethod
+    def release_lock(self, name: str, token: str) -> None:
+        """Release a lock if it is still held with `token`"""
+
+    # Cache entries
+    @abc.abstractmethod
+    def get_cache(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abc.abstractmethod
+    def set_cache(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        ...
+
+    # Job records
+    @abc.abstractmethod
+    def put_job(self, key: str, record: Dict) -> None:
+        ...
+
+    @abc.abstractmethod
+    def delete_job(self, key: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    def list_jobs(self) -> List[Dict]:
+        ...
+
+    # Artifact locations
+    @abc.abstractmethod
+    def get_artifact(self, key: str) -> Optional[Dict]:
+        ...
+
+    @abc.abstractmethod
+    def set_artifact(self, key: str, location: Dict, ttl_seconds: float) -> None:
+        ...
+
+class MemoryStateBackend(StateBackend):
+    """Process-local state; the default for a single worker"""
+    shared = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._locks: Dict[str, tuple] = {}
+        self._values: Dict[str, tuple] = {}
+        self._jobs: Dict[str, Dict] = {}
+        self._next_purge = time.time() + _PURGE_INTERVAL_SECONDS
+
+    def _purge(self) -> None:
+        """
+        Drop expired locks and entries that were never read again (lock held)
+        """
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + _PURGE_INTERVAL_SECONDS
+        for store in (self._locks, self._values):
+            for key in [key for key, entry in store.items() if entry[0] < now]:
+                del store[key]
+
+    def _get(self, key: str):
+        entry = self._values.get(key)
+        if entry is None or entry[0] < time.time():
+            self._values.pop(key, None)
+            return None
+        return entry[1]
+
+    def acquire_lock(self, name: str, ttl_seconds: float) -> Optional[str]:
+        with self._lock:
+            held = self._locks.get(name)
+            if held is not None and held[0] >= time.time():
+                return None
+            self._purge()
+            token = uuid.uuid4().hex
+            self._locks[name] = (time.time() + ttl_seconds, token)
+            return token
+
+    def release_lock(self, name: str, token: str) -> None:
+        with self._lock:
+            held = self._locks.get(name)
+            if held is not None and held[1] == token:
+                del self._locks[name]
+
+    def get_cache(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            return self._get(f"cache:{key}")
+
+    def set_cache(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        with self._lock:
+            self._purge()
+            self._values[f"cache:{key}"] = (time.time() + ttl_seconds, value)
+
+    def put_job(self, key: str, record: Dict) -> None:
+        with self._lock:
+            self._jobs[key] = dict(record)
+
+    def delete_job(self, key: str) -> None:
+        with self._lock:
+            self._jobs.pop(key, None)
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            return [dict(record) for record in self._jobs.values()]
+
+    def get_artifact(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            return self._get(f"artifact:{key}")
+
+    def set_artifact(self, key: str, location: Dict, ttl_seconds: float) -> None:
+        with self._lock:
+            self._purge()
+            self._values[f"artifact:{key}"] = (time.time() + ttl_seconds, dict(location))
+
+class SQLiteStateBackend(StateBackend):
+    """
+    State in a local SQLite database, shared by all workers on one node.
+    SQLite's own file locking serializes writers across processes.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS locks (name TEXT PRIMARY KEY, token TEXT NOT NULL, expires_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS jobs (key TEXT PRIMARY KEY, record TEXT NOT NULL);
+        """)
+        self._next_purge = 0.0
+
+    def _purge(self) -> None:
+        """
+        Delete expired locks and entries that were never read again (lock held)
+        """
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + _PURGE_INTERVAL_SECONDS
+        self._db.execute("DELETE FROM entries WHERE expires_at < ?", (now,))
+        self._db.execute("DELETE FROM locks WHERE expires_at < ?", (now,))
+
+    def _get_entry(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM entries WHERE key = ? AND expires_at >= ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set_entry(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        with self._lock:
+            self._purge()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl_seconds),
+            )
+
+    def acquire_lock(self, name: str, ttl_seconds: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("DELETE FROM locks WHERE name = ? AND expires_at < ?", (name, now))
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO locks (name, token, expires_at) VALUES (?, ?, ?)",
+                    (name, token, now + ttl_seconds),
+                )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return token if cursor.rowcount == 1 else None
+
+    def release_lock(self, name: str, token: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM locks WHERE name = ? AND token = ?", (name, token))
+
+    def get_cache(self, key: str) -> Optional[bytes]:
+        return self._get_entry(f"cache:{key}")
+
+    def set_cache(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self._set_entry(f"cache:{key}", value, ttl_seconds)
+
+    def put_job(self, key: str, record: Dict) -> None:
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO jobs (key, record) VALUES (?, ?)", (key, json.dumps(record)))
+
+    def delete_job(self, key: str) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE key = ?", (key,))
+
+    def list_jobs(self) -> List[Dict]:
+        with self._lock:
+            rows = self._db.execute("SELECT record FROM jobs").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_artifact(self, key: str) -> Optional[Dict]:
+        value = self._get_entry(f"artifact:{key}")
+        return json.loads(value) if value else None
+
+    def set_artifact(self, key: str, location: Dict, ttl_seconds: float) -> None:
+        self._set_entry(f"artifact:{key}", json.dumps(location).encode('utf-8'), ttl_seconds)
+
+# Delete a lock only if it still carries our token
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class RedisStateBackend(StateBackend):
+    """
+    State in any server speaking the Redis protocol (Redis, Valkey, KeyDB or a
+    local stand-in), shared by every node in a cluster.
+
+    Requires the redis package, which is only imported when configured and
+    no client is passed in.
+    """
+
+    def __init__(self, url: str, prefix: str = 'youtube-endpoint', client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("The Redis state backend requires redis (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self._prefix = prefix
+        self._release = self._client.register_script(_RELEASE_SCRIPT)
+
+    def _key(self, *parts: str) -> str:
+        return ':'.join((self._prefix,) + parts)
+
+    def acquire_lock(self, name: str, ttl_seconds: float) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if self._client.set(self._key('lock', name), token, nx=True, px=int(ttl_seconds * 1000)):
+            return token
+        return None
+
+    def release_lock(self, name: str, token: str) -> None:
+        self._release(keys=[self._key('lock', name)], args=[token])
+
+    def get_cache(self, key: str) -> Optional[bytes]:
+        return self._client.get(self._key('cache', key))
+
+    def set_cache(self, key: str, value: bytes, ttl_seconds: float) -> None:
+        self._client.set(self._key('cache', key), value, px=int(ttl_seconds * 1000))
+
+    def put_job(self, key: str, record: Dict) -> None:
+        self._client.hset(self._key('jobs'), key, json.dumps(record))
+
+    def delete_job(self, key: str) -> None:
+        self._client.hdel(self._key('jobs'), key)
+
+    def list_jobs(self) -> List[Dict]:
+        return [json.loads(value) for value in self._client.hvals(self._key('jobs'))]
+
+    def get_artifact(self, key: str) -> Optional[Dict]:
+        value = self._client.get(self._key('artifact', key))
+        return json.loads(value) if value else None
+
+    def set_artifact(self, key: str, location: Dict, ttl_seconds: float) -> None:
+        self._client.set(self._key('artifact', key), json.dumps(location), px=int(ttl_seconds * 1000))
+
+def create_state_backend() -> StateBackend:
+    """
+    Build the state backend described by the settings
+    """
+    if settings.STATE_BACKEND == 'sqlite':
+        return SQLiteStateBackend(settings.STATE_SQLITE_PATH)
+    if settings.STATE_BACKEND == 'redis':
+        return RedisStateBackend(settings.STATE_REDIS_URL)
+    return MemoryStateBackend()
+
+state_backend = create_state_backend()
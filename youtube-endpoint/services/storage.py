@@ -0,0 +1,427 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import logging
+from typing import BinaryIO, Dict, Iterable, Optional, Set, Tuple
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Files that belong to unfinished work and must never leave the hot tier;
+# dot-prefixed names (relayout and transcode outputs, sidecars) are skipped too
+_IN_PROGRESS_SUFFIXES = ('.part', '.ytdl', '.tmp', '.temp')
+
+# HLS directories are only finished once ffmpeg has written the playlist
+_HLS_DIR = 'hls'
+_HLS_PLAYLIST = 'index.m3u8'
+
+def _temp_path(dest: str) -> str:
+    """
+    A new dot-prefixed temp file next to `dest`, unique to its writer (workers
+    may copy the same file at once); skipped by `LocalTier.files`
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(dest), prefix=f".{os.path.basename(dest)}.", suffix='.tmp')
+    os.close(fd)
+    return tmp_path
+
+def _replace_from_temp(dest: str, write) -> None:
+    """
+    Write `dest` through a unique temp file with `write(tmp_path)`
+    """
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = _temp_path(dest)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+class LocalTier:
+    """Storage tier backed by a local directory or mounted filesystem"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def local_path(self, relative_path: str) -> str:
+        return os.path.join(self.root, relative_path)
+
+    def exists(self, relative_path: str) -> bool:
+        return os.path.isfile(self.local_path(relative_path))
+
+    def stat(self, relative_path: str) -> Tuple[int, float]:
+        """
+        Size and mtime of a stored file
+        """
+        st = os.stat(self.local_path(relative_path))
+        return st.st_size, st.st_mtime
+
+    def open(self, relative_path: str) -> BinaryIO:
+        return open(self.local_path(relative_path), 'rb')
+
+    def put(self, relative_path: str, src_path: str) -> None:
+        """
+        Copy a file into the tier, keeping its mtime (part of the ETag)
+        """
+        _replace_from_temp(self.local_path(relative_path), lambda tmp_path: shutil.copy2(src_path, tmp_path))
+
+    def get(self, relative_path: str, dest_path: str) -> None:
+        """
+        Copy a file out of the tier to a local path
+        """
+        _replace_from_temp(dest_path, lambda tmp_path: shutil.copy2(self.local_path(relative_path), tmp_path))
+
+    def delete(self, relative_path: str) -> None:
+        path = self.local_path(relative_path)
+        try:
+            os.remove(path)
+            os.rmdir(os.path.dirname(path))
+        except OSError:
+            # Already gone, or the directory still holds other files
+            pass
+
+    def files(self) -> Iterable[Tuple[str, int, float]]:
+        """
+        Walk finished files in per-download directories as (relative_path, size, atime)
+        """
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+            if dirpath == self.root:
+                continue
+            if os.path.basename(dirpath) == _HLS_DIR and _HLS_PLAYLIST not in filenames:
+                # Segments are still being cut
+                continue
+            for filename in filenames:
+                if filename.startswith('.') or filename.endswith(_IN_PROGRESS_SUFFIXES):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield os.path.relpath(path, self.root).replace(os.sep, '/'), st.st_size, max(st.st_atime, st.st_mtime)
+
+class S3Tier:
+    """
+    Storage tier backed by an S3-compatible bucket (MinIO, Ceph, AWS).
+
+    Requires boto3, which is only imported when this tier is configured.
+    """
+
+    def __init__(self, bucket: str, prefix: str = '', endpoint_url: Optional[str] = None):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("The S3 cold tier requires boto3 (pip install boto3)")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self._client = boto3.client('s3', endpoint_url=endpoint_url)
+
+    def _key(self, relative_path: str) -> str:
+        return f"{self.prefix}/{relative_path}" if self.prefix else relative_path
+
+    def local_path(self, relative_path: str) -> Optional[str]:
+        return None
+
+    def exists(self, relative_path: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self._key(relative_path))
+            return True
+        except self._client.exceptions.ClientError:
+            return False
+
+    def stat(self, relative_path: str) -> Tuple[int, float]:
+        head = self._client.head_object(Bucket=self.bucket, Key=self._key(relative_path))
+        mtime = float(head.get('Metadata', {}).get('mtime') or head['LastModified'].timestamp())
+        return head['ContentLength'], mtime
+
+    def open(self, relative_path: str) -> BinaryIO:
+        return _S3RangeReader(self._client, self.bucket, self._key(relative_path))
+
+    def put(self, relative_path: str, src_path: str) -> None:
+        # The source mtime travels as metadata so ETags stay stable across tiers
+        self._client.upload_file(src_path, self.bucket, self._key(relative_path), ExtraArgs={
+            'Metadata': {'mtime': repr(os.stat(src_path).st_mtime)},
+        })
+
+    def get(self, relative_path: str, dest_path: str) -> None:
+        def _download(tmp_path: str) -> None:
+            self._client.download_file(self.bucket, self._key(relative_path), tmp_path)
+            _, mtime = self.stat(relative_path)
+            os.utime(tmp_path, (time.time(), mtime))
+        _replace_from_temp(dest_path, _download)
+
+    def delete(self, relative_path: str) -> None:
+        self._client.delete_object(Bucket=self.bucket, Key=self._key(relative_path))
+
+class _S3RangeReader:
+    """Minimal seekable reader over an S3 object using ranged GETs"""
+
+    def __init__(self, client, bucket: str, key: str):
+        self._client = client
+        self._bucket = bucket
+        self._key = key
+        self._position = 0
+
+    def seek(self, offset: int) -> int:
+        self._position = offset
+        return offset
+
+    def read(self, size: int) -> bytes:
+        try:
+            response = self._client.get_object(
+                Bucket=self._bucket, Key=self._key,
+                Range=f"bytes={self._position}-{self._position + size - 1}",
+            )
+        except self._client.exceptions.ClientError as e:
+            # Reading past the end is an InvalidRange error, not an empty body
+            if e.response.get('Error', {}).get('Code') == 'InvalidRange':
+                return b''
+            raise
+        data = response['Body'].read()
+        self._position += len(data)
+        return data
+
+    def close(self) -> None:
+        pass
+
+class _ColdReader:
+    """Reader over a cold copy that tells the storage when it is closed"""
+
+    def __init__(self, f: BinaryIO, storage: 'TieredStorage', relative_path: str):
+        self._f = f
+        self._storage = storage
+        self._relative_path = relative_path
+        self._closed = False
+
+    def seek(self, offset: int) -> int:
+        return self._f.seek(offset)
+
+    def read(self, size: int) -> bytes:
+        return self._f.read(size)
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._f.close()
+        finally:
+            self._storage._release(self._relative_path)
+
+    def __enter__(self) -> '_ColdReader':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+class TieredStorage:
+    """
+    Artifact storage with a fast local hot tier and an optional larger cold tier.
+
+    New downloads land in the hot tier. `rebalance` demotes the least recently
+    accessed files to the cold tier when the hot tier is over budget or a file
+    has been idle too long; reading a cold file promotes it back. A promoted
+    file's cold copy is only deleted once no reader still streams from it.
+    """
+
+    def __init__(self, hot: LocalTier, cold=None):
+        self.hot = hot
+        self.cold = cold
+        self._lock = threading.Lock()
+        self._last_access: Dict[str, float] = {}
+        self._in_cold: Set[str] = set()
+        self._promoting: Set[str] = set()
+        # Open readers of cold copies, and promoted copies waiting for them to close
+        self._cold_readers: Dict[str, int] = {}
+        self._cold_garbage: Set[str] = set()
+
+    def touch(self, relative_path: str) -> None:
+        """
+        Record an access for recency-based demotion (nothing to record
+        without a cold tier)
+        """
+        if self.cold is None:
+            return
+        with self._lock:
+            self._last_access[relative_path] = time.time()
+
+    def is_cold(self, relative_path: str) -> bool:
+        return relative_path in self._in_cold
+
+    def locate(self, relative_path: str):
+        """
+        Find the tier holding a file (filesystem/network I/O; call off the event loop)
+        """
+        if relative_path in self._in_cold:
+            return self.cold
+        if self.hot.exists(relative_path):
+            return self.hot
+        if self.cold is not None and self.cold.exists(relative_path):
+            with self._lock:
+                self._in_cold.add(relative_path)
+            return self.cold
+        return None
+
+    def open(self, relative_path: str) -> BinaryIO:
+        """
+        Open a file from whichever tier holds it
+        """
+        with self._lock:
+            cold = relative_path in self._in_cold
+            if cold:
+                self._cold_readers[relative_path] = self._cold_readers.get(relative_path, 0) + 1
+        if not cold:
+            try:
+                return self.hot.open(relative_path)
+            except FileNotFoundError:
+                # Demoted by another worker since this one last looked
+                if self.cold is None or not self.cold.exists(relative_path):
+                    raise
+            with self._lock:
+                self._in_cold.add(relative_path)
+                self._cold_readers[relative_path] = self._cold_readers.get(relative_path, 0) + 1
+        try:
+            return _ColdReader(self.cold.open(relative_path), self, relative_path)
+        except BaseException:
+            self._release(relative_path)
+            raise
+
+    def _release(self, relative_path: str) -> None:
+        """
+        A cold reader closed; delete the cold copy if it was promoted meanwhile
+        """
+        with self._lock:
+            readers = self._cold_readers.get(relative_path, 0) - 1
+            if readers > 0:
+                self._cold_readers[relative_path] = readers
+                return
+            self._cold_readers.pop(relative_path, None)
+            if relative_path not in self._cold_garbage:
+                return
+            self._cold_garbage.discard(relative_path)
+        self._delete_cold(relative_path)
+
+    def _delete_cold(self, relative_path: str) -> None:
+        try:
+            self.cold.delete(relative_path)
+        except Exception as e:
+            logger.error(f"Failed to delete the cold copy of {relative_path}: {str(e)}")
+
+    def hot_path(self, relative_path: str) -> Optional[str]:
+        """
+        Local path of a file if it is currently in the hot tier
+        """
+        if relative_path in self._in_cold:
+            return None
+        return self.hot.local_path(relative_path)
+
+    def promote(self, relative_path: str) -> bool:
+        """
+        Copy a cold file back into the hot tier (call off the event loop)
+        """
+        with self._lock:
+            if relative_path not in self._in_cold or relative_path in self._promoting:
+                return False
+            self._promoting.add(relative_path)
+        try:
+            self.cold.get(relative_path, self.hot.local_path(relative_path))
+            with self._lock:
+                self._in_cold.discard(relative_path)
+                # Responses already streaming the cold copy finish from it
+                in_use = self._cold_readers.get(relative_path, 0) > 0
+                if in_use:
+                    self._cold_garbage.add(relative_path)
+            if not in_use:
+                self._delete_cold(relative_path)
+            self.touch(relative_path)
+            logger.info(f"Promoted {relative_path} to the hot tier")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to promote {relative_path}: {str(e)}")
+            return False
+        finally:
+            with self._lock:
+                self._promoting.discard(relative_path)
+
+    def demote(self, relative_path: str) -> None:
+        """
+        Move a hot file to the cold tier (call off the event loop)
+        """
+        try:
+            self.cold.put(relative_path, self.hot.local_path(relative_path))
+        except FileNotFoundError:
+            # Every worker rebalances the same hot directory; another one got here first
+            if not self.cold.exists(relative_path):
+                raise
+        with self._lock:
+            self._in_cold.add(relative_path)
+            # The cold copy is live again; a pending cleanup must not remove it
+            self._cold_garbage.discard(relative_path)
+            self._last_access.pop(relative_path, None)
+        # Readers that already opened the hot copy keep their file handle
+        self.hot.delete(relative_path)
+        logger.info(f"Demoted {relative_path} to the cold tier")
+
+    def rebalance(self, protected: Iterable[str] = ()) -> int:
+        """
+        Demote idle or least recently used hot files until the hot tier is
+        within budget. Files under `protected` directories are skipped.
+        """
+        if self.cold is None:
+            return 0
+
+        protected = tuple(os.path.relpath(path, self.hot.root).replace(os.sep, '/') + '/' for path in protected)
+        now = time.time()
+        with self._lock:
+            last_access = dict(self._last_access)
+        files = []
+        hot_bytes = 0
+        seen = set()
+        for relative_path, size, atime in self.hot.files():
+            seen.add(relative_path)
+            hot_bytes += size
+            if relative_path.startswith(protected):
+                continue
+            files.append((last_access.get(relative_path, atime), relative_path, size))
+
+        # Forget accesses of files that are no longer in the hot tier
+        with self._lock:
+            for relative_path in [path for path in self._last_access if path not in seen]:
+                del self._last_access[relative_path]
+
+        # Oldest access first
+        files.sort()
+        demoted = 0
+        for last_access, relative_path, size in files:
+            over_budget = hot_bytes > settings.HOT_TIER_MAX_BYTES
+            idle = now - last_access > settings.HOT_TIER_IDLE_SECONDS
+            if not over_budget and not idle:
+                break
+            try:
+                self.demote(relative_path)
+            except Exception as e:
+                logger.error(f"Failed to demote {relative_path}: {str(e)}")
+                continue
+            hot_bytes -= size
+            demoted += 1
+        return demoted
+
+def create_storage() -> TieredStorage:
+    """
+    Build the tiered storage described by the settings
+    """
+    hot = LocalTier(settings.DOWNLOAD_PATH)
+    cold = None
+    if settings.COLD_STORAGE == 'local':
+        cold = LocalTier(settings.COLD_STORAGE_PATH)
+    elif settings.COLD_STORAGE == 's3':
+        cold = S3Tier(settings.COLD_S3_BUCKET, settings.COLD_S3_PREFIX, settings.COLD_S3_ENDPOINT_URL)
+    return TieredStorage(hot, cold)
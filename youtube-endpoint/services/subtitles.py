@@ -0,0 +1,115 @@
+import re
+import html
+from typing import Dict, List, Optional, Tuple
+
+# A cue is (start ms, end ms, text)
+Cue = Tuple[int, int, str]
+
+_TIMING_RE = re.compile(r'^((?:\d+:)?\d{2}:\d{2}\.\d{3})\s+-->\s+((?:\d+:)?\d{2}:\d{2}\.\d{3})')
+
+# Inline timestamps (<00:00:01.199>) and styling tags (<c>, </c>, <b>, <v Name>)
+_TAG_RE = re.compile(r'<[^>]*>')
+
+def subtitle_tracks(info: Dict) -> Dict[str, Dict[str, str]]:
+    """
+    VTT URL per language of the manual subtitles and automatic captions in
+    a yt-dlp info dict
+    """
+    tracks = {}
+    for kind, source in (('manual', 'subtitles'), ('auto', 'automatic_captions')):
+        urls = {}
+        for lang, formats in (info.get(source) or {}).items():
+            if lang == 'live_chat':
+                continue
+            for fmt in formats or []:
+                if fmt.get('ext') == 'vtt' and fmt.get('url'):
+                    urls[lang] = fmt['url']
+                    break
+        tracks[kind] = urls
+    return tracks
+
+def pick_track(tracks: Dict[str, Dict[str, str]], lang: str, auto: bool = True) -> Optional[Tuple[str, str, str]]:
+    """
+    Best (kind, language, url) for a requested language: manual subtitles
+    before automatic captions, then an exact match before a regional
+    variant ("en" -> "en-US") or the base language ("en-US" -> "en")
+    """
+    wanted = lang.lower()
+    base = wanted.split('-')[0]
+    kinds = ('manual', 'auto') if auto else ('manual',)
+    for kind in kinds:
+        urls = tracks.get(kind) or {}
+        by_lower = {code.lower(): code for code in urls}
+        if wanted in by_lower:
+            code = by_lower[wanted]
+            return kind, code, urls[code]
+        for lower, code in sorted(by_lower.items()):
+            if lower.split('-')[0] == base:
+                return kind, code, urls[code]
+    return None
+
+def _parse_timestamp(value: str) -> int:
+    parts = value.split(':')
+    seconds, millis = parts[-1].split('.')
+    hours = int(parts[0]) if len(parts) == 3 else 0
+    return ((hours * 60 + int(parts[-2])) * 60 + int(seconds)) * 1000 + int(millis)
+
+def _format_timestamp(ms: int) -> str:
+    seconds, millis = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{millis:03d}"
+
+def parse_vtt(data: str) -> List[Cue]:
+    """
+    Parse WebVTT into plain-text cues.
+
+    Styling, inline word timings and cue settings are dropped, and the
+    rolling lines of YouTube's automatic captions (each cue repeating the
+    previous one's last line) are reduced to the text they add. Repeats
+    between two single-line cues are kept, as they are real captions.
+    """
+    cues = []
+    previous_lines: List[str] = []
+    for block in re.split(r'\r?\n\r?\n', data.replace('\ufeff', '')):
+        lines = block.strip().splitlines()
+        for index, line in enumerate(lines):
+            match = _TIMING_RE.match(line)
+            if match:
+                break
+        else:
+            # Header, NOTE, STYLE or REGION block
+            continue
+
+        start, end = _parse_timestamp(match.group(1)), _parse_timestamp(match.group(2))
+        text_lines = []
+        for line in lines[index + 1:]:
+            text = ' '.join(html.unescape(_TAG_RE.sub('', line)).split())
+            if text:
+                text_lines.append(text)
+        if not text_lines:
+            continue
+        new_lines = text_lines
+        # Only the line carried over from the previous cue is dropped
+        rolling = len(text_lines) > 1 or len(previous_lines) > 1
+        if rolling and previous_lines and text_lines[0] == previous_lines[-1]:
+            new_lines = text_lines[1:]
+        previous_lines = text_lines
+        if new_lines:
+            cues.append((start, end, ' '.join(new_lines)))
+    return cues
+
+def to_vtt(cues: List[Cue]) -> str:
+    """
+    Render cues as compact WebVTT
+    """
+    blocks = ['WEBVTT']
+    for start, end, text in cues:
+        blocks.append(f"{_format_timestamp(start)} --> {_format_timestamp(end)}\n{text}")
+    return '\n\n'.join(blocks) + '\n'
+
+def to_text(cues: List[Cue]) -> str:
+    """
+    Render cues as a plain transcript, one cue per line
+    """
+    return ''.join(f"{text}\n" for _, _, text in cues)
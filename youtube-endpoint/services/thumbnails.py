@@ -0,0 +1,269 @@
+import os
+import time
+import asyncio
+import logging
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import yt_dlp
+
+from services.artifacts import Artifact
+from services import timing
+
+logger = logging.getLogger(__name__)
+
+# Extensions for the content types thumbnails are served in
+_IMAGE_EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/webp': 'webp',
+    'image/png': 'png',
+}
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class ThumbnailCache:
+    """
+    Bounded on-disk cache of thumbnails keyed by video ID: the original
+    image plus resized JPEG variants, each fetched or generated once.
+
+    Layout is `<path>/<video id>/original.<ext>` and `w<width>.jpg`. The
+    in-memory index answers hits without touching the filesystem; when the
+    cache grows past `max_bytes` the least recently used videos are removed.
+
+    Files are written to a temp file and renamed into place, so one is
+    never seen half written. A refetched original replaces the old one and
+    then removes the video's stale variants (open files stay readable), so
+    everything on disk is indexed and counted. Renaming into place and
+    evicting hold `_write_lock`, so an eviction never removes a file
+    another thread has just indexed.
+    """
+
+    def __init__(self, path: str, max_bytes: int, widths: Iterable[int], refresh_seconds: float):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.widths = sorted(widths)
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._files: Dict[Tuple[str, Optional[int]], Artifact] = {}
+        # Bytes on disk per video, least recently used first
+        self._usage: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        self._inflight: Dict[Tuple[str, Optional[int]], asyncio.Future] = {}
+        os.makedirs(path, exist_ok=True)
+        self._scan()
+
+    def variant_width(self, width: Optional[int]) -> Optional[int]:
+        """
+        Snap a requested width up to the nearest variant; None (or anything
+        wider than every variant) means the original
+        """
+        if not width:
+            return None
+        for variant in self.widths:
+            if variant >= width:
+                return variant
+        return None
+
+    def _scan(self) -> None:
+        """
+        Index thumbnails cached before a restart, oldest first
+        """
+        videos = []
+        for video_id in os.listdir(self.path):
+            video_dir = os.path.join(self.path, video_id)
+            if os.path.isdir(video_dir):
+                videos.append((os.path.getmtime(video_dir), video_id))
+        for _, video_id in sorted(videos):
+            video_dir = os.path.join(self.path, video_id)
+            originals, variants = [], []
+            for name in os.listdir(video_dir):
+                if name.startswith('.'):
+                    continue
+                path = os.path.join(video_dir, name)
+                stem = os.path.splitext(name)[0]
+                if stem == 'original':
+                    originals.append((os.path.getmtime(path), path))
+                elif stem[1:].isdigit():
+                    variants.append((os.path.getmtime(path), int(stem[1:]), path))
+            if not originals:
+                continue
+            originals.sort()
+            original_mtime, original = originals.pop()
+            self._add(video_id, None, original)
+            # Older originals, and variants made from them, are left over from a refetch
+            for _, path in originals:
+                _remove_quietly(path)
+            for mtime, width, path in variants:
+                if mtime >= original_mtime:
+                    self._add(video_id, width, path)
+                else:
+                    _remove_quietly(path)
+
+    def _add(self, video_id: str, width: Optional[int], path: str) -> Artifact:
+        """
+        Index a cached file and evict least recently used videos beyond the size bound
+        """
+        st = os.stat(path)
+        artifact = Artifact.from_stat(
+            f"{video_id}/{os.path.basename(path)}", path, st.st_size, st.st_mtime,
+            expiry_time=int(st.st_mtime + self.refresh_seconds),
+        )
+        victims: List[Artifact] = []
+        with self._lock:
+            previous = self._files.get((video_id, width))
+            self._files[(video_id, width)] = artifact
+            self._usage[video_id] = self._usage.get(video_id, 0) + st.st_size - (previous.size if previous else 0)
+            self._usage.move_to_end(video_id)
+            self._total += st.st_size - (previous.size if previous else 0)
+            while self._total > self.max_bytes and len(self._usage) > 1:
+                victim, size = self._usage.popitem(last=False)
+                self._total -= size
+                for key in [key for key in self._files if key[0] == victim]:
+                    victims.append(self._files.pop(key))
+        # Only the evicted files: a writer may have a temp file in the directory
+        for victim in victims:
+            _remove_quietly(victim.path)
+        for video_dir in {os.path.dirname(victim.path) for victim in victims}:
+            try:
+                os.rmdir(video_dir)
+            except OSError:
+                pass
+        if victims:
+            logger.info(f"Evicted {len(victims)} thumbnail(s) from the cache")
+        return artifact
+
+    def _place(self, video_id: str, width: Optional[int], tmp_path: str, path: str) -> Artifact:
+        """
+        Rename a finished temp file into place and index it, evicting beyond
+        the size bound. A new original supersedes every other file of the
+        video: a refreshed video was dropped from the index, and its
+        variants are only regenerated from the new original.
+        """
+        with self._write_lock:
+            os.replace(tmp_path, path)
+            if width is None:
+                video_dir = os.path.dirname(path)
+                for name in os.listdir(video_dir):
+                    if not name.startswith('.') and name != os.path.basename(path):
+                        _remove_quietly(os.path.join(video_dir, name))
+            return self._add(video_id, width, path)
+
+    def _temp_path(self, video_dir: str, name: str) -> str:
+        """
+        A new dot-prefixed temp file for `name`, which the scan skips (made
+        under the write lock, so eviction cannot remove the directory first)
+        """
+        stem, ext = os.path.splitext(name)
+        with self._write_lock:
+            os.makedirs(video_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=video_dir, prefix=f".{stem}.", suffix=ext)
+        os.close(fd)
+        return tmp_path
+
+    def _lookup(self, video_id: str, width: Optional[int]) -> Optional[Artifact]:
+        with self._lock:
+            artifact = self._files.get((video_id, width))
+            if artifact is None:
+                return None
+            if artifact.expired:
+                # Thumbnails can change; refetch the original, which removes
+                # the old files, and regenerate variants from it
+                self._total -= self._usage.pop(video_id, 0)
+                for key in [key for key in self._files if key[0] == video_id]:
+                    del self._files[key]
+                return None
+            self._usage.move_to_end(video_id)
+            return artifact
+
+    async def get(self, video_id: str, width: Optional[int], sources: List[str], ydl_options: Dict) -> Artifact:
+        """
+        Cached thumbnail of a video at a variant width (None for the
+        original), fetching or resizing it once on a miss
+        """
+        key = (video_id, width)
+        artifact = self._lookup(video_id, width)
+        if artifact is not None:
+            return artifact
+
+        # Concurrent misses for the same image share one fetch/resize
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._produce(video_id, width, sources, ydl_options))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(future)
+
+    async def _produce(self, video_id: str, width: Optional[int], sources: List[str], ydl_options: Dict) -> Artifact:
+        if width is None:
+            return await timing.run_in_executor(self._fetch, video_id, sources, ydl_options, stage_name='fetch')
+        original = await self.get(video_id, None, sources, ydl_options)
+        return await timing.run_in_executor(self._resize, video_id, original.path, width, stage_name='resize')
+
+    def _fetch(self, video_id: str, sources: List[str], ydl_options: Dict) -> Artifact:
+        """
+        Download the first available source image (runs in a worker thread)
+        """
+        with yt_dlp.YoutubeDL(ydl_options) as ydl:
+            for url in sources:
+                try:
+                    response = ydl.urlopen(url)
+                    data = response.read()
+                except Exception as e:
+                    logger.info(f"Thumbnail source unavailable for {video_id}: {url} ({str(e)})")
+                    continue
+                content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+                ext = _IMAGE_EXTENSIONS.get(content_type) or url.rsplit('.', 1)[-1].lower()
+                if ext not in _IMAGE_EXTENSIONS.values() or not data:
+                    continue
+                break
+            else:
+                raise ValueError(f"No thumbnail available for video: {video_id}")
+
+        video_dir = os.path.join(self.path, video_id)
+        path = os.path.join(video_dir, f"original.{ext}")
+        tmp_path = self._temp_path(video_dir, os.path.basename(path))
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            artifact = self._place(video_id, None, tmp_path, path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+        logger.info(f"Cached thumbnail for video {video_id} ({len(data)} bytes)")
+        return artifact
+
+    def _resize(self, video_id: str, original_path: str, width: int) -> Artifact:
+        """
+        Scale the original down to `width` as a JPEG with ffmpeg (runs in a worker thread)
+        """
+        video_dir = os.path.dirname(original_path)
+        path = os.path.join(video_dir, f"w{width}.jpg")
+        tmp_path = self._temp_path(video_dir, os.path.basename(path))
+        started = time.perf_counter()
+        try:
+            try:
+                subprocess.run(
+                    [
+                        'ffmpeg', '-v', 'error', '-y', '-i', original_path,
+                        # Never upscale; keep the aspect ratio with an even height
+                        '-vf', f"scale='min({width},iw)':-2",
+                        '-frames:v', '1', '-q:v', '3', tmp_path,
+                    ],
+                    check=True, capture_output=True, timeout=30,
+                )
+            except subprocess.CalledProcessError as e:
+                raise ValueError(f"Failed to resize thumbnail: {e.stderr.decode('utf-8', 'replace').strip()}")
+            artifact = self._place(video_id, width, tmp_path, path)
+        except BaseException:
+            _remove_quietly(tmp_path)
+            raise
+        logger.info(f"Generated {width}px thumbnail for video {video_id} in {time.perf_counter() - started:.2f}s")
+        return artifact
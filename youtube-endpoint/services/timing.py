@@ -0,0 +1,189 @@
+import json
+import time
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Optional
+
+from fastapi.routing import APIRoute
+
+from config import settings
+
+logger = logging.getLogger("timing")
+
+class StageTimer:
+    """
+    Per-request accumulator of stage durations in seconds. Worker threads
+    of the request add to it too, so updates take a lock.
+    """
+    __slots__ = ('started', 'stages', 'marks', '_lock')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.marks: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.stages)
+
+    def mark(self, name: str) -> None:
+        self.marks[name] = time.perf_counter()
+
+    def header(self, total: float) -> str:
+        """
+        Render as a Server-Timing header value (milliseconds)
+        """
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.snapshot().items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ', '.join(entries)
+
+_current: contextvars.ContextVar[Optional[StageTimer]] = contextvars.ContextVar('stage_timer', default=None)
+
+_NULL_STAGE = nullcontext()
+
+@contextmanager
+def _timed_stage(timer: StageTimer, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, time.perf_counter() - start)
+
+@contextmanager
+def job_timer():
+    """
+    Time the stages of one job on a timer of its own, so concurrent jobs of
+    a request (a batch) are not mixed up; they are added to the request's
+    timer when the job ends
+    """
+    outer = _current.get()
+    timer = StageTimer()
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+        if outer is not None:
+            for name, seconds in timer.snapshot().items():
+                outer.add(name, seconds)
+
+def stage(name: str):
+    """
+    Context manager timing a stage of the current request; a shared no-op
+    when timing is disabled or there is no request
+    """
+    timer = _current.get()
+    if timer is None:
+        return _NULL_STAGE
+    return _timed_stage(timer, name)
+
+def record(name: str, seconds: float) -> None:
+    """
+    Add a measured duration to the current request, if any
+    """
+    timer = _current.get()
+    if timer is not None:
+        timer.add(name, seconds)
+
+def run_in_executor(fn: Callable, *args, stage_name: Optional[str] = None) -> asyncio.Future:
+    """
+    Run `fn` in the default executor, recording the time it waited for a
+    worker thread as "queue" and its run time as `stage_name`. The request's
+    timer is visible inside the worker thread, so `fn` can record its own
+    stages.
+    """
+    loop = asyncio.get_event_loop()
+    timer = _current.get()
+    if timer is None:
+        return loop.run_in_executor(None, fn, *args)
+
+    submitted = time.perf_counter()
+
+    def _call():
+        started = time.perf_counter()
+        timer.add('queue', started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            if stage_name:
+                timer.add(stage_name, time.perf_counter() - started)
+
+    return loop.run_in_executor(None, contextvars.copy_context().run, _call)
+
+def _timed_endpoint(endpoint: Callable) -> Callable:
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        timer = _current.get()
+        if timer is not None:
+            # Everything before the handler is body parsing and validation
+            timer.add('validate', time.perf_counter() - timer.started)
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            if timer is not None:
+                timer.mark('handler_done')
+    return wrapper
+
+class TimedRoute(APIRoute):
+    """
+    APIRoute that marks where the endpoint starts and ends, so the time
+    before it counts as validation and the time after it as serialization
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if settings.SERVER_TIMING:
+            endpoint = _timed_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+class ServerTimingMiddleware:
+    """
+    ASGI middleware adding a Server-Timing header with per-stage durations
+    to every response and logging the same breakdown as one JSON line
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer()
+        token = _current.set(timer)
+        status = None
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                now = time.perf_counter()
+                status = message['status']
+                handler_done = timer.marks.get('handler_done')
+                if handler_done is not None:
+                    timer.add('serialize', now - handler_done)
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', timer.header(now - timer.started).encode('latin-1')))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            total = time.perf_counter() - timer.started
+            logger.info(json.dumps({
+                'method': scope['method'],
+                'path': scope['path'],
+                'status': status,
+                'total_ms': round(total * 1000, 1),
+                'stages_ms': {name: round(seconds * 1000, 1) for name, seconds in timer.snapshot().items()},
+            }))
@@ -0,0 +1,110 @@
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, List
+
+from services import timing
+from services import aiofs
+
+logger = logging.getLogger(__name__)
+
+def rendition_path(source_path: str, name: str) -> str:
+    """
+    Where the `name` rendition of a downloaded file lives: next to it, so it
+    shares the download's directory and lifetime
+    """
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    return os.path.join(os.path.dirname(source_path), 'renditions', f"{stem}.{name}.mp4")
+
+def ffmpeg_args(source_path: str, output_path: str, spec: Dict, threads: int, speed: str) -> List[str]:
+    """
+    ffmpeg command for an H.264/AAC MP4 rendition at a capped height and
+    bitrate; sources smaller than the rendition are not upscaled
+    """
+    height = int(spec['height'])
+    video_bitrate = spec['video_bitrate']
+    bufsize = spec.get('bufsize') or f"{2 * int(video_bitrate.rstrip('kK'))}k"
+    return [
+        'ffmpeg', '-v', 'error', '-y', '-i', source_path,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', f"scale=-2:'min({height},ih)'",
+        '-c:v', 'libx264', '-preset', speed, '-profile:v', spec.get('profile', 'main'), '-pix_fmt', 'yuv420p',
+        '-b:v', video_bitrate, '-maxrate', video_bitrate, '-bufsize', bufsize,
+        '-c:a', 'aac', '-b:a', spec.get('audio_bitrate', '128k'),
+        '-movflags', '+faststart',
+        '-threads', str(threads),
+        output_path,
+    ]
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class TranscodePool:
+    """
+    Bounded pool of ffmpeg processes. At most `workers` transcodes run at
+    once, each limited to `threads` threads, so together they use a fixed
+    number of cores; the rest wait in line. Processes are awaited on the
+    event loop rather than from executor threads, and are killed if the
+    wait is cancelled or times out. Concurrent requests for the same output
+    share one process.
+    """
+
+    def __init__(self, workers: int, threads: int, speed: str, timeout: float):
+        self.workers = workers
+        self.threads = threads
+        self.speed = speed
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(workers)
+        self._running = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def snapshot(self) -> Dict:
+        return {'workers': self.workers, 'running': self._running, 'queued': len(self._inflight) - self._running}
+
+    async def transcode(self, source_path: str, output_path: str, spec: Dict) -> None:
+        """
+        Write a rendition of `source_path` to `output_path`, atomically
+        """
+        future = self._inflight.get(output_path)
+        if future is None:
+            future = asyncio.ensure_future(self._run(source_path, output_path, spec))
+            self._inflight[output_path] = future
+            future.add_done_callback(lambda _: self._inflight.pop(output_path, None))
+        await asyncio.shield(future)
+
+    async def _run(self, source_path: str, output_path: str, spec: Dict) -> None:
+        with timing.stage('transcode_queue'):
+            await self._semaphore.acquire()
+        self._running += 1
+        started = time.perf_counter()
+        tmp_path = os.path.join(os.path.dirname(output_path), f".{os.path.basename(output_path)}")
+        try:
+            await aiofs.run(lambda: os.makedirs(os.path.dirname(output_path), exist_ok=True))
+            process = await asyncio.create_subprocess_exec(
+                *ffmpeg_args(source_path, tmp_path, spec, self.threads, self.speed),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+            except (asyncio.CancelledError, asyncio.TimeoutError):
+                process.kill()
+                await process.wait()
+                raise
+            if process.returncode != 0:
+                raise ValueError(f"ffmpeg failed: {stderr.decode('utf-8', 'replace').strip()[-500:]}")
+            await aiofs.run(os.replace, tmp_path, output_path)
+        except BaseException:
+            # Error path only; never leave a partial rendition behind
+            await aiofs.run(_remove_quietly, tmp_path)
+            raise
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+            timing.record('transcode', time.perf_counter() - started)
+        logger.info(f"Transcoded {os.path.basename(output_path)} in {time.perf_counter() - started:.1f}s")
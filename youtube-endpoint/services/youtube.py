@@ -1,18 +1,86 @@
 import os
 import asyncio
 import re
+import json
 import time
+import zlib
 import logging
-from typing import Dict, List, Optional, Any
+import contextvars
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple, Any
 
 import yt_dlp
 
 from config import settings
+from services.journal import download_journal
+from services.cache import TTLCache
+from services.records import VideoInfoRecord
+from services.media_id import parse_media_ref
+from services.thumbnails import ThumbnailCache
+from services.subtitles import subtitle_tracks, pick_track, parse_vtt
+from services.popularity import PopularityTracker, prefetching
+from services.error_rate import ErrorRate
+from services.scheduler import fair_scheduler, current_client, bulk_work, QuotaExceededError, PRIORITY_INFO, PRIORITY_DOWNLOAD, PRIORITY_BULK
+from services.search import SearchPager, SearchUnsupportedError, normalize_query, encode_cursor, decode_cursor
+from services.artifacts import Artifact, artifact_index, read_expiry
+from services.storage import create_storage
+from services.state import state_backend
+from services import timing
+from services import replay
+from services import packaging
+from services.transcode import TranscodePool, rendition_path
+from services import aiofs
+from services.flight_recorder import flight_recorder
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Record or replay extractor HTTP traffic when configured
+replay.install_from_settings()
+
+# Cookie file presence, re-checked off the event loop
+_cookie_file = aiofs.FileProbe(settings.COOKIE_FILE, settings.COOKIE_CHECK_SECONDS)
+
+# Set while a live request is counted, so the calls it makes are not counted again
+_in_live_request: contextvars.ContextVar[bool] = contextvars.ContextVar('in_live_request', default=False)
+
+# Longest a progress hook sleeps at once, so shutdown and pauses are noticed
+_MAX_PACING_SLEEP_SECONDS = 1.0
+
+class _Pacer:
+    """
+    Holds one download to a byte rate from its progress hook.
+
+    yt-dlp's own `ratelimit` is copied into fragment downloaders (HLS,
+    DASH) when they are created, so changing it at runtime never reaches
+    them. Every downloader reports progress through the hooks, so pacing
+    there applies to all of them and follows rate changes at once.
+    """
+    __slots__ = ('_time', '_bytes')
+
+    def __init__(self):
+        self._time: Optional[float] = None
+        self._bytes = 0
+
+    def pace(self, progress: Dict, rate: Optional[float]) -> None:
+        downloaded = progress.get('downloaded_bytes')
+        now = time.monotonic()
+        if (not rate or progress.get('status') != 'downloading' or downloaded is None
+                or self._time is None or downloaded < self._bytes):
+            # Unlimited, or a new file started: measure from here
+            self._time, self._bytes = now, downloaded or 0
+            return
+        ahead = (downloaded - self._bytes) / rate - (now - self._time)
+        if ahead <= 0:
+            # On or behind schedule; do not bank the slack
+            self._time, self._bytes = now, downloaded
+            return
+        time.sleep(min(ahead, _MAX_PACING_SLEEP_SECONDS))
+
+class ServiceUnavailableError(Exception):
+    """Raised when the service cannot take new work, e.g. while shutting down"""
+
 class YouTubeService:
     """
     Service for handling YouTube video operations:
@@ -21,6 +89,56 @@ class YouTubeService:
     - Processing audio/video streams
     """
     
+    # Compact video info records keyed by video ID
+    _info_cache = TTLCache(settings.INFO_CACHE_SIZE, settings.INFO_CACHE_TTL_SECONDS)
+    
+    # Normalized subtitle cues keyed by video ID, language and whether automatic captions are allowed
+    _subtitle_cache = TTLCache(settings.SUBTITLE_CACHE_SIZE, settings.SUBTITLE_CACHE_TTL_SECONDS)
+    
+    # Search result pages keyed by normalized query and page number
+    _search_pager = SearchPager(settings.SEARCH_PAGE_SIZE, settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL_SECONDS)
+    
+    # Original and resized thumbnails on disk
+    _thumbnails = ThumbnailCache(
+        settings.THUMBNAIL_PATH,
+        settings.THUMBNAIL_CACHE_MAX_BYTES,
+        settings.THUMBNAIL_WIDTHS,
+        settings.THUMBNAIL_REFRESH_SECONDS,
+    )
+    
+    # ffmpeg processes producing fixed renditions of downloads
+    _transcoder = TranscodePool(
+        settings.TRANSCODE_WORKERS,
+        settings.TRANSCODE_THREADS,
+        settings.TRANSCODE_SPEED,
+        settings.TRANSCODE_TIMEOUT_SECONDS,
+    )
+    
+    # Hot/cold artifact storage; downloads land in the hot tier (DOWNLOAD_PATH)
+    storage = create_storage()
+    
+    # Request frequency per video ID, for the prefetch scheduler
+    popularity = PopularityTracker(settings.PREFETCH_HALF_LIFE_SECONDS, settings.PREFETCH_MAX_TRACKED)
+    
+    # Outcomes of info extractions and downloads, for the readiness check
+    upstream_errors = ErrorRate(settings.READY_ERROR_WINDOW_SECONDS)
+    
+    # Live (non-prefetch) requests in flight and when the last one started or ended
+    _live_requests = 0
+    _last_live_request = 0.0
+    
+    # Lookups/computations in flight in this process, by lock name
+    _computing: Dict[str, asyncio.Future] = {}
+    
+    # Download job state
+    _active_jobs: Dict[str, asyncio.Future] = {}
+    # Resumptions of journaled jobs waiting for the shared download lock
+    _resuming: Set[asyncio.Future] = set()
+    _prefetch_jobs: Set[str] = set()  # Jobs started by prefetch; paused while live requests run
+    _accepting = True
+    _aborting = False
+    _drain_started: Optional[float] = None
+    
     @staticmethod
     def _get_yt_dlp_options(options: Optional[Dict] = None) -> Dict[str, Any]:
         """
@@ -30,7 +148,10 @@ class YouTubeService:
         default_options = {
             'quiet': True,
             'no_warnings': True,
-            'cookiefile': settings.COOKIE_FILE if os.path.exists(settings.COOKIE_FILE) and os.path.getsize(settings.COOKIE_FILE) > 0 else None,
+            # Keep the local write time as mtime; the upstream upload date
+            # would make fresh artifacts look long expired after a restart
+            'updatetime': False,
+            'cookiefile': _cookie_file.get(),
         }
         
         # Remove None values
@@ -48,16 +169,74 @@ class YouTubeService:
         """
         Get detailed information about a YouTube video
         """
+        record = await cls.get_info_record(url)
+        return record.to_dict(parse_media_ref(url).url)
+    
+    @classmethod
+    async def get_info_record(cls, url: str) -> VideoInfoRecord:
+        """
+        Get the compact info record of a YouTube video, from the cache when possible
+        """
         try:
-            # If just a video ID was passed, convert to full URL
-            if re.match(r'^[0-9A-Za-z_-]{11}$', url):
-                url = f"https://www.youtube.com/watch?v={url}"
-                
-            video_id = cls._extract_video_id(url)
-            logger.info(f"Fetching info for video: {video_id}")
+            # Canonicalize URLs and bare IDs to a single-video watch URL
+            with timing.stage('parse'):
+                ref = parse_media_ref(url)
+            video_id = ref.video_id
+            url = ref.url
         except ValueError as e:
             logger.error(f"Invalid YouTube URL: {url}")
             raise ValueError(f"Invalid YouTube URL: {url}")
+        
+        with cls._live_request(video_id):
+            return await cls._info_record(video_id, url)
+    
+    @classmethod
+    async def _info_record(cls, video_id: str, url: str) -> VideoInfoRecord:
+        """
+        Cached info record of a video, extracting it on a miss
+        """
+        cached = cls._info_cache.get(video_id)
+        if cached is not None:
+            return cached
+        
+        # Extract once across workers/nodes; others pick the result up from the shared cache
+        with flight_recorder.record('info', video_id, cookies=_cookie_file.get() is not None):
+            record = await cls._compute_once(
+                f"info:{video_id}",
+                lambda: cls._lookup_info(video_id),
+                lambda: cls._extract_info(url, video_id),
+                settings.INFO_LOCK_TTL_SECONDS,
+            )
+        cls._info_cache.set(video_id, record, cls._info_ttl())
+        return record
+    
+    @classmethod
+    def _info_ttl(cls) -> float:
+        """
+        Prefetched info is kept until the peak it was fetched for
+        """
+        return settings.PREFETCH_INFO_TTL_SECONDS if prefetching.get() else settings.INFO_CACHE_TTL_SECONDS
+    
+    @classmethod
+    async def _lookup_info(cls, video_id: str) -> Optional[VideoInfoRecord]:
+        """
+        Find video info in the local or shared cache
+        """
+        record = cls._info_cache.get(video_id)
+        if record is None and state_backend.shared:
+            data = await cls._state(state_backend.get_cache, f"info:{video_id}")
+            if data is not None:
+                record = VideoInfoRecord.from_bytes(data)
+                flight_recorder.note(source='shared')
+        return record
+    
+    @classmethod
+    async def _extract_info(cls, url: str, video_id: str) -> VideoInfoRecord:
+        """
+        Extract video info with yt-dlp and publish it to the shared cache
+        """
+        logger.info(f"Fetching info for video: {video_id}")
+        flight_recorder.note(source='extract')
             
         # Set up yt-dlp options for info extraction
         info_options = cls._get_yt_dlp_options({
@@ -68,15 +247,17 @@ class YouTubeService:
         
         try:
             # Extract video information
-            loop = asyncio.get_event_loop()
             with yt_dlp.YoutubeDL(info_options) as ydl:
-                info = await loop.run_in_executor(None, ydl.extract_info, url, False)
+                async with fair_scheduler.slot(cls._priority(PRIORITY_INFO)):
+                    info = await timing.run_in_executor(ydl.extract_info, url, False, stage_name='extract')
                 
             if not info:
                 logger.warning(f"Could not fetch info for video: {url}")
                 raise ValueError(f"Could not fetch info for video: {url}")
                 
             # Format response
+            with timing.stage('parse_formats'):
+                formats = cls._parse_formats(info.get('formats', []))
             video_info = {
                 'id': info.get('id'),
                 'title': info.get('title', 'Unknown Title'),
@@ -89,16 +270,267 @@ class YouTubeService:
                 'like_count': info.get('like_count', 0),
                 'uploader': info.get('uploader', 'Unknown'),
                 'upload_date': info.get('upload_date', ''),
-                'formats': cls._parse_formats(info.get('formats', [])),
+                'formats': formats,
             }
             
+            # Cache a compact record; the raw info dict is dropped here
+            record = VideoInfoRecord.from_dict(video_info)
+            record.subtitles = subtitle_tracks(info)
+            if state_backend.shared:
+                await cls._state(state_backend.set_cache, f"info:{video_id}", record.to_bytes(), cls._info_ttl())
+            
             logger.info(f"Successfully fetched info for video: {video_id}")
-            return video_info
+            cls.upstream_errors.record(True)
+            return record
             
+        except QuotaExceededError:
+            raise
         except Exception as e:
+            cls.upstream_errors.record(False)
             logger.error(f"Error fetching video info: {str(e)}")
             raise ValueError(f"Failed to get video information: {str(e)}")
                 
+    @classmethod
+    async def get_subtitles(cls, url: str, lang: str = 'en', auto: bool = True) -> Dict:
+        """
+        Get normalized subtitle cues of a video in a language, falling back
+        to automatic captions when `auto` is set
+        """
+        try:
+            ref = parse_media_ref(url)
+        except ValueError:
+            raise ValueError(f"Invalid YouTube URL: {url}")
+        video_id = ref.video_id
+        
+        cache_key = f"{video_id}:{lang.lower()}:{'auto' if auto else 'manual'}"
+        subtitles = cls._subtitle_cache.get(cache_key)
+        if subtitles is None:
+            with cls._live_request():
+                subtitles = await cls._compute_once(
+                    f"subtitles:{cache_key}",
+                    lambda: cls._lookup_subtitles(cache_key),
+                    lambda: cls._fetch_subtitles(cache_key, ref.url, video_id, lang, auto),
+                    settings.INFO_LOCK_TTL_SECONDS,
+                )
+            cls._subtitle_cache.set(cache_key, subtitles)
+        return subtitles
+    
+    @classmethod
+    async def _lookup_subtitles(cls, cache_key: str) -> Optional[Dict]:
+        """
+        Find subtitles in the local or shared cache
+        """
+        subtitles = cls._subtitle_cache.get(cache_key)
+        if subtitles is None and state_backend.shared:
+            data = await cls._state(state_backend.get_cache, f"subtitles:{cache_key}")
+            if data is not None:
+                subtitles = json.loads(zlib.decompress(data))
+        return subtitles
+    
+    @classmethod
+    async def _fetch_subtitles(cls, cache_key: str, url: str, video_id: str, lang: str, auto: bool) -> Dict:
+        """
+        Pick a track from the cached info and download only its subtitle file
+        """
+        record = await cls._info_record(video_id, url)
+        tracks = record.subtitles
+        track = pick_track(tracks, lang, auto)
+        if track is None:
+            available = sorted(set(tracks['manual']) | (set(tracks['auto']) if auto else set()))
+            raise ValueError(f"No subtitles in '{lang}' for video {video_id}; available: {', '.join(available) or 'none'}")
+        kind, language, track_url = track
+        
+        logger.info(f"Fetching {kind} subtitles ({language}) for video: {video_id}")
+        try:
+            data = await timing.run_in_executor(cls._fetch_url, track_url, stage_name='fetch')
+        except Exception as e:
+            logger.error(f"Error fetching subtitles: {str(e)}")
+            raise ValueError(f"Failed to get subtitles: {str(e)}")
+        with timing.stage('parse_subtitles'):
+            cues = parse_vtt(data.decode('utf-8', 'replace'))
+        
+        subtitles = {'id': video_id, 'language': language, 'kind': kind, 'cues': cues}
+        if state_backend.shared:
+            data = zlib.compress(json.dumps(subtitles, separators=(',', ':')).encode('utf-8'))
+            await cls._state(state_backend.set_cache, f"subtitles:{cache_key}", data, settings.SUBTITLE_CACHE_TTL_SECONDS)
+        return subtitles
+    
+    @classmethod
+    def _fetch_url(cls, url: str) -> bytes:
+        """
+        Fetch a URL through yt-dlp's opener, with the same cookies and proxy (runs in a worker thread)
+        """
+        with yt_dlp.YoutubeDL(cls._get_yt_dlp_options()) as ydl:
+            return ydl.urlopen(url).read()
+    
+    @classmethod
+    async def subtitles_batch(cls, urls: List[str], lang: str = 'en', auto: bool = True) -> AsyncIterator[Tuple[str, Optional[Dict], Optional[str]]]:
+        """
+        Get subtitles of several videos, yielding (url, subtitles, error) as each one completes
+        """
+        semaphore = asyncio.Semaphore(settings.SUBTITLE_BATCH_CONCURRENCY)
+        
+        async def _get_one(url: str) -> Tuple[str, Optional[Dict], Optional[str]]:
+            async with semaphore:
+                try:
+                    return url, await cls.get_subtitles(url, lang=lang, auto=auto), None
+                except Exception as e:
+                    return url, None, str(e)
+        
+        tasks = [asyncio.ensure_future(_get_one(url)) for url in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    @classmethod
+    async def search(cls, query: Optional[str] = None, cursor: Optional[str] = None) -> Dict:
+        """
+        Search YouTube, one page at a time; pass the returned `next_cursor`
+        to get the following page
+        """
+        if cursor:
+            query, page, continuation, offset = decode_cursor(cursor)
+        elif query and query.strip():
+            query, page, continuation, offset = normalize_query(query), 0, None, 0
+        else:
+            raise ValueError("A search query or cursor is required")
+        
+        if page >= settings.SEARCH_MAX_PAGES:
+            raise ValueError(f"Search results are limited to {settings.SEARCH_MAX_PAGES} pages")
+        
+        # Flat mode: entries come straight from the result pages, never from watch pages
+        search_options = cls._get_yt_dlp_options({
+            'extract_flat': True,
+            'skip_download': True,
+        })
+        
+        try:
+            with cls._live_request():
+                results, next_position = await cls._search_pager.page(query, page, continuation, offset, search_options)
+        except SearchUnsupportedError as e:
+            raise ServiceUnavailableError(str(e))
+        except Exception as e:
+            logger.error(f"Error searching for {query!r}: {str(e)}")
+            raise ValueError(f"Failed to search: {str(e)}")
+        
+        return {
+            'query': query,
+            'page': page,
+            'results': results,
+            'next_cursor': encode_cursor(query, page + 1, *next_position) if next_position and page + 1 < settings.SEARCH_MAX_PAGES else None,
+        }
+    
+    @classmethod
+    async def get_thumbnail(cls, url: str, width: Optional[int] = None) -> Artifact:
+        """
+        Get a cached thumbnail, resized to the nearest variant at or above `width`
+        """
+        try:
+            video_id = parse_media_ref(url).video_id
+        except ValueError:
+            raise ValueError(f"Invalid YouTube URL: {url}")
+        
+        # The URL from already cached info first, then the stable i.ytimg.com
+        # locations, so a thumbnail never costs an info extraction
+        sources = []
+        record = cls._info_cache.get(video_id)
+        if record is not None and record.thumbnail:
+            sources.append(record.thumbnail)
+        sources.append(f"https://i.ytimg.com/vi/{video_id}/maxresdefault.jpg")
+        sources.append(f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg")
+        
+        try:
+            return await cls._thumbnails.get(video_id, cls._thumbnails.variant_width(width), sources, cls._get_yt_dlp_options())
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching thumbnail for video {video_id}: {str(e)}")
+            raise ValueError(f"Failed to get thumbnail: {str(e)}")
+    
+    @classmethod
+    async def transcode(cls, url: str, renditions: List[str], format_id: Optional[str] = None) -> Dict:
+        """
+        Download a video (or reuse its download) and produce preset
+        renditions of it, each cached and published as its own artifact
+        """
+        unknown = [name for name in renditions if name not in settings.RENDITION_PRESETS]
+        if unknown:
+            raise ValueError(f"Unknown rendition(s): {', '.join(unknown)}; available: {', '.join(settings.RENDITION_PRESETS)}")
+        
+        download = await cls.download(url, format_id=format_id)
+        source_path = download['file_path']
+        relative_path = download['relative_path']
+        # ffmpeg reads local files; bring a demoted download back first
+        if cls.storage.is_cold(relative_path):
+            await aiofs.run(cls.storage.promote, relative_path)
+        cls.storage.touch(relative_path)
+        
+        async def _one(name: str) -> Dict:
+            try:
+                artifact = await cls._rendition(download['id'], source_path, name, download['expiry_time'])
+                return {'name': name, 'relative_path': artifact.relative_path, 'file_size': artifact.size, 'error': None}
+            except Exception as e:
+                logger.error(f"Error transcoding video {download['id']} to {name}: {str(e)}")
+                return {'name': name, 'relative_path': None, 'file_size': None, 'error': str(e)}
+        
+        results = await asyncio.gather(*[_one(name) for name in dict.fromkeys(renditions)])
+        return {
+            'id': download['id'],
+            'title': download['title'],
+            'source_relative_path': relative_path,
+            'expiry_time': download['expiry_time'],
+            'renditions': results,
+        }
+    
+    @classmethod
+    async def _rendition(cls, video_id: str, source_path: str, name: str, expiry_time: int) -> Artifact:
+        """
+        Published rendition of a download, transcoding it once across workers
+        """
+        output_path = rendition_path(source_path, name)
+        
+        relative_path = os.path.relpath(output_path, settings.DOWNLOAD_PATH).replace(os.sep, '/')
+        
+        async def _lookup() -> Optional[Artifact]:
+            artifact = artifact_index.get(relative_path)
+            if artifact is not None:
+                flight_recorder.note(source='artifact')
+                return artifact
+            # Produced by another worker or before a restart, possibly demoted since
+            artifact = await aiofs.run(cls.load_artifact, relative_path, expiry_time)
+            if artifact is not None:
+                flight_recorder.note(source='disk')
+            return artifact
+        
+        async def _compute() -> Artifact:
+            flight_recorder.note(source='transcode')
+            await cls._transcoder.transcode(source_path, output_path, settings.RENDITION_PRESETS[name])
+            return await aiofs.run(artifact_index.publish, output_path, expiry_time)
+        
+        with flight_recorder.record('transcode', video_id, name) as flight:
+            artifact = await cls._compute_once(f"transcode:{output_path}", _lookup, _compute, settings.TRANSCODE_TIMEOUT_SECONDS)
+            flight.bytes = artifact.size
+            return artifact
+    
+    @classmethod
+    def load_artifact(cls, relative_path: str, expiry_time: Optional[int] = None) -> Optional[Artifact]:
+        """
+        Index a stored file from whichever tier holds it, with its recorded
+        expiry unless one is given (storage I/O; call off the event loop)
+        """
+        tier = cls.storage.locate(relative_path)
+        if tier is None:
+            return None
+        size, mtime = tier.stat(relative_path)
+        path = cls.storage.hot.local_path(relative_path)
+        if expiry_time is None:
+            # The expiry recorded at publish time stays in the hot directory when files are demoted
+            expiry_time = read_expiry(relative_path)
+        return artifact_index.add(Artifact.from_stat(relative_path, path, size, mtime, expiry_time))
+    
     @classmethod
     def _parse_formats(cls, formats: List[Dict]) -> List[Dict]:
         """
@@ -174,107 +606,560 @@ class YouTubeService:
         """
         Download a YouTube video
         """
-        try:
-            # If just a video ID was passed, convert to full URL
-            if re.match(r'^[0-9A-Za-z_-]{11}$', url):
-                url = f"https://www.youtube.com/watch?v={url}"
+        if not cls._accepting:
+            raise ServiceUnavailableError("Service is shutting down and not accepting new downloads")
             
-            video_id = cls._extract_video_id(url)
+        try:
+            # Canonicalize URLs and bare IDs to a single-video watch URL
+            with timing.stage('parse'):
+                ref = parse_media_ref(url)
+            video_id = ref.video_id
+            url = ref.url
             logger.info(f"Starting download for video: {video_id}")
             
-            # Create a unique directory for this download
-            download_id = f"{video_id}_{int(time.time())}"
-            output_path = os.path.join(settings.DOWNLOAD_PATH, download_id)
-            os.makedirs(output_path, exist_ok=True)
-                
-            # Get video info to determine best format if not specified
-            video_info = await cls.get_video_info(url)
-            
-            # Use video title as filename, removing invalid characters
-            filename = re.sub(r'[^\w\s-]', '', video_info['title'])
-            filename = re.sub(r'[-\s]+', '-', filename).strip('-_')
-            
-            # Setup download options
-            download_options = cls._get_yt_dlp_options({
-                'outtmpl': os.path.join(output_path, f"{filename}.%(ext)s"),
-            })
-            
-            # If audio only, get best audio
+            # Pick the yt-dlp format selector
             if audio_only:
-                download_options['format'] = 'bestaudio/best'
-                download_options['postprocessors'] = [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '192',
-                }]
-            # If format ID specified, use it
+                download_format = 'bestaudio/best'
             elif format_id:
-                download_options['format'] = format_id
+                download_format = format_id
             else:
                 # Otherwise use best format with height <= max resolution
                 max_height = int(settings.MAX_RESOLUTION.rstrip('p'))
-                download_options['format'] = f'bestvideo[height<={max_height}]+bestaudio/best[height<={max_height}]'
-            
-            # Download the video
-            loop = asyncio.get_event_loop()
-            
-            download_start_time = time.time()
-            
-            with yt_dlp.YoutubeDL(download_options) as ydl:
-                download_info = await loop.run_in_executor(None, ydl.extract_info, url, False)
-            
-            download_time = time.time() - download_start_time
+                download_format = f'bestvideo[height<={max_height}]+bestaudio/best[height<={max_height}]'
             
-            # Find the downloaded file
-            downloaded_file = None
-            expected_extensions = ['mp3'] if audio_only else ['mp4', 'webm', 'mkv']
+            job_key = f"{video_id}:{'audio' if audio_only else download_format}"
+            if not prefetching.get():
+                # A live request for a video being prefetched takes over its job at full speed
+                cls._prefetch_jobs.discard(job_key)
             
-            for ext in expected_extensions:
-                potential_file = os.path.join(output_path, f"{filename}.{ext}")
-                if os.path.exists(potential_file):
-                    downloaded_file = potential_file
-                    break
+            # Download once across workers/nodes; others reuse the published artifact
+            with cls._live_request(video_id):
+                with flight_recorder.record('download', video_id, download_format, cookies=_cookie_file.get() is not None) as flight:
+                    result = await cls._compute_once(
+                        f"download:{job_key}",
+                        lambda: cls._lookup_artifact(job_key),
+                        lambda: cls._download_job(job_key, url, video_id, download_format, format_id, audio_only),
+                        settings.DOWNLOAD_LOCK_TTL_SECONDS,
+                    )
+                    flight.bytes = result.get('file_size')
+                    return result
             
-            if not downloaded_file:
-                logger.error(f"Could not find downloaded file for video: {video_id}")
-                raise ValueError(f"Download failed: Could not find downloaded file")
-            
-            file_size = os.path.getsize(downloaded_file)
-            relative_path = os.path.relpath(downloaded_file, settings.DOWNLOAD_PATH)
+        except yt_dlp.utils.DownloadCancelled as e:
+            if not cls._aborting:
+                # A paused prefetch gave up; the next attempt resumes it
+                raise ValueError(str(e))
+            raise ServiceUnavailableError("Download interrupted by shutdown, retry after restart")
+        except QuotaExceededError:
+            raise
+        except Exception as e:
+            logger.error(f"Error downloading video: {str(e)}")
+            raise ValueError(f"Failed to download video: {str(e)}")
+    
+    @classmethod
+    async def _lookup_artifact(cls, job_key: str) -> Optional[Dict]:
+        """
+        Find a published, unexpired artifact for a download job that this
+        node holds; files published by another node are not on this disk
+        """
+        location = await cls._state(state_backend.get_artifact, job_key)
+        if location is None or location['expiry_time'] <= time.time() or location.get('node') != settings.NODE_ID:
+            return None
+        if await aiofs.run(cls.storage.locate, location['relative_path']) is None:
+            return None
+        flight_recorder.note(source='artifact')
+        return location
+    
+    @classmethod
+    async def _download_job(cls, job_key: str, url: str, video_id: str, download_format: str,
+                            format_id: Optional[str], audio_only: bool) -> Dict:
+        """
+        Run a download job in this process, joining or resuming it if possible
+        """
+        # Join an identical download that is already running
+        active = cls._active_jobs.get(job_key)
+        if active is not None:
+            logger.info(f"Joining in-flight download for video: {video_id}")
+            flight_recorder.note(source='joined')
+            return await asyncio.shield(active)
+        
+        # Refuse a client over its byte quota before anything is journaled
+        fair_scheduler.check_bytes(current_client.get())
+        
+        # Reuse the directory of an unfinished job so yt-dlp continues its .part files
+        job = await aiofs.run(download_journal.get, job_key)
+        if job is None:
+            # Get video info to determine the filename
+            video_info = await cls.get_video_info(url)
             
-            logger.info(f"Successfully downloaded video {video_id} to {downloaded_file} ({file_size} bytes in {download_time:.1f}s)")
+            # Use video title as filename, removing invalid characters
+            filename = re.sub(r'[^\w\s-]', '', video_info['title'])
+            filename = re.sub(r'[-\s]+', '-', filename).strip('-_')
             
-            return {
+            # Create a unique directory for this download
+            download_id = f"{video_id}_{int(time.time())}"
+            job = {
+                'key': job_key,
                 'id': video_id,
+                'url': url,
                 'title': video_info['title'],
-                'file_path': downloaded_file,
-                'relative_path': relative_path,
-                'file_size': file_size,
-                'download_time': download_time,
-                'format': format_id or download_options['format'],
-                'expiry_time': int(time.time()) + settings.FILE_EXPIRY_SECONDS,
-                'audio_only': audio_only
+                'filename': filename,
+                'output_path': os.path.join(settings.DOWNLOAD_PATH, download_id),
+                'format': download_format,
+                'format_id': format_id,
+                'audio_only': audio_only,
+                # Prefetched files are kept until the peak they were fetched for
+                'expiry_seconds': settings.PREFETCH_FILE_EXPIRY_SECONDS if prefetching.get() else settings.FILE_EXPIRY_SECONDS,
             }
+            new = True
+            flight_recorder.note(source='download')
+        else:
+            new = False
+            logger.info(f"Resuming unfinished download for video: {video_id}")
+            flight_recorder.note(source='resumed')
+        
+        if prefetching.get():
+            cls._prefetch_jobs.add(job_key)
+        
+        return await asyncio.shield(cls._start_job(job, cls._priority(PRIORITY_DOWNLOAD), journal=new))
+    
+    @classmethod
+    def _priority(cls, priority: str) -> str:
+        """
+        Priority class of the current work; batches and prefetch are bulk
+        """
+        return PRIORITY_BULK if bulk_work.get() or prefetching.get() else priority
+    
+    @classmethod
+    async def _state(cls, fn, *args):
+        """
+        Call the state backend, off the event loop when it does I/O
+        """
+        if not state_backend.shared:
+            return fn(*args)
+        return await asyncio.get_event_loop().run_in_executor(None, fn, *args)
+    
+    @classmethod
+    async def _compute_once(cls, lock_name: str, lookup, compute, ttl_seconds: float):
+        """
+        Return `lookup()` if it has a result, otherwise run `compute()` under a
+        shared lock so only one worker does the work while the others wait
+        for its result to appear. Callers in this process share one attempt,
+        so a failure reaches all of them instead of each one retrying it.
+        """
+        future = cls._computing.get(lock_name)
+        if future is None:
+            future = asyncio.ensure_future(cls._compute_shared(lock_name, lookup, compute, ttl_seconds))
+            cls._computing[lock_name] = future
+            future.add_done_callback(lambda _: cls._computing.pop(lock_name, None))
+        else:
+            flight_recorder.note(source='joined')
+        return await asyncio.shield(future)
+    
+    @classmethod
+    async def _compute_shared(cls, lock_name: str, lookup, compute, ttl_seconds: float):
+        """
+        Look up or compute a result under the shared lock (see `_compute_once`)
+        """
+        delay = 0.1
+        while True:
+            found = await lookup()
+            if found is not None:
+                return found
             
+            token = await cls._state(state_backend.acquire_lock, lock_name, ttl_seconds)
+            if token is not None:
+                try:
+                    # The previous holder may have finished just before we got the lock
+                    found = await lookup()
+                    if found is not None:
+                        return found
+                    return await compute()
+                finally:
+                    await cls._state(state_backend.release_lock, lock_name, token)
+            
+            # Another worker holds the lock; time spent here is waiting on it
+            flight_recorder.note_retry()
+            with timing.stage('wait'):
+                await asyncio.sleep(delay)
+            delay = min(delay * 2, 2.0)
+    
+    @classmethod
+    async def download_batch(cls, urls: List[str], format_id: str = None, audio_only: bool = False) -> AsyncIterator[Tuple[str, Optional[Dict], Optional[str]]]:
+        """
+        Download several videos, yielding (url, result, error) as each one completes
+        """
+        semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+        
+        async def _download_one(url: str) -> Tuple[str, Optional[Dict], Optional[str]]:
+            bulk_work.set(True)
+            async with semaphore:
+                try:
+                    return url, await cls.download(url, format_id=format_id, audio_only=audio_only), None
+                except Exception as e:
+                    return url, None, str(e)
+        
+        tasks = [asyncio.ensure_future(_download_one(url)) for url in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # Client went away: stop waiting (shielded downloads keep running)
+            for task in tasks:
+                task.cancel()
+    
+    @classmethod
+    def _start_job(cls, job: Dict, priority: str, journal: bool = False) -> asyncio.Future:
+        """
+        Run a download job once admitted and track it until it finishes
+        """
+        future = asyncio.ensure_future(cls._admitted_job(job, priority, journal))
+        cls._active_jobs[job['key']] = future
+        
+        def _finished(fut: asyncio.Future) -> None:
+            cls._active_jobs.pop(job['key'], None)
+            cls._prefetch_jobs.discard(job['key'])
+            if not fut.cancelled() and not isinstance(fut.exception(), QuotaExceededError):
+                cls.upstream_errors.record(fut.exception() is None)
+            # Consume the exception of jobs nobody is awaiting (e.g. resumed ones)
+            if not fut.cancelled() and fut.exception() is not None:
+                logger.error(f"Download job {job['key']} failed: {str(fut.exception())}")
+        
+        future.add_done_callback(_finished)
+        return future
+    
+    @classmethod
+    async def _admitted_job(cls, job: Dict, priority: str, journal: bool) -> Dict:
+        """
+        Wait for a fair share of the executor, then run the job and charge
+        its bytes to the client. The job holds the slot itself, so the slot
+        lasts as long as the download even when the requester goes away; a
+        new job is journaled only once admitted, so one refused for its
+        quota is never resumed on restart.
+        """
+        client = current_client.get()
+        async with fair_scheduler.slot(priority):
+            if journal:
+                with timing.stage('journal'):
+                    await aiofs.run(download_journal.add, job)
+            result = await timing.run_in_executor(cls._run_job, job)
+        fair_scheduler.charge(client, result['file_size'])
+        return result
+    
+    @classmethod
+    def _run_job(cls, job: Dict) -> Dict:
+        """
+        Download a journaled job (runs in a worker thread)
+        """
+        state_backend.put_job(job['key'], {
+            'key': job['key'],
+            'id': job['id'],
+            'format': job['format'],
+            'node': settings.NODE_ID,
+            'started_at': time.time(),
+        })
+        try:
+            result = cls._download_to_disk(job)
+        finally:
+            state_backend.delete_job(job['key'])
+        
+        # Publish the artifact so other workers on this node reuse it instead of downloading again
+        state_backend.set_artifact(job['key'], dict(result, node=settings.NODE_ID), result['expiry_time'] - time.time())
+        return result
+    
+    @classmethod
+    def _download_to_disk(cls, job: Dict) -> Dict:
+        """
+        Run yt-dlp for a journaled job and publish the finished file
+        """
+        output_path = job['output_path']
+        filename = job['filename']
+        audio_only = job['audio_only']
+        os.makedirs(output_path, exist_ok=True)
+        
+        # Stage boundaries, reported to the request that started the job
+        stage_starts = {}
+        pacer = _Pacer()
+        
+        def _check_abort(progress: Dict) -> None:
+            stage_starts.setdefault('transfer', time.perf_counter())
+            # Share the bandwidth budget between running downloads, read on
+            # every chunk so changes apply immediately
+            budget = settings.DOWNLOAD_BANDWIDTH_LIMIT
+            pacer.pace(progress, budget / max(1, len(cls._active_jobs)) if budget else None)
+            # Prefetch downloads hold still while live requests are running,
+            # but not for so long that they tie up a slot and a worker thread
+            paused = time.monotonic()
+            while job['key'] in cls._prefetch_jobs and cls._live_requests and not cls._aborting:
+                if time.monotonic() - paused > settings.PREFETCH_MAX_PAUSE_SECONDS:
+                    raise yt_dlp.utils.DownloadCancelled("Prefetch download paused too long")
+                time.sleep(0.25)
+            # Stop at the next chunk once the drain grace period is over
+            cls._check_shutdown()
+        
+        def _postprocessing(progress: Dict) -> None:
+            # Merging/conversion in ffmpeg starts with the first post-processor
+            if progress.get('status') == 'started':
+                stage_starts.setdefault('postprocess', time.perf_counter())
+                # A running ffmpeg cannot be stopped, but the next one need not start
+                cls._check_shutdown()
+        
+        # Setup download options; continuedl picks up existing .part files
+        download_options = cls._get_yt_dlp_options({
+            'outtmpl': os.path.join(output_path, f"{filename}.%(ext)s"),
+            'format': job['format'],
+            'continuedl': True,
+            'progress_hooks': [_check_abort],
+            'postprocessor_hooks': [_postprocessing],
+        })
+        
+        # If audio only, convert to mp3
+        if audio_only:
+            download_options['postprocessors'] = [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': 'mp3',
+                'preferredquality': '192',
+            }]
+        elif settings.PLAYBACK_LAYOUT:
+            # Merge straight into MP4 so the layout pass is at most a remux
+            download_options['merge_output_format'] = 'mp4'
+        
+        download_start_time = time.time()
+        started = time.perf_counter()
+        
+        try:
+            cls._check_shutdown()
+            with yt_dlp.YoutubeDL(download_options) as ydl:
+                ydl.extract_info(job['url'], True)
+        except yt_dlp.utils.DownloadCancelled:
+            # Keep the journal entry so the download resumes on restart (or on its next request)
+            logger.warning(f"Download of video {job['id']} interrupted, will resume on restart")
+            raise
+        except Exception:
+            download_journal.remove(job['key'])
+            raise
+        
+        download_time = time.time() - download_start_time
+        
+        # Split the run into re-extraction, network transfer and ffmpeg post-processing
+        finished = time.perf_counter()
+        transfer_start = stage_starts.get('transfer', finished)
+        postprocess_start = stage_starts.get('postprocess', finished)
+        timing.record('resolve', transfer_start - started)
+        timing.record('transfer', max(0.0, postprocess_start - transfer_start))
+        timing.record('postprocess', finished - postprocess_start)
+        
+        # Find the downloaded file
+        downloaded_file = None
+        expected_extensions = ['mp3'] if audio_only else ['mp4', 'webm', 'mkv']
+        
+        for ext in expected_extensions:
+            potential_file = os.path.join(output_path, f"{filename}.{ext}")
+            if os.path.exists(potential_file):
+                downloaded_file = potential_file
+                break
+        
+        if not downloaded_file:
+            download_journal.remove(job['key'])
+            logger.error(f"Could not find downloaded file for video: {job['id']}")
+            raise ValueError(f"Download failed: Could not find downloaded file")
+        
+        # The job stays journaled until published: on restart yt-dlp finds
+        # the finished file and only packaging and publishing run again
+        try:
+            cls._check_shutdown()
+        except yt_dlp.utils.DownloadCancelled:
+            logger.warning(f"Packaging of video {job['id']} interrupted, will resume on restart")
+            raise
+        
+        hls_playlist = None
+        if not audio_only:
+            with timing.stage('package'):
+                downloaded_file, hls_playlist = cls._package_for_playback(job['id'], downloaded_file)
+        
+        expiry_time = int(time.time()) + job.get('expiry_seconds', settings.FILE_EXPIRY_SECONDS)
+        with timing.stage('publish'):
+            artifact = artifact_index.publish(downloaded_file, expiry_time)
+            hls_relative_path = artifact_index.publish(hls_playlist, expiry_time).relative_path if hls_playlist else None
+        cls.storage.touch(artifact.relative_path)
+        download_journal.remove(job['key'])
+        file_size = artifact.size
+        relative_path = artifact.relative_path
+        
+        logger.info(f"Successfully downloaded video {job['id']} to {downloaded_file} ({file_size} bytes in {download_time:.1f}s)")
+        
+        return {
+            'id': job['id'],
+            'title': job['title'],
+            'file_path': downloaded_file,
+            'relative_path': relative_path,
+            'file_size': file_size,
+            'download_time': download_time,
+            'format': job['format_id'] or job['format'],
+            'expiry_time': expiry_time,
+            'audio_only': audio_only,
+            'hls_relative_path': hls_relative_path,
+        }
+    
+    @classmethod
+    def _check_shutdown(cls) -> None:
+        """
+        Interrupt a download between chunks or stages once the drain grace
+        period is over
+        """
+        if cls._aborting:
+            raise yt_dlp.utils.DownloadCancelled("Download interrupted by shutdown")
+    
+    @classmethod
+    def _package_for_playback(cls, video_id: str, path: str) -> Tuple[str, Optional[str]]:
+        """
+        Rewrite a downloaded video for progressive playback and optionally
+        package it as HLS; returns the (possibly new) file path and the
+        playlist path. Failures keep the file as downloaded.
+        """
+        if settings.PLAYBACK_LAYOUT:
+            try:
+                path = packaging.relayout(path, settings.PLAYBACK_LAYOUT)
+            except Exception as e:
+                logger.warning(f"Could not rewrite video {video_id} with {settings.PLAYBACK_LAYOUT} layout: {str(e)}")
+        
+        hls_playlist = None
+        if settings.HLS_PACKAGING:
+            try:
+                hls_playlist = packaging.package_hls(path, settings.HLS_SEGMENT_SECONDS)
+            except Exception as e:
+                logger.warning(f"Could not package video {video_id} as HLS: {str(e)}")
+        return path, hls_playlist
+    
+    @classmethod
+    def resume_pending(cls) -> int:
+        """
+        Restart every download left unfinished in the journal. Every worker
+        of the node reads the same journal, so each job is resumed under the
+        shared download lock: one worker runs it, the others find its
+        artifact once it is published.
+        """
+        jobs = download_journal.pending()
+        for job in jobs:
+            if job['key'] not in cls._active_jobs:
+                task = asyncio.ensure_future(cls._resume(job))
+                cls._resuming.add(task)
+                task.add_done_callback(cls._resuming.discard)
+        return len(jobs)
+    
+    @classmethod
+    async def _resume(cls, job: Dict) -> None:
+        async def _compute() -> Dict:
+            # Finished (or given up) by another worker before we got the lock
+            if await aiofs.run(download_journal.get, job['key']) is None:
+                raise ValueError("Download is no longer pending")
+            active = cls._active_jobs.get(job['key'])
+            if active is not None:
+                return await asyncio.shield(active)
+            logger.info(f"Resuming unfinished download for video: {job['id']}")
+            return await asyncio.shield(cls._start_job(job, PRIORITY_BULK))
+        
+        try:
+            await cls._compute_once(
+                f"download:{job['key']}",
+                lambda: cls._lookup_artifact(job['key']),
+                _compute,
+                settings.DOWNLOAD_LOCK_TTL_SECONDS,
+            )
         except Exception as e:
-            logger.error(f"Error downloading video: {str(e)}")
-            raise ValueError(f"Failed to download video: {str(e)}")
+            logger.info(f"Not resuming download {job['key']}: {str(e)}")
     
     @classmethod
-    def _extract_video_id(cls, url: str) -> str:
+    async def list_jobs(cls) -> List[Dict]:
         """
-        Extract the video ID from a YouTube URL
+        In-flight download jobs across every worker sharing the state backend
         """
-        # Default regex pattern to extract YouTube video ID
-        patterns = [
-            r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-            r'(?:embed\/|v\/|youtu.be\/)([0-9A-Za-z_-]{11})',
-            r'(?:watch\?v=)([0-9A-Za-z_-]{11})',
-        ]
+        return await cls._state(state_backend.list_jobs)
+    
+    @classmethod
+    async def run_storage_rebalancer(cls) -> None:
+        """
+        Periodically demote idle hot-tier artifacts to the cold tier
+        """
+        if cls.storage.cold is None:
+            return
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(settings.STORAGE_REBALANCE_SECONDS)
+            try:
+                # Directories of unfinished downloads stay in the hot tier
+                protected = [job['output_path'] for job in await aiofs.run(download_journal.pending)]
+                demoted = await loop.run_in_executor(None, cls.storage.rebalance, protected)
+                if demoted:
+                    logger.info(f"Demoted {demoted} artifact(s) to the cold tier")
+            except Exception as e:
+                logger.error(f"Storage rebalance failed: {str(e)}")
+    
+    @classmethod
+    @contextmanager
+    def _live_request(cls, video_id: Optional[str] = None):
+        """
+        Count a live request (and its video's popularity) while it runs;
+        the prefetch scheduler's own requests are not counted, and nor are
+        the nested lookups of a request (a download's info lookup)
+        """
+        if prefetching.get() or _in_live_request.get():
+            yield
+            return
+        if video_id:
+            cls.popularity.hit(video_id)
+        cls._live_requests += 1
+        cls._last_live_request = time.monotonic()
+        token = _in_live_request.set(True)
+        try:
+            yield
+        finally:
+            _in_live_request.reset(token)
+            cls._live_requests -= 1
+            cls._last_live_request = time.monotonic()
+    
+    @classmethod
+    def is_idle(cls, quiet_seconds: float) -> bool:
+        """
+        Whether no live request is running or has run in the last `quiet_seconds`
+        """
+        return cls._live_requests == 0 and time.monotonic() - cls._last_live_request >= quiet_seconds
+    
+    @classmethod
+    def is_accepting(cls) -> bool:
+        """
+        Whether new downloads are being accepted
+        """
+        return cls._accepting
+    
+    @classmethod
+    def stop_accepting(cls) -> None:
+        """
+        Refuse new downloads; called as soon as shutdown is requested
+        """
+        if cls._accepting:
+            cls._accepting = False
+            cls._drain_started = time.time()
+            logger.info("No longer accepting new downloads")
+    
+    @classmethod
+    async def drain(cls, grace_seconds: float) -> None:
+        """
+        Wait for active downloads to finish within the grace period, then
+        interrupt the rest, leaving them in the journal for the next start.
+        Interrupted jobs get up to another grace period to stop, since a
+        running ffmpeg or a stalled transfer cannot be stopped at once.
+        """
+        cls.stop_accepting()
+        remaining = max(0.0, cls._drain_started + grace_seconds - time.time())
+        pending = [future for future in cls._active_jobs.values() if not future.done()]
+        if not pending:
+            return
         
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-                
-        raise ValueError(f"Could not extract video ID from URL: {url}") 
\ No newline at end of file
+        logger.info(f"Draining {len(pending)} active download(s) for up to {remaining:.0f}s")
+        _, still_running = await asyncio.wait(pending, timeout=remaining)
+        if still_running:
+            logger.warning(f"Interrupting {len(still_running)} download(s) after the grace period")
+            cls._aborting = True
+            _, stuck = await asyncio.wait(still_running, timeout=grace_seconds)
+            if stuck:
+                logger.warning(f"Shutting down with {len(stuck)} download(s) still stopping; they resume on restart")
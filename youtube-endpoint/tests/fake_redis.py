@@ -0,0 +1,50 @@
+import time
+from typing import Dict, Optional, Tuple
+
+class FakeRedis:
+    """
+    In-process stand-in for the few Redis commands RedisStateBackend uses,
+    with millisecond expiry; the release script is emulated, not evaluated
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._hashes: Dict[str, Dict[str, bytes]] = {}
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode('utf-8')
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._values.get(key)
+        if entry is None or (entry[0] is not None and entry[0] <= time.time()):
+            self._values.pop(key, None)
+            return None
+        return entry[1]
+
+    def set(self, key: str, value, nx: bool = False, px: Optional[int] = None) -> bool:
+        if nx and self.get(key) is not None:
+            return False
+        self._values[key] = (time.time() + px / 1000 if px is not None else None, self._encode(value))
+        return True
+
+    def delete(self, key: str) -> int:
+        return 1 if self._values.pop(key, None) is not None else 0
+
+    def hset(self, name: str, key: str, value) -> int:
+        self._hashes.setdefault(name, {})[key] = self._encode(value)
+        return 1
+
+    def hdel(self, name: str, key: str) -> int:
+        return 1 if self._hashes.get(name, {}).pop(key, None) is not None else 0
+
+    def hvals(self, name: str):
+        return list(self._hashes.get(name, {}).values())
+
+    def register_script(self, script: str):
+        # Only the lock release script is registered
+        def release(keys, args):
+            if self.get(keys[0]) == self._encode(args[0]):
+                return self.delete(keys[0])
+            return 0
+        return release
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('yt_dlp')
+pytest.importorskip('fastapi')
+
+from config import settings
+from services import admin
+from services.admin import RuntimeConfig, Tunable
+from services.state import SQLiteStateBackend
+
+def test_update_validates_and_records_history(monkeypatch):
+    monkeypatch.setattr(settings, 'BATCH_MAX_ITEMS', 50)
+    config = RuntimeConfig({'BATCH_MAX_ITEMS': Tunable(int, 1, 100)}, 10)
+    with pytest.raises(ValueError):
+        config.update({'BATCH_MAX_ITEMS': 1000}, 'ops')
+    entry = config.update({'BATCH_MAX_ITEMS': 60}, 'ops')
+    assert settings.BATCH_MAX_ITEMS == 60
+    assert entry['changes'] == {'BATCH_MAX_ITEMS': {'old': 50, 'new': 60}}
+
+def test_changes_reach_other_workers_through_the_state_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(admin, 'state_backend', SQLiteStateBackend(str(tmp_path / 'state.db')))
+    monkeypatch.setattr(settings, 'ADMIN_SYNC_SECONDS', 0.01)
+    monkeypatch.setattr(settings, 'BATCH_MAX_ITEMS', 50)
+    tunables = {'BATCH_MAX_ITEMS': Tunable(int, 1, 100)}
+    worker_a, worker_b = RuntimeConfig(tunables, 10), RuntimeConfig(tunables, 10)
+
+    async def run():
+        entry = worker_a.update({'BATCH_MAX_ITEMS': 70}, 'ops')
+        await worker_a.publish(entry)
+        # Worker B is another process: it still has the old value
+        settings.BATCH_MAX_ITEMS = 50
+        sync = asyncio.ensure_future(worker_b.run_sync())
+        await asyncio.sleep(0.1)
+        sync.cancel()
+
+    asyncio.run(run())
+    assert settings.BATCH_MAX_ITEMS == 70
+    assert worker_b.history()[0]['actor'] == 'ops (shared)'
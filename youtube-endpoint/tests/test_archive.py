@@ -0,0 +1,29 @@
+import asyncio
+import io
+import os
+import zipfile
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+from services.storage import LocalTier, TieredStorage
+from services.archive import stream_zip
+
+def test_zip_reads_cold_members(tmp_path):
+    storage = TieredStorage(LocalTier(str(tmp_path / 'hot')), LocalTier(str(tmp_path / 'cold')))
+    os.makedirs(storage.hot.local_path('a_1'))
+    with open(storage.hot.local_path('a_1/video.mp4'), 'wb') as f:
+        f.write(b'cold bytes')
+    storage.demote('a_1/video.mp4')
+
+    async def members():
+        yield 'video.mp4', 'a_1/video.mp4'
+        yield 'errors.txt', b'none\n'
+
+    async def collect():
+        return b''.join([chunk async for chunk in stream_zip(storage, members())])
+
+    archive = zipfile.ZipFile(io.BytesIO(asyncio.run(collect())))
+    assert archive.read('video.mp4') == b'cold bytes'
+    assert archive.read('errors.txt') == b'none\n'
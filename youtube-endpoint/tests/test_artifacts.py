@@ -0,0 +1,30 @@
+import os
+import time
+
+from config import settings
+from services.artifacts import Artifact, ArtifactIndex, read_expiry
+
+def test_publish_records_expiry_for_restarts(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DOWNLOAD_PATH', str(tmp_path))
+    path = tmp_path / 'abc_1' / 'video.mp4'
+    path.parent.mkdir()
+    path.write_bytes(b'x')
+    # An old mtime, as an upstream Last-Modified date would give
+    os.utime(path, (time.time(), 1_000_000_000))
+    expiry_time = int(time.time()) + 3600
+
+    ArtifactIndex().publish(str(path), expiry_time)
+
+    assert read_expiry('abc_1/hls/index.m3u8') == expiry_time
+    artifact = Artifact.from_path(str(path))
+    assert artifact.expiry_time == expiry_time
+    assert not artifact.expired
+
+def test_expiry_falls_back_to_mtime(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DOWNLOAD_PATH', str(tmp_path))
+    path = tmp_path / 'abc_1' / 'video.mp4'
+    path.parent.mkdir()
+    path.write_bytes(b'x')
+
+    artifact = Artifact.from_path(str(path))
+    assert artifact.expiry_time == int(os.stat(path).st_mtime) + settings.FILE_EXPIRY_SECONDS
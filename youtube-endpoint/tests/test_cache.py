@@ -0,0 +1,33 @@
+import time
+
+from services.cache import TTLCache
+
+def test_evicted_values_are_handed_to_on_evict():
+    evicted = []
+    cache = TTLCache(2, 60, on_evict=evicted.append)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.set('c', 3)
+    assert evicted == [1]
+    cache.set('b', 20)
+    assert evicted == [1, 2]
+    cache.configure(max_size=1)
+    assert evicted == [1, 2, 3]
+    cache.clear()
+    assert evicted == [1, 2, 3, 20]
+
+def test_expired_values_are_handed_to_on_evict():
+    evicted = []
+    cache = TTLCache(2, 60, on_evict=evicted.append)
+    cache.set('a', 1, ttl_seconds=0.001)
+    time.sleep(0.01)
+    assert cache.get('a') is None
+    assert evicted == [1]
+
+def test_popped_values_are_not_evicted():
+    evicted = []
+    cache = TTLCache(2, 60, on_evict=evicted.append)
+    cache.set('a', 1)
+    cache.set('a', 1)
+    assert cache.pop('a') == 1
+    assert evicted == []
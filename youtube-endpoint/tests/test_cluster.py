@@ -0,0 +1,35 @@
+import pytest
+
+pytest.importorskip('fastapi')
+
+from services.cluster import Cluster, FORWARDED_HEADER, SECRET_HEADER, CLIENT_HEADER
+
+PEERS = ['http://a:8000', 'http://b:8000', 'http://c:8000']
+
+class _Request:
+    def __init__(self, headers):
+        self.headers = headers
+
+def _remote_key(cluster):
+    # A video ID owned by another node
+    return next(key for key in (f"video{n:06d}" for n in range(1000)) if cluster.ring.owner(key) != cluster.self_url)
+
+def test_forwarded_mark_needs_the_secret():
+    cluster = Cluster('http://a:8000', PEERS, secret='s3cret')
+    key = _remote_key(cluster)
+    spoofed = _Request({FORWARDED_HEADER: 'http://b:8000', CLIENT_HEADER: 'someone-else'})
+    wrong = _Request({FORWARDED_HEADER: 'http://b:8000', SECRET_HEADER: 'guess', CLIENT_HEADER: 'someone-else'})
+    peer = _Request({FORWARDED_HEADER: 'http://b:8000', SECRET_HEADER: 's3cret', CLIENT_HEADER: 'key-123'})
+
+    assert cluster.remote_owner(key, spoofed) == cluster.ring.owner(key)
+    assert cluster.remote_owner(key, wrong) == cluster.ring.owner(key)
+    assert cluster.forwarded_client(spoofed) is None
+    assert cluster.remote_owner(key, peer) is None
+    assert cluster.forwarded_client(peer) == 'key-123'
+
+def test_forwarded_mark_is_ignored_without_a_secret():
+    cluster = Cluster('http://a:8000', PEERS)
+    key = _remote_key(cluster)
+    request = _Request({FORWARDED_HEADER: 'http://b:8000', SECRET_HEADER: '', CLIENT_HEADER: 'x'})
+    assert cluster.remote_owner(key, request) == cluster.ring.owner(key)
+    assert cluster.forwarded_client(request) is None
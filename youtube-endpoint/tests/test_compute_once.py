@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('yt_dlp')
+pytest.importorskip('fastapi')
+
+from services.youtube import YouTubeService
+
+def test_waiters_share_one_failed_attempt():
+    calls = []
+
+    async def lookup():
+        return None
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream failed")
+
+    async def run():
+        return await asyncio.gather(
+            *[YouTubeService._compute_once('test:fail', lookup, compute, 5) for _ in range(3)],
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    assert 'test:fail' not in YouTubeService._computing
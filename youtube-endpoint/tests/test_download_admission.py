@@ -0,0 +1,75 @@
+import time
+import asyncio
+
+import pytest
+
+pytest.importorskip('yt_dlp')
+pytest.importorskip('fastapi')
+
+from services import youtube
+from services.journal import DownloadJournal
+from services.scheduler import FairScheduler, QuotaExceededError, PRIORITY_DOWNLOAD
+from services.youtube import YouTubeService
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(youtube, 'download_journal', DownloadJournal(str(tmp_path / 'journal.json')))
+    monkeypatch.setattr(YouTubeService, '_active_jobs', {})
+    return YouTubeService
+
+def _job(key):
+    return {'key': key, 'id': 'abcdefghijk', 'output_path': '/nonexistent'}
+
+def test_refused_job_is_not_journaled(service, monkeypatch):
+    # No free slot and no room in the queue
+    monkeypatch.setattr(youtube, 'fair_scheduler', FairScheduler(0, {}, {}, 1, 0, None))
+
+    async def run():
+        await service._start_job(_job('refused'), PRIORITY_DOWNLOAD, journal=True)
+
+    with pytest.raises(QuotaExceededError):
+        asyncio.run(run())
+    assert youtube.download_journal.pending() == []
+
+def test_slot_lasts_as_long_as_the_download(service, monkeypatch):
+    fair = FairScheduler(1, {}, {}, 1, 10, None)
+    monkeypatch.setattr(youtube, 'fair_scheduler', fair)
+
+    def run_job(job):
+        time.sleep(0.1)
+        return {'file_size': 1}
+
+    monkeypatch.setattr(service, '_run_job', run_job)
+
+    async def run():
+        job = service._start_job(_job('held'), PRIORITY_DOWNLOAD)
+        requester = asyncio.ensure_future(asyncio.shield(job))
+        await asyncio.sleep(0.02)
+        # The requester goes away; the download and its slot carry on
+        requester.cancel()
+        await asyncio.sleep(0.02)
+        running = fair.load()[0]
+        await job
+        return running, fair.load()[0]
+
+    assert asyncio.run(run()) == (1, 0)
+
+def test_resumed_job_runs_in_one_worker(service, monkeypatch):
+    youtube.download_journal.add(_job('pending'))
+    runs = []
+
+    async def start(job, priority, journal=False):
+        runs.append(job['key'])
+        youtube.download_journal.remove(job['key'])
+        return {'file_size': 1}
+
+    # The first worker finishes the job; the second finds it done
+    monkeypatch.setattr(service, '_start_job', lambda job, priority, journal=False: asyncio.ensure_future(start(job, priority)))
+
+    async def run():
+        service.resume_pending()
+        service.resume_pending()
+        await asyncio.gather(*service._resuming)
+
+    asyncio.run(run())
+    assert runs == ['pending']
@@ -0,0 +1,34 @@
+import time
+import asyncio
+
+import pytest
+
+yt_dlp = pytest.importorskip('yt_dlp')
+pytest.importorskip('fastapi')
+
+from services.youtube import YouTubeService
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(YouTubeService, '_active_jobs', {})
+    monkeypatch.setattr(YouTubeService, '_accepting', True)
+    monkeypatch.setattr(YouTubeService, '_aborting', False)
+    monkeypatch.setattr(YouTubeService, '_drain_started', None)
+    return YouTubeService
+
+def test_drain_gives_up_on_stuck_downloads(service):
+    async def run():
+        # A job that never reaches a progress hook, like a long ffmpeg run
+        service._active_jobs['stuck'] = asyncio.get_event_loop().create_future()
+        started = time.monotonic()
+        await service.drain(0.05)
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) < 1
+    assert service._aborting
+
+def test_shutdown_is_checked_between_stages(service):
+    service._check_shutdown()
+    service._aborting = True
+    with pytest.raises(yt_dlp.utils.DownloadCancelled):
+        service._check_shutdown()
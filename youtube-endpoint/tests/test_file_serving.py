@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+from config import settings
+from services.artifacts import Artifact
+from services.file_responses import offload_response
+from routers.youtube import _normalize_file_path
+
+@pytest.fixture
+def download_path(tmp_path, monkeypatch):
+    root = tmp_path / 'downloads'
+    (root / 'abc_1').mkdir(parents=True)
+    (root / 'abc_1' / 'video.mp4').write_bytes(b'x')
+    monkeypatch.setattr(settings, 'DOWNLOAD_PATH', str(root))
+    return root
+
+def test_normalizes_paths_inside_download_dirs(download_path):
+    assert _normalize_file_path('abc_1/video.mp4') == 'abc_1/video.mp4'
+    assert _normalize_file_path('abc_1/./hls/../video.mp4') == 'abc_1/video.mp4'
+
+@pytest.mark.parametrize('file_path', [
+    '../secret.txt',
+    'abc_1/../../secret.txt',
+    '/etc/passwd',
+    # Top-level files such as the journal are never served
+    'journal.json',
+    'abc_1/..',
+])
+def test_rejects_traversal(download_path, file_path):
+    assert _normalize_file_path(file_path) is None
+
+def test_rejects_symlinks_out_of_the_download_path(download_path, tmp_path):
+    (tmp_path / 'secret.txt').write_text('secret')
+    os.symlink(tmp_path / 'secret.txt', download_path / 'abc_1' / 'link.mp4')
+    assert _normalize_file_path('abc_1/link.mp4') is None
+
+def _artifact(relative_path):
+    return Artifact.from_stat(relative_path, f"/srv/downloads/{relative_path}", 10, 1700000000.0, 1800000000)
+
+def test_x_accel_redirect_points_at_the_internal_location(monkeypatch):
+    monkeypatch.setattr(settings, 'FILE_OFFLOAD', 'x-accel-redirect')
+    monkeypatch.setattr(settings, 'FILE_OFFLOAD_PREFIX', '/protected-downloads/')
+    headers = {}
+    offload_response(_artifact('abc_1/My Video #1.mp4'), '/srv/downloads/abc_1/My Video #1.mp4', headers)
+    assert headers == {'X-Accel-Redirect': '/protected-downloads/abc_1/My%20Video%20%231.mp4'}
+
+def test_x_sendfile_carries_the_hot_path(monkeypatch):
+    monkeypatch.setattr(settings, 'FILE_OFFLOAD', 'x-sendfile')
+    headers = {}
+    offload_response(_artifact('abc_1/video.mp4'), '/srv/downloads/abc_1/video.mp4', headers)
+    assert headers == {'X-Sendfile': '/srv/downloads/abc_1/video.mp4'}
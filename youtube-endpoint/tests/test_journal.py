@@ -0,0 +1,25 @@
+import os
+
+from services.journal import DownloadJournal
+
+def test_workers_merge_their_entries(tmp_path):
+    path = str(tmp_path / 'journal.json')
+    # One instance per worker process, all on the node's journal
+    first, second = DownloadJournal(path), DownloadJournal(path)
+    first.add({'key': 'a', 'id': 'a'})
+    second.add({'key': 'b', 'id': 'b'})
+    assert sorted(job['key'] for job in first.pending()) == ['a', 'b']
+
+    first.remove('b')
+    assert [job['key'] for job in second.pending()] == ['a']
+    assert second.get('a') == {'key': 'a', 'id': 'a'}
+    # Temp files never linger next to the journal
+    assert sorted(os.listdir(tmp_path)) == ['journal.json', 'journal.json.lock']
+
+def test_corrupt_journal_is_ignored(tmp_path):
+    path = tmp_path / 'journal.json'
+    path.write_text('{not json')
+    journal = DownloadJournal(str(path))
+    assert journal.pending() == []
+    journal.add({'key': 'a'})
+    assert journal.get('a') == {'key': 'a'}
@@ -0,0 +1,18 @@
+import pytest
+
+pytest.importorskip('yt_dlp')
+pytest.importorskip('fastapi')
+
+from services.youtube import YouTubeService
+from services.popularity import PopularityTracker
+
+def test_nested_lookups_count_once(monkeypatch):
+    monkeypatch.setattr(YouTubeService, 'popularity', PopularityTracker(3600, 100))
+    with YouTubeService._live_request('dQw4w9WgXcQ'):
+        # A download looks up the video's info inside its own live request
+        with YouTubeService._live_request('dQw4w9WgXcQ'):
+            assert YouTubeService._live_requests == 1
+    assert YouTubeService._live_requests == 0
+    [(video_id, score)] = YouTubeService.popularity.top(1)
+    assert video_id == 'dQw4w9WgXcQ'
+    assert score == pytest.approx(1.0, rel=1e-3)
@@ -0,0 +1,83 @@
+import random
+import string
+
+import pytest
+
+from services.media_id import parse_media_ref
+
+ID_ALPHABET = string.ascii_letters + string.digits + '_-'
+
+# (input, expected video ID or None when the input must be rejected)
+CORPUS = [
+    ('dQw4w9WgXcQ', 'dQw4w9WgXcQ'),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'dQw4w9WgXcQ'),
+    ('http://youtube.com/watch?v=dQw4w9WgXcQ&t=43s', 'dQw4w9WgXcQ'),
+    ('youtube.com/watch?feature=share&v=dQw4w9WgXcQ', 'dQw4w9WgXcQ'),
+    ('https://m.youtube.com/watch?v=dQw4w9WgXcQ#t=1m3s', 'dQw4w9WgXcQ'),
+    ('https://music.youtube.com/watch?v=dQw4w9WgXcQ&list=RDAMVMdQw4w9WgXcQ', 'dQw4w9WgXcQ'),
+    ('https://youtu.be/dQw4w9WgXcQ?t=10', 'dQw4w9WgXcQ'),
+    ('https://www.youtube.com/shorts/dQw4w9WgXcQ', 'dQw4w9WgXcQ'),
+    ('https://www.youtube.com/embed/dQw4w9WgXcQ?start=5', 'dQw4w9WgXcQ'),
+    ('https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ', 'dQw4w9WgXcQ'),
+    ('https://www.youtube.com/live/dQw4w9WgXcQ?feature=share', 'dQw4w9WgXcQ'),
+    ('https://www.youtube.com/v/dQw4w9WgXcQ', 'dQw4w9WgXcQ'),
+    ('HTTPS://WWW.YOUTUBE.COM/watch?v=dQw4w9WgXcQ', 'dQw4w9WgXcQ'),
+    ('  https://youtu.be/dQw4w9WgXcQ  ', 'dQw4w9WgXcQ'),
+    # Rejected: wrong hosts, wrong lengths, path segments of unrelated URLs
+    ('https://example.com/dQw4w9WgXcQ', None),
+    ('https://example.com/watch?v=dQw4w9WgXcQ', None),
+    ('https://notyoutube.com/watch?v=dQw4w9WgXcQ', None),
+    ('https://www.youtube.com/channel/UCuAXFkgsw1L7xaCfnd5JJOw', None),
+    ('https://www.youtube.com/playlist?list=PL590L5WQmH8fJ54F369BLDSqIwcs-TCfs', None),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXc', None),
+    ('https://www.youtube.com/watch?v=dQw4w9WgXcQQ', None),
+    ('https://www.youtube.com/watch?vv=dQw4w9WgXcQ', None),
+    ('https://youtu.be/dQw4w9WgXcQ extra', None),
+    ('dQw4w9WgXc', None),
+    ('', None),
+]
+
+def random_video_id(rng: random.Random) -> str:
+    return ''.join(rng.choices(ID_ALPHABET, k=11))
+
+def random_url(video_id: str, rng: random.Random) -> str:
+    """
+    Build a random valid URL for `video_id` in one of the supported shapes
+    """
+    scheme = rng.choice(['', 'http://', 'https://'])
+    params = rng.sample(['feature=share', 'si=abc', 't=1m2s', 'list=PLx1', 'start=7', 'ab_channel=x'], k=rng.randint(0, 3))
+    shape = rng.choice(['watch', 'watch-late', 'short', 'shorts', 'embed', 'live', 'v'])
+    host = rng.choice(['youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com'])
+    if shape == 'watch':
+        query = '&'.join([f"v={video_id}"] + params)
+        return f"{scheme}{host}/watch?{query}"
+    if shape == 'watch-late':
+        query = '&'.join(params + [f"v={video_id}"])
+        return f"{scheme}{host}/watch?{query}"
+    if shape == 'short':
+        query = '?' + '&'.join(params) if params else ''
+        return f"{scheme}youtu.be/{video_id}{query}"
+    query = '?' + '&'.join(params) if params else ''
+    return f"{scheme}{host}/{shape}/{video_id}{query}"
+
+@pytest.mark.parametrize('value, expected', CORPUS)
+def test_corpus(value, expected):
+    try:
+        video_id = parse_media_ref(value).video_id
+    except ValueError:
+        video_id = None
+    assert video_id == expected
+
+def test_generated_urls():
+    rng = random.Random(0)
+    for _ in range(5000):
+        video_id = random_video_id(rng)
+        url = random_url(video_id, rng)
+        ref = parse_media_ref(url)
+        assert ref.video_id == video_id, url
+        # Canonical URLs are a fixed point
+        assert parse_media_ref(ref.url) == (video_id, None, None), url
+        if 't=1m2s' in url and 'start=7' not in url:
+            assert ref.start == 62, url
+        if 'list=PLx1' in url:
+            assert ref.playlist_id == 'PLx1', url
@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+pytest.importorskip('yt_dlp')
+pytest.importorskip('fastapi')
+
+from services import youtube
+from services.youtube import _Pacer
+
+def _run(pacer, chunks, rate):
+    downloaded = 0
+    pacer.pace({'status': 'downloading', 'downloaded_bytes': 0}, rate)
+    for chunk in chunks:
+        downloaded += chunk
+        pacer.pace({'status': 'downloading', 'downloaded_bytes': downloaded}, rate)
+
+def test_fragments_are_held_to_the_rate(monkeypatch):
+    slept = []
+    monkeypatch.setattr(youtube.time, 'sleep', slept.append)
+    # Fragments arrive at once; with no time passing, each owes at least a
+    # second, and no single sleep is longer than the cap
+    _run(_Pacer(), [1000] * 4, 1000)
+    assert slept == [pytest.approx(youtube._MAX_PACING_SLEEP_SECONDS, abs=0.01)] * 4
+
+def test_a_raised_rate_applies_at_once(monkeypatch):
+    slept = []
+    monkeypatch.setattr(youtube.time, 'sleep', slept.append)
+    pacer = _Pacer()
+    _run(pacer, [1000], 100)
+    slept.clear()
+    pacer.pace({'status': 'downloading', 'downloaded_bytes': 1001}, None)
+    assert slept == []
+
+def test_real_pacing_takes_about_the_owed_time():
+    pacer = _Pacer()
+    started = time.monotonic()
+    _run(pacer, [100] * 5, 2000)
+    assert 0.2 <= time.monotonic() - started < 1
@@ -0,0 +1,32 @@
+import asyncio
+import threading
+from collections import namedtuple
+
+import pytest
+
+pytest.importorskip('yt_dlp')
+pytest.importorskip('fastapi')
+
+from services import readiness
+
+def test_disk_is_measured_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def disk_usage(path):
+        threads.append(threading.current_thread())
+        return namedtuple('usage', 'total used free')(100, 0, 10 ** 12)
+
+    monkeypatch.setattr(readiness.shutil, 'disk_usage', disk_usage)
+    monkeypatch.setattr(readiness, '_host_checked', 0.0)
+    monkeypatch.setattr(readiness, '_report', None)
+
+    async def run():
+        report = readiness.readiness()
+        # The report uses the last measurement while the new one runs
+        assert 'disk' in report['checks']
+        while readiness._host_checking:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert threads and threading.main_thread() not in threads
+    assert readiness._disk == {'free_bytes': 10 ** 12}
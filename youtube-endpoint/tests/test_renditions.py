@@ -0,0 +1,45 @@
+import os
+import asyncio
+
+import pytest
+
+pytest.importorskip('yt_dlp')
+pytest.importorskip('fastapi')
+
+from config import settings
+from services.artifacts import artifact_index
+from services.storage import LocalTier, TieredStorage
+from services.youtube import YouTubeService
+
+def test_demoted_rendition_is_not_transcoded_again(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'DOWNLOAD_PATH', str(tmp_path / 'hot'))
+    storage = TieredStorage(LocalTier(str(tmp_path / 'hot')), LocalTier(str(tmp_path / 'cold')))
+    monkeypatch.setattr(YouTubeService, 'storage', storage)
+    source_path = storage.hot.local_path('abcdefghijk_1/video.mp4')
+    os.makedirs(os.path.dirname(source_path))
+    with open(source_path, 'wb') as f:
+        f.write(b'source')
+
+    transcodes = []
+
+    async def transcode(source, output, preset):
+        transcodes.append(output)
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+        with open(output, 'wb') as f:
+            f.write(b'rendition')
+
+    monkeypatch.setattr(YouTubeService._transcoder, 'transcode', transcode)
+    name = next(iter(settings.RENDITION_PRESETS))
+
+    async def run():
+        first = await YouTubeService._rendition('abcdefghijk', source_path, name, 2000000000)
+        storage.demote(first.relative_path)
+        # Forgotten by this process, as after a restart
+        artifact_index.remove(first.relative_path)
+        return first, await YouTubeService._rendition('abcdefghijk', source_path, name, 2000000000)
+
+    first, second = asyncio.run(run())
+    assert len(transcodes) == 1
+    assert second.relative_path == first.relative_path
+    assert second.size == len(b'rendition')
+    assert storage.is_cold(second.relative_path)
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+from services import scheduler
+from services.scheduler import FairScheduler
+
+def test_idle_flows_and_clients_are_forgotten(monkeypatch):
+    monkeypatch.setattr(scheduler, '_EVICT_INTERVAL_SECONDS', 0)
+    fair = FairScheduler(1, {'info': 4.0}, {}, 1, 10, None)
+
+    async def run():
+        # A second client queues behind the first, so both flows get tags
+        await fair.acquire('a', 'info')
+        waiter = asyncio.ensure_future(fair.acquire('b', 'info'))
+        await asyncio.sleep(0)
+        fair.release('a')
+        await waiter
+        fair.release('b')
+
+    asyncio.run(run())
+    assert fair._last_tag == {}
+    assert fair._clients == {}
+
+def test_clients_within_the_quota_window_are_kept(monkeypatch):
+    monkeypatch.setattr(scheduler, '_EVICT_INTERVAL_SECONDS', 0)
+    fair = FairScheduler(1, {}, {}, 1, 10, 1000)
+
+    async def run():
+        await fair.acquire('a', 'download')
+        fair.charge('a', 600)
+        fair.release('a')
+
+    asyncio.run(run())
+    assert fair._stats('a').bytes_last_hour() == 600
+
+def test_snapshot_masks_api_keys():
+    fair = FairScheduler(1, {}, {}, 1, 10, None)
+
+    async def run():
+        await fair.acquire('sk_live_SECRETKEY123', 'info')
+        return fair.snapshot()
+
+    clients = asyncio.run(run())['clients']
+    assert 'sk_live_SECRETKEY123' not in clients
+    [masked] = clients
+    assert masked.startswith('sk_l...') and 'SECRET' not in masked
@@ -0,0 +1,127 @@
+import os
+import asyncio
+
+import pytest
+
+yt_dlp = pytest.importorskip('yt_dlp')
+pytest.importorskip('fastapi')
+
+from services import replay
+from services.search import SearchPager, SearchUnsupportedError, _SearchSession, encode_cursor, decode_cursor
+from services.youtube import YouTubeService, ServiceUnavailableError
+
+# Recorded web client config plus two search result pages, 3 and 2 videos long
+_FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', 'search')
+_OPTIONS = {'quiet': True, 'no_warnings': True, 'extract_flat': True, 'skip_download': True}
+
+# Upstream result pages by continuation, of uneven sizes like YouTube's
+_UPSTREAM = {
+    None: ([f'a{i}' for i in range(5)], 'tok1'),
+    'tok1': ([f'b{i}' for i in range(3)], 'tok2'),
+    'tok2': ([f'c{i}' for i in range(4)], None),
+}
+
+class _FakePager(SearchPager):
+    def __init__(self, page_size):
+        super().__init__(page_size, 10, 60)
+        self.reads = []
+
+    def _read_upstream(self, session, query, continuation, ydl_options):
+        self.reads.append(continuation)
+        ids, next_continuation = _UPSTREAM[continuation]
+        return [{'id': video_id} for video_id in ids], next_continuation
+
+def _ids(results):
+    return [result['id'] for result in results]
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor('cats', 0)) == ('cats', 0, None, 0)
+    assert decode_cursor(encode_cursor('cats', 3, 'tok', 7)) == ('cats', 3, 'tok', 7)
+
+@pytest.mark.parametrize('cursor', ['', 'not base64!', encode_cursor('cats', 1)[:-2],
+                                    'eyJxIjoiY2F0cyIsInAiOjEsIm8iOi0xfQ'])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_pages_resume_from_the_cursor_position():
+    async def run():
+        pages, position = [], (None, 0)
+        while position is not None:
+            # A fresh pager per page, as on another worker or after eviction
+            pager = _FakePager(4)
+            results, position = await pager.page('cats', len(pages), *position)
+            pages.append((_ids(results), pager.reads))
+        return pages
+
+    pages = asyncio.run(run())
+    assert [ids for ids, _ in pages] == [
+        ['a0', 'a1', 'a2', 'a3'],
+        ['a4', 'b0', 'b1', 'b2'],
+        ['c0', 'c1', 'c2', 'c3'],
+    ]
+    # Earlier upstream pages are never read again
+    assert [reads for _, reads in pages] == [[None], [None, 'tok1'], ['tok2']]
+
+def test_concurrent_requests_share_one_read():
+    pager = _FakePager(4)
+
+    async def run():
+        return await asyncio.gather(*[pager.page('cats', 0) for _ in range(3)])
+
+    results = asyncio.run(run())
+    assert len({tuple(_ids(page)) for page, _ in results}) == 1
+    assert pager.reads == [None]
+
+def test_evicted_sessions_close_once_idle():
+    closed = []
+
+    class _Ydl:
+        def close(self):
+            closed.append(self)
+
+    async def run():
+        session = _SearchSession()
+        session.ydl = _Ydl()
+        await session.lock.acquire()
+        session.retire()
+        assert closed == []
+        session.lock.release()
+        session.close()
+        return session
+
+    session = asyncio.run(run())
+    assert len(closed) == 1 and session.ydl is None
+
+@pytest.fixture
+def recorded_search(monkeypatch):
+    monkeypatch.setattr(yt_dlp.YoutubeDL, 'urlopen', yt_dlp.YoutubeDL.urlopen)
+    replay.install(replay.TrafficReplayer(_FIXTURES))
+
+def test_real_upstream_pages_from_recorded_traffic(recorded_search):
+    pager = SearchPager(4, 10, 60)
+
+    async def run():
+        first = await pager.page('cats', 0, ydl_options=_OPTIONS)
+        second = await pager.page('cats', 1, *first[1], ydl_options=_OPTIONS)
+        return first, second
+
+    (first, position), (second, end) = asyncio.run(run())
+    assert _ids(first) == ['jNQXAC9IVRw', 'dQw4w9WgXcQ', '9bZkp7q19f0', 'kJQP7kiw5Fk']
+    assert position == ('fixture-continuation-2', 1)
+    assert _ids(second) == ['OPf0YbXqDm0'] and end is None
+    assert first[1]['title'] == 'Never Gonna Give You Up'
+    assert first[1]['duration'] == 213
+    assert first[1]['url'] == 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+def test_incompatible_search_internals_raise_a_clear_error(recorded_search, monkeypatch):
+    # As if a yt-dlp release dropped the continuation out-parameter
+    search_ie = type(yt_dlp.YoutubeDL(_OPTIONS).get_info_extractor('YoutubeSearch'))
+    monkeypatch.setattr(search_ie, '_extract_entries', lambda self, parent_renderer: iter(()))
+    pager = SearchPager(4, 10, 60)
+    with pytest.raises(SearchUnsupportedError, match='installed yt-dlp'):
+        asyncio.run(pager.page('cats', 0, ydl_options=_OPTIONS))
+
+    monkeypatch.setattr(YouTubeService, '_search_pager', pager)
+    with pytest.raises(ServiceUnavailableError):
+        asyncio.run(YouTubeService.search('cats'))
@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from services import state
+from services.state import MemoryStateBackend, RedisStateBackend, SQLiteStateBackend, StateBackend
+
+from fake_redis import FakeRedis
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryStateBackend()
+    if request.param == 'sqlite':
+        return SQLiteStateBackend(str(tmp_path / 'state.db'))
+    return RedisStateBackend('redis://unused', client=FakeRedis())
+
+def test_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        StateBackend()
+
+def test_lock_excludes_other_owners_until_released(backend):
+    token = backend.acquire_lock('download:x', 30)
+    assert token is not None
+    assert backend.acquire_lock('download:x', 30) is None
+    backend.release_lock('download:x', 'not-the-token')
+    assert backend.acquire_lock('download:x', 30) is None
+    backend.release_lock('download:x', token)
+    assert backend.acquire_lock('download:x', 30) is not None
+
+def test_expired_lock_can_be_taken(backend):
+    assert backend.acquire_lock('info:x', 0.01) is not None
+    time.sleep(0.02)
+    assert backend.acquire_lock('info:x', 30) is not None
+
+def test_cache_entries_expire(backend):
+    backend.set_cache('info:x', b'record', 30)
+    backend.set_cache('info:y', b'record', 0.01)
+    time.sleep(0.02)
+    assert backend.get_cache('info:x') == b'record'
+    assert backend.get_cache('info:y') is None
+
+def test_jobs_and_artifacts(backend):
+    backend.put_job('x:best', {'key': 'x:best', 'node': 'a'})
+    assert backend.list_jobs() == [{'key': 'x:best', 'node': 'a'}]
+    backend.delete_job('x:best')
+    assert backend.list_jobs() == []
+
+    backend.set_artifact('x:best', {'relative_path': 'x_1/x.mp4', 'node': 'a'}, 30)
+    assert backend.get_artifact('x:best') == {'relative_path': 'x_1/x.mp4', 'node': 'a'}
+    assert backend.get_artifact('y:best') is None
+
+def test_memory_backend_purges_unread_entries(monkeypatch):
+    monkeypatch.setattr(state, '_PURGE_INTERVAL_SECONDS', 0)
+    backend = MemoryStateBackend()
+    backend.set_cache('info:x', b'record', 0.01)
+    backend.acquire_lock('info:x', 0.01)
+    time.sleep(0.02)
+    backend.set_cache('info:y', b'record', 30)
+    assert list(backend._values) == ['cache:info:y']
+    assert backend._locks == {}
+
+def test_sqlite_backend_purges_unread_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(state, '_PURGE_INTERVAL_SECONDS', 0)
+    backend = SQLiteStateBackend(str(tmp_path / 'state.db'))
+    backend.set_cache('info:x', b'record', 0.01)
+    backend.acquire_lock('info:x', 0.01)
+    time.sleep(0.02)
+    backend.set_cache('info:y', b'record', 30)
+    assert backend._db.execute("SELECT key FROM entries").fetchall() == [('cache:info:y',)]
+    assert backend._db.execute("SELECT COUNT(*) FROM locks").fetchone() == (0,)
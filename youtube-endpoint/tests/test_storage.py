@@ -0,0 +1,84 @@
+import os
+
+from config import settings
+from services.storage import LocalTier, TieredStorage
+
+def _write(path, data=b'x'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+def _storage(tmp_path):
+    return TieredStorage(LocalTier(str(tmp_path / 'hot')), LocalTier(str(tmp_path / 'cold')))
+
+def test_files_skips_unfinished_work(tmp_path):
+    tier = LocalTier(str(tmp_path))
+    _write(str(tmp_path / 'a_1' / 'video.mp4'))
+    _write(str(tmp_path / 'a_1' / 'video.mp4.part'))
+    _write(str(tmp_path / 'a_1' / '.relayout.mp4'))
+    _write(str(tmp_path / 'a_1' / 'renditions' / '.video.360p.mp4'))
+    _write(str(tmp_path / 'a_1' / 'hls' / 'segment_00000.m4s'))
+    _write(str(tmp_path / 'b_1' / 'hls' / 'segment_00000.m4s'))
+    _write(str(tmp_path / 'b_1' / 'hls' / 'index.m3u8'))
+    _write(str(tmp_path / 'journal.json'))
+
+    assert sorted(path for path, _, _ in tier.files()) == [
+        'a_1/video.mp4', 'b_1/hls/index.m3u8', 'b_1/hls/segment_00000.m4s',
+    ]
+
+def test_promote_keeps_cold_copy_while_read(tmp_path):
+    storage = _storage(tmp_path)
+    _write(storage.hot.local_path('a_1/video.mp4'), b'0123456789')
+    storage.demote('a_1/video.mp4')
+
+    reader = storage.open('a_1/video.mp4')
+    assert storage.promote('a_1/video.mp4')
+    assert storage.cold.exists('a_1/video.mp4')
+    assert reader.read(4) == b'0123'
+    reader.close()
+    assert not storage.cold.exists('a_1/video.mp4')
+    assert storage.hot.exists('a_1/video.mp4')
+
+def test_demote_cancels_pending_cold_delete(tmp_path):
+    storage = _storage(tmp_path)
+    _write(storage.hot.local_path('a_1/video.mp4'))
+    storage.demote('a_1/video.mp4')
+    reader = storage.open('a_1/video.mp4')
+    storage.promote('a_1/video.mp4')
+    storage.demote('a_1/video.mp4')
+    reader.close()
+    assert storage.cold.exists('a_1/video.mp4')
+
+def test_rebalance_forgets_files_gone_from_hot_tier(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'HOT_TIER_MAX_BYTES', 0)
+    storage = _storage(tmp_path)
+    _write(storage.hot.local_path('a_1/video.mp4'))
+    storage.touch('a_1/video.mp4')
+    storage.touch('gone_1/video.mp4')
+
+    assert storage.rebalance() == 1
+    assert storage._last_access == {}
+
+def test_open_falls_back_to_a_copy_demoted_by_another_worker(tmp_path):
+    storage, other = _storage(tmp_path), _storage(tmp_path)
+    _write(storage.hot.local_path('a_1/video.mp4'), b'0123456789')
+    # Two workers share the tiers but not their view of what is cold
+    other.demote('a_1/video.mp4')
+    assert not storage.is_cold('a_1/video.mp4')
+
+    with storage.open('a_1/video.mp4') as reader:
+        assert reader.read(4) == b'0123'
+    assert storage.is_cold('a_1/video.mp4')
+
+def test_concurrent_demotes_of_one_file(tmp_path):
+    storage, other = _storage(tmp_path), _storage(tmp_path)
+    _write(storage.hot.local_path('a_1/video.mp4'), b'0123456789')
+    other.demote('a_1/video.mp4')
+    storage.demote('a_1/video.mp4')
+    assert storage.is_cold('a_1/video.mp4')
+    assert os.listdir(tmp_path / 'cold' / 'a_1') == ['video.mp4']
+
+def test_accesses_are_not_kept_without_a_cold_tier(tmp_path):
+    storage = TieredStorage(LocalTier(str(tmp_path / 'hot')))
+    storage.touch('a_1/video.mp4')
+    assert storage._last_access == {}
@@ -0,0 +1,25 @@
+from services.subtitles import parse_vtt
+
+def _vtt(*cues):
+    blocks = ['WEBVTT']
+    for index, lines in enumerate(cues):
+        blocks.append(f"00:00:{index:02d}.000 --> 00:00:{index + 1:02d}.000\n" + '\n'.join(lines))
+    return '\n\n'.join(blocks) + '\n'
+
+def test_rolling_caption_overlap_is_removed():
+    cues = parse_vtt(_vtt(
+        ['we are going'],
+        ['we are going', 'to the park'],
+        # YouTube's short transition cue, repeating the last line alone
+        ['to the park'],
+        ['to the park', 'today'],
+    ))
+    assert [text for _, _, text in cues] == ['we are going', 'to the park', 'today']
+
+def test_repeated_captions_are_kept():
+    cues = parse_vtt(_vtt(['No.'], ['No.'], ['Stop, stop', 'stop, stop']))
+    assert [text for _, _, text in cues] == ['No.', 'No.', 'Stop, stop stop, stop']
+
+def test_only_the_carried_over_line_is_dropped():
+    cues = parse_vtt(_vtt(['one', 'two'], ['two', 'two']))
+    assert [text for _, _, text in cues] == ['one two', 'two']
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+pytest.importorskip('yt_dlp')
+pytest.importorskip('fastapi')
+
+from services.thumbnails import ThumbnailCache
+
+def _write(cache, video_id, name, data, width=None):
+    video_dir = os.path.join(cache.path, video_id)
+    tmp_path = cache._temp_path(video_dir, name)
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    return cache._place(video_id, width, tmp_path, os.path.join(video_dir, name))
+
+def test_refetch_removes_stale_files(tmp_path):
+    # Due for a refresh as soon as written
+    cache = ThumbnailCache(str(tmp_path), 10000, [320], -1)
+    _write(cache, 'vid', 'original.jpg', b'old')
+    variant = _write(cache, 'vid', 'w320.jpg', b'small', width=320)
+    assert cache._lookup('vid', None) is None
+    # A request still serving the variant keeps a readable file
+    with open(variant.path, 'rb') as served:
+        _write(cache, 'vid', 'original.webp', b'new')
+        assert served.read() == b'small'
+    assert os.listdir(tmp_path / 'vid') == ['original.webp']
+    assert cache._total == len(b'new')
+
+def test_eviction_keeps_files_being_written(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), 8, [320], 3600)
+    _write(cache, 'a', 'original.jpg', b'aaaaa')
+    # A temp file of a write still in progress for the video being evicted
+    pending = cache._temp_path(str(tmp_path / 'a'), 'w320.jpg')
+    _write(cache, 'b', 'original.jpg', b'bbbbb')
+    assert os.listdir(tmp_path / 'a') == [os.path.basename(pending)]
+    assert cache._lookup('a', None) is None
+    assert cache._lookup('b', None) is not None
+
+def test_scan_removes_variants_of_a_previous_image(tmp_path):
+    video_dir = tmp_path / 'vid'
+    video_dir.mkdir()
+    (video_dir / 'w320.jpg').write_bytes(b'stale')
+    (video_dir / 'original.jpg').write_bytes(b'image')
+    os.utime(video_dir / 'w320.jpg', (1000, 1000))
+    cache = ThumbnailCache(str(tmp_path), 10000, [320], 3600)
+    assert list(cache._files) == [('vid', None)]
+    assert os.listdir(video_dir) == ['original.jpg']
@@ -0,0 +1,21 @@
+import threading
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+from services.timing import StageTimer
+
+def test_concurrent_adds_are_not_lost():
+    timer = StageTimer()
+
+    def add():
+        for _ in range(10000):
+            timer.add('transfer', 1.0)
+
+    threads = [threading.Thread(target=add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert timer.snapshot() == {'transfer': 80000.0}